@@ -0,0 +1,83 @@
+"""Calibrate the chars-per-token ratios used by --estimate.
+
+Usage:
+    python -m benchmarks.calibrate [--root PATH] [--files N] [--seed N]
+
+Tokenizes every file copychat would scan with estimate_tokens and prints,
+per language, the 10th and 90th percentile of characters per token, in the
+form of copychat.estimate.CHARS_PER_TOKEN. Without --root the synthetic
+benchmark repository is used; pointing --root at real checkouts gives
+ratios closer to real code. Requires tiktoken's encoding to be available,
+otherwise every ratio is the fallback of 4.
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from benchmarks.synthetic import RepoShape, generate_repo
+from copychat.core import iter_scan_files
+from copychat.format import estimate_tokens, get_encoding, guess_language
+
+
+def measure(root: Path) -> dict[Optional[str], list[float]]:
+    """Characters per token for each scanned file, grouped by language."""
+    ratios: dict[Optional[str], list[float]] = {}
+    for path in iter_scan_files(root):
+        try:
+            content = path.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+        tokens = estimate_tokens(content)
+        if tokens:
+            ratios.setdefault(guess_language(path), []).append(len(content) / tokens)
+    return ratios
+
+
+def percentile_range(values: list[float]) -> tuple[float, float]:
+    if len(values) < 2:
+        return values[0], values[0]
+    deciles = statistics.quantiles(values, n=10)
+    return deciles[0], deciles[-1]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Calibrate --estimate ratios.")
+    parser.add_argument("--root", type=Path, action="append", help="Tree to measure")
+    parser.add_argument("--files", type=int, default=RepoShape().files)
+    parser.add_argument("--seed", type=int, default=RepoShape().seed)
+    args = parser.parse_args(argv)
+
+    if get_encoding() is None:
+        print("warning: tiktoken encoding unavailable, ratios are the fallback")
+
+    ratios: dict[Optional[str], list[float]] = {}
+    with tempfile.TemporaryDirectory(prefix="copychat_calibrate_") as tmp:
+        roots = args.root
+        if not roots:
+            shape = RepoShape(files=args.files, seed=args.seed, git=False)
+            roots = [generate_repo(Path(tmp) / "repo", shape).root]
+        for root in roots:
+            for language, values in measure(root).items():
+                ratios.setdefault(language, []).extend(values)
+
+    everything = [ratio for values in ratios.values() for ratio in values]
+    if not everything:
+        print("No files found")
+        return 1
+    ratios[None] = everything
+
+    print("CHARS_PER_TOKEN = {")
+    for language, values in sorted(ratios.items(), key=lambda kv: kv[0] or "~"):
+        low, high = percentile_range(values)
+        key = "None" if language is None else f'"{language}"'
+        print(f"    {key}: ({low:.1f}, {high:.1f}),  # {len(values)} files")
+    print("}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""Run copychat benchmarks on a synthetic repository.
+
+Usage:
+    python -m benchmarks.run [--files N] [--repeat N] [--output results.json]
+                             [--baseline baseline.json] [--threshold 0.2]
+                             [--save-baseline baseline.json] [--only NAME]
+
+Each benchmark is run --repeat times against a freshly generated repository
+and its median time is reported. With --baseline, medians are compared
+against a stored result and the run exits with status 1 if any benchmark is
+slower than the baseline by more than --threshold (a fraction, 0.2 = 20%).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+from benchmarks.synthetic import RepoShape, SyntheticRepo, generate_repo
+
+# Registered benchmarks: name -> function(repo) that runs one iteration
+BENCHMARKS: dict[str, Callable[[SyntheticRepo], None]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark function under name."""
+
+    def register(fn: Callable[[SyntheticRepo], None]):
+        BENCHMARKS[name] = fn
+        return fn
+
+    return register
+
+
+@contextmanager
+def working_directory(path: Path):
+    """Temporarily change the working directory (git helpers use the cwd)."""
+    previous = Path.cwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+@contextmanager
+def cold_token_cache():
+    """Point the token cache at an empty directory for the duration."""
+    from copychat import format as format_module
+
+    previous = os.environ.get("COPYCHAT_CACHE_DIR")
+    with tempfile.TemporaryDirectory(prefix="copychat_bench_cache_") as cache_dir:
+        os.environ["COPYCHAT_CACHE_DIR"] = cache_dir
+        format_module._token_cache = None
+        try:
+            yield
+        finally:
+            format_module._token_cache = None
+            if previous is None:
+                os.environ.pop("COPYCHAT_CACHE_DIR", None)
+            else:
+                os.environ["COPYCHAT_CACHE_DIR"] = previous
+
+
+@benchmark("scan_directory")
+def bench_scan_directory(repo: SyntheticRepo) -> None:
+    from copychat.core import scan_directory
+
+    scan_directory(repo.root)
+
+
+@benchmark("scan_directory_git")
+def bench_scan_directory_git(repo: SyntheticRepo) -> None:
+    from copychat.core import scan_directory
+
+    scan_directory(repo.root, use_git=True)
+
+
+@benchmark("estimate_files")
+def bench_estimate_files(repo: SyntheticRepo) -> None:
+    from copychat.estimate import estimate_files
+
+    estimate_files(repo.root)
+
+
+@benchmark("scan_incremental")
+def bench_scan_incremental(repo: SyntheticRepo) -> None:
+    """Scan and format with a manifest; the first run fills it, later runs are warm."""
+    from copychat.core import scan_directory
+    from copychat.format import format_files
+    from copychat.manifest import Manifest
+
+    db = repo.root.parent / "manifest.sqlite3"
+    if not db.exists():
+        # Freshly written files are too recent for the manifest to trust
+        old = time.time_ns() - 3600 * 10**9
+        for dirpath, _, filenames in os.walk(repo.root):
+            for name in filenames:
+                os.utime(os.path.join(dirpath, name), ns=(old, old))
+
+    manifest = Manifest(db)
+    files = scan_directory(repo.root, manifest=manifest)
+    with cold_token_cache():
+        format_files(list(files.items()), manifest=manifest)
+    manifest.close()
+
+
+@benchmark("scan_directory_diff")
+def bench_scan_directory_diff(repo: SyntheticRepo) -> None:
+    from copychat.core import DiffMode, scan_directory
+
+    with working_directory(repo.root):
+        scan_directory(repo.root, diff_mode=DiffMode.CHANGED_WITH_DIFF)
+
+
+@benchmark("get_changed_files")
+def bench_get_changed_files(repo: SyntheticRepo) -> None:
+    from copychat.core import get_changed_files
+
+    with working_directory(repo.root):
+        get_changed_files()
+
+
+@benchmark("get_changed_files_fast")
+def bench_get_changed_files_fast(repo: SyntheticRepo) -> None:
+    """get_changed_files with git's untracked cache and fsmonitor."""
+    from copychat.core import FAST_STATUS, get_changed_files
+
+    get_changed_files(path=repo.root, status=FAST_STATUS)
+
+
+@benchmark("get_changed_files_subdir")
+def bench_get_changed_files_subdir(repo: SyntheticRepo) -> None:
+    """Changes under one top-level directory, from a repository-wide status."""
+    from copychat.core import get_changed_files
+
+    get_changed_files(path=_first_subdir(repo))
+
+
+@benchmark("get_changed_files_subdir_fast")
+def bench_get_changed_files_subdir_fast(repo: SyntheticRepo) -> None:
+    """Changes under one top-level directory with a pathspec-limited status."""
+    from copychat.core import FAST_STATUS, get_changed_files
+
+    get_changed_files(path=_first_subdir(repo), status=FAST_STATUS)
+
+
+def _first_subdir(repo: SyntheticRepo) -> Path:
+    return min(p for p in repo.root.iterdir() if p.is_dir() and p.name != ".git")
+
+
+@benchmark("format_files")
+def bench_format_files(repo: SyntheticRepo) -> None:
+    from copychat.format import format_files
+
+    files = [(path, path.read_text()) for path in repo.source_files]
+    with cold_token_cache():
+        format_files(files)
+
+
+@benchmark("estimate_tokens")
+def bench_estimate_tokens(repo: SyntheticRepo) -> None:
+    from copychat.format import estimate_tokens
+
+    contents = [path.read_text() for path in repo.source_files]
+    with cold_token_cache():
+        for content in contents:
+            estimate_tokens(content)
+
+
+@benchmark("cli")
+def bench_cli(repo: SyntheticRepo) -> None:
+    with tempfile.TemporaryDirectory(prefix="copychat_bench_out_") as out_dir:
+        env = dict(os.environ, COPYCHAT_CACHE_DIR=out_dir)
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "from copychat.cli import app; app()",
+                str(repo.root),
+                "--out",
+                str(Path(out_dir) / "out.md"),
+            ],
+            check=True,
+            capture_output=True,
+            env=env,
+        )
+
+
+def time_benchmark(fn: Callable[[], None], repeat: int) -> dict:
+    """Time fn repeat times and summarize the runs in seconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(runs),
+        "min_s": min(runs),
+        "runs_s": runs,
+    }
+
+
+def run_benchmarks(
+    shape: RepoShape, repeat: int = 3, only: Optional[list[str]] = None
+) -> dict:
+    """Generate a repository with the given shape and run the benchmarks on it."""
+    names = only or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    # Load the tokenizer up front so its one-time cost isn't charged to a benchmark
+    from copychat.format import get_encoding
+
+    get_encoding()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="copychat_bench_repo_") as tmp:
+        repo = generate_repo(Path(tmp) / "repo", shape)
+        for name in names:
+            results[name] = time_benchmark(lambda: BENCHMARKS[name](repo), repeat)
+
+    try:
+        from copychat import __version__
+    except ImportError:
+        __version__ = "unknown"
+
+    return {
+        "meta": {
+            "copychat_version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "shape": shape.to_dict(),
+        },
+        "benchmarks": results,
+    }
+
+
+def compare_results(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    """Compare median times against a baseline.
+
+    Returns one row per benchmark present in both results, flagging those that
+    are slower than the baseline by more than threshold.
+    """
+    rows = []
+    for name, result in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            continue
+        ratio = result["median_s"] / base["median_s"] if base["median_s"] else 1.0
+        rows.append(
+            {
+                "name": name,
+                "baseline_s": base["median_s"],
+                "current_s": result["median_s"],
+                "ratio": ratio,
+                "regressed": ratio > 1 + threshold,
+            }
+        )
+    return rows
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    defaults = RepoShape()
+    parser = argparse.ArgumentParser(description="Run copychat benchmarks.")
+    parser.add_argument("--files", type=int, default=defaults.files)
+    parser.add_argument("--depth", type=int, default=defaults.depth)
+    parser.add_argument("--fanout", type=int, default=defaults.fanout)
+    parser.add_argument("--changed-files", type=int, default=defaults.changed_files)
+    parser.add_argument("--large-files", type=int, default=defaults.large_files)
+    parser.add_argument("--binary-files", type=int, default=defaults.binary_files)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--only", action="append", choices=sorted(BENCHMARKS), help="Run only NAME"
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="Compare against this JSON")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--save-baseline", type=Path, help="Store results here")
+    args = parser.parse_args(argv)
+
+    shape = RepoShape(
+        files=args.files,
+        depth=args.depth,
+        fanout=args.fanout,
+        changed_files=args.changed_files,
+        large_files=args.large_files,
+        binary_files=args.binary_files,
+        seed=args.seed,
+    )
+    results = run_benchmarks(shape, repeat=args.repeat, only=args.only)
+
+    for name, result in results["benchmarks"].items():
+        print(f"{name:<30} {result['median_s'] * 1000:10.1f} ms (median)")
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    if args.save_baseline:
+        args.save_baseline.write_text(output + "\n")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        rows = compare_results(results, baseline, args.threshold)
+        print()
+        for row in rows:
+            status = "REGRESSION" if row["regressed"] else "ok"
+            print(
+                f"{row['name']:<24} {row['baseline_s'] * 1000:10.1f} ms -> "
+                f"{row['current_s'] * 1000:10.1f} ms  x{row['ratio']:.2f}  {status}"
+            )
+        if any(row["regressed"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
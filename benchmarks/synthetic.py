@@ -0,0 +1,149 @@
+"""Generate synthetic repositories with a configurable shape for benchmarks."""
+
+import os
+import random
+import subprocess
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+# Source extensions written by the generator (all in DEFAULT_EXTENSIONS)
+SOURCE_EXTENSIONS = ["py", "js", "ts", "md", "go", "rs", "yaml", "json"]
+
+# Words used to build source-like lines
+WORDS = (
+    "def class return import from self value items result config data path "
+    "for while if else try except with async await yield lambda None True"
+).split()
+
+
+@dataclass
+class RepoShape:
+    """Shape of a synthetic repository."""
+
+    files: int = 1000  # Source files, spread across the directory tree
+    depth: int = 4  # Maximum directory depth below the root
+    fanout: int = 4  # Subdirectories per directory
+    lines_per_file: int = 40  # Average lines per source file
+    ignore_every: int = 5  # Put .gitignore/.ccignore files in every Nth directory
+    ignored_files: int = 200  # Files that ignore rules or EXCLUDED_DIRS should skip
+    binary_files: int = 50  # Binary files (images, archives)
+    large_files: int = 2  # Large text files
+    large_file_size: int = 1024 * 1024  # Size of each large file in bytes
+    git: bool = True  # Initialize a git repository with a committed history
+    changed_files: int = 50  # Files modified after the last commit
+    branch_changes: int = 20  # Files changed on a feature branch vs "main"
+    seed: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class SyntheticRepo:
+    """A generated repository and what was written into it."""
+
+    root: Path
+    shape: RepoShape
+    source_files: list[Path] = field(default_factory=list)
+    changed_files: list[Path] = field(default_factory=list)
+
+
+def _git(root: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.email=bench@example.com", "-c", "user.name=bench", *args],
+        cwd=root,
+        check=True,
+        capture_output=True,
+    )
+
+
+def _directories(root: Path, depth: int, fanout: int) -> list[Path]:
+    """Build the list of directories breadth-first up to the given depth."""
+    dirs = [root]
+    level = [root]
+    for d in range(depth):
+        level = [parent / f"dir{d}_{i}" for parent in level for i in range(fanout)]
+        dirs.extend(level)
+    return dirs
+
+
+def _source_text(rng: random.Random, lines: int) -> str:
+    return "\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 10)))
+        for _ in range(max(1, lines))
+    )
+
+
+def generate_repo(root: Path, shape: RepoShape) -> SyntheticRepo:
+    """Create a synthetic repository under root (which must not exist yet)."""
+    rng = random.Random(shape.seed)
+    root.mkdir(parents=True)
+    repo = SyntheticRepo(root=root, shape=shape)
+
+    dirs = _directories(root, shape.depth, shape.fanout)
+    for directory in dirs:
+        directory.mkdir(parents=True, exist_ok=True)
+
+    # Source files, spread evenly over all directories
+    for i in range(shape.files):
+        directory = dirs[i % len(dirs)]
+        ext = SOURCE_EXTENSIONS[i % len(SOURCE_EXTENSIONS)]
+        path = directory / f"file{i}.{ext}"
+        lines = rng.randint(shape.lines_per_file // 2, shape.lines_per_file * 3 // 2)
+        path.write_text(_source_text(rng, lines) + "\n")
+        repo.source_files.append(path)
+
+    # Nested ignore files, plus files they (or EXCLUDED_DIRS) exclude
+    ignored_dirs = dirs[:: max(1, shape.ignore_every)]
+    for directory in ignored_dirs:
+        (directory / ".gitignore").write_text("*.tmp\ngenerated/\n")
+        (directory / ".ccignore").write_text("*.snap.md\n")
+    for i in range(shape.ignored_files):
+        directory = ignored_dirs[i % len(ignored_dirs)]
+        kind = i % 4
+        if kind == 0:
+            (directory / f"scratch{i}.tmp").write_text("temporary\n")
+        elif kind == 1:
+            (directory / f"output{i}.snap.md").write_text("snapshot\n")
+        elif kind == 2:
+            generated = directory / "generated"
+            generated.mkdir(exist_ok=True)
+            (generated / f"gen{i}.py").write_text("generated = True\n")
+        else:
+            deps = directory / "node_modules" / f"pkg{i}"
+            deps.mkdir(parents=True, exist_ok=True)
+            (deps / "index.js").write_text("module.exports = {}\n")
+
+    # Binary files
+    for i in range(shape.binary_files):
+        directory = dirs[rng.randrange(len(dirs))]
+        ext = "png" if i % 2 else "bin"
+        (directory / f"blob{i}.{ext}").write_bytes(os.urandom(rng.randint(512, 8192)))
+
+    # Large text files
+    for i in range(shape.large_files):
+        line = '{"key": "value", "number": 12345, "list": [1, 2, 3]},\n'
+        count = max(1, shape.large_file_size // len(line))
+        path = root / f"large{i}.json"
+        path.write_text("[\n" + line * count + "{}]\n")
+        repo.source_files.append(path)
+
+    if shape.git:
+        _git(root, "init", "-q", "-b", "main")
+        _git(root, "add", "-A")
+        _git(root, "commit", "-q", "-m", "initial")
+
+        candidates = [p for p in repo.source_files if p.suffix != ".json"]
+        rng.shuffle(candidates)
+        if shape.branch_changes:
+            _git(root, "checkout", "-q", "-b", "feature")
+            for path in candidates[: shape.branch_changes]:
+                with open(path, "a") as f:
+                    f.write("branch change\n")
+            _git(root, "commit", "-q", "-am", "feature changes")
+        for path in candidates[-shape.changed_files :] if shape.changed_files else []:
+            with open(path, "a") as f:
+                f.write("work tree change\n")
+            repo.changed_files.append(path)
+
+    return repo
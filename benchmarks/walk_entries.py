@@ -0,0 +1,95 @@
+"""Compare directory entries visited by os.walk and copychat's pruning walker.
+
+Usage:
+    python benchmarks/walk_entries.py [--files-per-dir N] [--depth D]
+
+Builds a synthetic tree in a temporary directory containing a large
+``node_modules/`` and ``.venv/`` alongside regular sources, then reports how
+many directory entries each traversal lists and how long it takes.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from copychat.core import (
+    ScanStats,
+    get_ccignore_spec,
+    get_gitignore_spec,
+    walk_files,
+)
+from copychat.patterns import DEFAULT_EXTENSIONS
+
+
+def build_tree(root: Path, files_per_dir: int, depth: int) -> None:
+    """Create sources plus dependency directories that should be skipped."""
+    for top in ("src", "node_modules", ".venv", "target"):
+        current = root / top
+        for level in range(depth):
+            current = current / f"pkg{level}"
+            current.mkdir(parents=True, exist_ok=True)
+            for i in range(files_per_dir):
+                (current / f"mod{i}.py").write_text(f"x = {i}\n")
+
+
+def legacy_walk(root: Path, include_set: set[str], git_spec) -> tuple[int, int]:
+    """Filter files the way scan_directory did with os.walk.
+
+    Returns (entries listed, files matched).
+    """
+    entries = matched = 0
+    for dirpath, dirs, files in os.walk(root):
+        entries += len(dirs) + len(files)
+        rel_root = os.path.relpath(dirpath, root)
+        rel_root = "" if rel_root == "." else rel_root
+        cc_spec = get_ccignore_spec(Path(dirpath))
+        if rel_root and (
+            git_spec.match_file(rel_root + "/") or cc_spec.match_file(rel_root + "/")
+        ):
+            continue
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in include_set:
+                continue
+            rel_path = os.path.join(rel_root, name) if rel_root else name
+            if git_spec.match_file(rel_path) or cc_spec.match_file(rel_path):
+                continue
+            matched += 1
+    return entries, matched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files-per-dir", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="copychat_bench_") as tmp:
+        root = Path(tmp)
+        build_tree(root, args.files_per_dir, args.depth)
+
+        include_set = {f".{ext}" for ext in DEFAULT_EXTENSIONS}
+        git_spec = get_gitignore_spec(root)
+
+        start = time.perf_counter()
+        walk_entries, walk_matched = legacy_walk(root, include_set, git_spec)
+        walk_time = time.perf_counter() - start
+
+        stats = ScanStats()
+        start = time.perf_counter()
+        files = list(walk_files(root, include_set, git_spec, stats=stats))
+        pruned_time = time.perf_counter() - start
+
+        print(
+            f"os.walk:        {walk_entries:>8,} entries  {walk_time * 1000:8.1f} ms"
+            f"  ({walk_matched:,} files matched)"
+        )
+        print(
+            f"pruning walker: {stats.entries:>8,} entries  {pruned_time * 1000:8.1f} ms"
+            f"  ({stats.dirs_pruned} subtrees pruned, {len(files):,} files matched)"
+        )
+
+
+if __name__ == "__main__":
+    main()
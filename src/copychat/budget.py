@@ -0,0 +1,189 @@
+"""Token-budget file selection for --max-tokens."""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+from .format import count_tokens
+
+# Planning estimate used to size batches for exact counting (the same ratio
+# count_tokens falls back to)
+CHARS_PER_TOKEN = 4
+
+# Optimistic ratio: a file with more than this many characters per token of
+# remaining budget is assumed not to fit and is skipped without tokenizing
+MAX_CHARS_PER_TOKEN = 8
+
+
+@dataclass
+class Candidate:
+    """A scanned file competing for a place in the bundle."""
+
+    path: Path
+    content: str
+    explicit: bool = False  # Named directly on the command line
+    changed: bool = False  # Has changes according to git
+
+    @property
+    def depth(self) -> int:
+        return len(self.path.absolute().parts)
+
+
+# Registered scorers: name -> function returning a sort key (lower is better)
+SCORERS: dict[str, Callable[[Candidate], float]] = {}
+
+DEFAULT_PRIORITY = ["explicit", "changed", "size", "depth"]
+
+
+def scorer(name: str):
+    """Register a scoring function under name for use in --priority."""
+
+    def register(fn: Callable[[Candidate], float]):
+        SCORERS[name] = fn
+        return fn
+
+    return register
+
+
+@scorer("explicit")
+def score_explicit(candidate: Candidate) -> float:
+    """Files named on the command line first."""
+    return 0 if candidate.explicit else 1
+
+
+@scorer("changed")
+def score_changed(candidate: Candidate) -> float:
+    """Files with uncommitted or branch changes first."""
+    return 0 if candidate.changed else 1
+
+
+@scorer("size")
+def score_size(candidate: Candidate) -> float:
+    """Smaller files first."""
+    return len(candidate.content)
+
+
+@scorer("depth")
+def score_depth(candidate: Candidate) -> float:
+    """Files closer to the root first."""
+    return candidate.depth
+
+
+@dataclass
+class Quota:
+    """A token limit for all files below a directory."""
+
+    directory: Path
+    max_tokens: int
+    used: int = 0
+
+    def applies_to(self, path: Path) -> bool:
+        try:
+            path.absolute().relative_to(self.directory)
+            return True
+        except ValueError:
+            return False
+
+
+def parse_quota(value: str, max_tokens: int) -> Quota:
+    """Parse a DIR=TOKENS or DIR=PERCENT% quota."""
+    directory, sep, limit = value.rpartition("=")
+    if not sep or not directory or not limit:
+        raise ValueError(f"Invalid quota {value!r}, expected DIR=TOKENS or DIR=N%")
+    try:
+        if limit.endswith("%"):
+            tokens = int(max_tokens * float(limit[:-1]) / 100)
+        else:
+            tokens = int(limit)
+    except ValueError:
+        raise ValueError(f"Invalid quota limit {limit!r}") from None
+    return Quota(directory=Path(directory).absolute(), max_tokens=tokens)
+
+
+@dataclass
+class Selection:
+    """Files chosen to fit a token budget."""
+
+    files: list[tuple[Path, str]] = field(default_factory=list)
+    total_tokens: int = 0
+    counted: int = 0  # Files tokenized exactly
+    pruned: int = 0  # Files skipped on their size estimate alone
+    over_budget: int = 0  # Files counted but too large for what was left
+
+
+def select_files(
+    candidates: list[Candidate],
+    max_tokens: int,
+    priority: Optional[list[str]] = None,
+    quotas: Optional[list[Quota]] = None,
+    jobs: Optional[int] = None,
+) -> Selection:
+    """Pick the highest-priority files whose token counts fit in max_tokens.
+
+    Candidates are ranked by the scorers named in priority (compared in
+    order, like a sort key) and added greedily: a file that doesn't fit is
+    skipped and smaller, lower-ranked files can still fill the space. Files
+    are tokenized in batches sized from a chars-per-token estimate, and a
+    file that couldn't fit even at MAX_CHARS_PER_TOKEN is skipped without
+    being tokenized, so large inputs can be cut down without counting every
+    file. Quotas additionally cap the tokens taken from a directory.
+
+    Selected files keep their input order.
+    """
+    priority = priority or DEFAULT_PRIORITY
+    unknown = [name for name in priority if name not in SCORERS]
+    if unknown:
+        raise ValueError(f"Unknown priority: {', '.join(unknown)}")
+    quotas = quotas or []
+
+    ranked = sorted(
+        range(len(candidates)),
+        key=lambda i: tuple(SCORERS[name](candidates[i]) for name in priority),
+    )
+    file_quotas = {
+        i: [q for q in quotas if q.applies_to(candidates[i].path)] for i in ranked
+    }
+
+    def room(i: int, remaining: int) -> int:
+        return min([remaining] + [q.max_tokens - q.used for q in file_quotas[i]])
+
+    selection = Selection()
+    chosen = set()
+    remaining = max_tokens
+    pos = 0
+    while pos < len(ranked) and remaining > 0:
+        # Plan a batch whose estimated size fills what's left of the budget
+        batch = []
+        planned = 0
+        while pos < len(ranked) and planned < remaining:
+            i = ranked[pos]
+            pos += 1
+            chars = len(candidates[i].content)
+            if chars > room(i, remaining) * MAX_CHARS_PER_TOKEN:
+                selection.pruned += 1
+                continue
+            batch.append(i)
+            planned += chars // CHARS_PER_TOKEN
+
+        if not batch:
+            break
+        counts = count_tokens([candidates[i].content for i in batch], jobs=jobs)
+        selection.counted += len(batch)
+        for i, tokens in zip(batch, counts):
+            if tokens > room(i, remaining):
+                selection.over_budget += 1
+                continue
+            chosen.add(i)
+            remaining -= tokens
+            selection.total_tokens += tokens
+            for quota in file_quotas[i]:
+                quota.used += tokens
+
+    # Anything never looked at didn't fit either
+    selection.pruned += len(ranked) - pos
+    selection.files = [
+        (candidates[i].path, candidates[i].content)
+        for i in range(len(candidates))
+        if i in chosen
+    ]
+    return selection
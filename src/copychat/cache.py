@@ -0,0 +1,170 @@
+"""Persistent on-disk caches shared between copychat runs."""
+
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# Default size limit for the token count cache (bytes of live database pages)
+DEFAULT_TOKEN_CACHE_SIZE = 32 * 1024 * 1024
+
+
+def get_cache_dir() -> Path:
+    """Get the root directory for copychat's caches.
+
+    Defaults to ~/.cache/copychat and can be overridden with COPYCHAT_CACHE_DIR.
+    """
+    override = os.environ.get("COPYCHAT_CACHE_DIR")
+    if override:
+        return Path(override)
+    return Path.home() / ".cache" / "copychat"
+
+
+def content_hash(content: str) -> str:
+    """Hash of a file's content, for telling whether it changed between runs."""
+    return hashlib.blake2b(
+        content.encode("utf-8", "surrogatepass"), digest_size=20
+    ).hexdigest()
+
+
+class TokenCache:
+    """Token counts keyed by a hash of the content and the encoding name.
+
+    Counts are stored in a SQLite database so several copychat processes can
+    read and write the cache at the same time. New counts and access times are
+    buffered in memory and written in one transaction by flush(), which also
+    evicts the least recently used entries once the cache exceeds max_size.
+    The cache is best-effort: if the database can't be used, lookups miss and
+    writes are dropped.
+    """
+
+    def __init__(
+        self, path: Optional[Path] = None, max_size: int = DEFAULT_TOKEN_CACHE_SIZE
+    ):
+        self.path = path or get_cache_dir() / "tokens" / "tokens.sqlite3"
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional["sqlite3.Connection"] = None
+        self._disabled = False
+        self._pending: dict[str, int] = {}  # New counts not yet written
+        self._used: set[str] = set()  # Keys read this run, for LRU ordering
+
+    @staticmethod
+    def key(text: str, encoding: str) -> str:
+        """Build the cache key for text tokenized with the given encoding."""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(encoding.encode())
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def _connect(self) -> Optional["sqlite3.Connection"]:
+        """Open the database on first use, disabling the cache on failure."""
+        if self._conn is not None or self._disabled:
+            return self._conn
+        import sqlite3
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tokens ("
+                "key TEXT PRIMARY KEY, tokens INTEGER NOT NULL, "
+                "last_used REAL NOT NULL) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS tokens_last_used ON tokens (last_used)"
+            )
+            conn.commit()
+            self._conn = conn
+        except (OSError, sqlite3.Error):
+            self._disabled = True
+        return self._conn
+
+    def get(self, key: str) -> Optional[int]:
+        """Return the cached count for key, or None on a miss."""
+        count = self._pending.get(key)
+        if count is None:
+            conn = self._connect()
+            if conn is not None:
+                import sqlite3
+
+                try:
+                    row = conn.execute(
+                        "SELECT tokens FROM tokens WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error:
+                    row = None
+                if row is not None:
+                    count = row[0]
+                    self._used.add(key)
+
+        if count is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return count
+
+    def put(self, key: str, count: int) -> None:
+        """Record a count; it is written to disk on the next flush()."""
+        self._pending[key] = count
+
+    def flush(self) -> None:
+        """Write pending counts, refresh access times and evict if needed."""
+        if not self._pending and not self._used:
+            return
+        conn = self._connect()
+        if conn is None:
+            self._pending.clear()
+            self._used.clear()
+            return
+        import sqlite3
+
+        now = time.time()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO tokens (key, tokens, last_used) "
+                    "VALUES (?, ?, ?)",
+                    [(key, count, now) for key, count in self._pending.items()],
+                )
+                conn.executemany(
+                    "UPDATE tokens SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in self._used],
+                )
+            self._evict(conn)
+        except sqlite3.Error:
+            pass  # Another process may hold the lock for too long; skip this run
+        self._pending.clear()
+        self._used.clear()
+
+    def _evict(self, conn: "sqlite3.Connection") -> None:
+        """Delete least recently used entries until the cache is under 80% of max."""
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        size = (page_count - free_pages) * page_size
+        if size <= self.max_size:
+            return
+
+        total = conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+        keep = int(total * (self.max_size * 0.8) / size)
+        with conn:
+            conn.execute(
+                "DELETE FROM tokens WHERE key IN "
+                "(SELECT key FROM tokens ORDER BY last_used LIMIT ?)",
+                (total - keep,),
+            )
+
+    def close(self) -> None:
+        """Flush and close the database."""
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
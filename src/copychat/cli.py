@@ -1,23 +1,42 @@
+import click
 import typer
+from typer.core import TyperCommand, TyperGroup
 from pathlib import Path
 from typing import Optional, List
 from rich.console import Console
-import pyperclip
 from enum import Enum
-from importlib.metadata import version as get_version
 import atexit
+import os
 import shutil
+import sys
+import time
 
 from .core import (
     scan_directory,
     DiffMode,
+    FAST_STATUS,
+    ScanStats,
+    RepoContexts,
+    StatusOptions,
+    get_changed_files,
     get_file_content,
 )
+from .budget import DEFAULT_PRIORITY, SCORERS, Candidate, parse_quota, select_files
+from .estimate import Estimate, estimate_files
+from .du import SORT_KEYS, collect_usage, render_usage
+from .manifest import DEFAULT_MANIFEST_SIZE, Manifest
+from .snapshot import DEFAULT_PROFILE, Snapshot, render_delta
+from .watch import DEFAULT_DEBOUNCE, Bundle, FileTarget, PathFilter, run_watch
 from .format import (
+    FormatResult,
     format_files as format_files_xml,
     create_display_header,
+    format_deleted,
+    get_token_cache,
+    write_result,
 )
-from .sources import GitHubSource, GitHubItem
+from .sources import DEFAULT_CACHE_SIZE, DEFAULT_CACHE_TTL, GitHubSource, GitHubItem
+from . import timings
 
 
 # Register cleanup of temporary GitHub directory
@@ -98,15 +117,136 @@ def diff_mode_callback(value: str) -> DiffMode:
         raise typer.BadParameter(f"Must be one of: {', '.join(valid_values)}")
 
 
+def _write_bundle(
+    result: FormatResult,
+    outfile: Optional[Path],
+    verbose: bool,
+    print_output: bool,
+    start: int = 0,
+    prefix: str = "",
+) -> None:
+    """Replace the --out file (or the clipboard) with a refreshed --watch bundle.
+
+    With --append, only this run's output is replaced: the file from offset
+    start on, or the clipboard after prefix.
+    """
+    if outfile:
+        with open(outfile, "r+" if start else "w") as out:
+            out.seek(start)
+            out.truncate()
+            write_result(result, out, include_header=verbose)
+    else:
+        import pyperclip
+
+        pyperclip.copy(
+            prefix
+            + (
+                str(result)
+                if verbose
+                else "\n".join(f.formatted_content for f in result.files)
+            )
+        )
+    if print_output:
+        write_result(result, sys.stdout, include_header=verbose)
+        sys.stdout.write("\n")
+
+
+def _snapshot_path(path: Path, base: Path) -> str:
+    """Key for path in a --since-last snapshot: relative to base if below it."""
+    resolved = path.resolve()
+    try:
+        return resolved.relative_to(base).as_posix()
+    except ValueError:
+        return str(resolved)
+
+
+# Multipliers for size suffixes accepted by --max-file-size
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_size(value: Optional[str]) -> Optional[int]:
+    """Convert a size like '500K', '10MB' or '2048' to bytes."""
+    if value is None:
+        return None
+    import re
+
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*", value.lower())
+    if not m:
+        raise typer.BadParameter("Must be a size such as 2048, 500K, 10M or 1G")
+    return int(float(m.group(1)) * SIZE_UNITS[m.group(2)])
+
+
+def parse_priority(value: Optional[str]) -> Optional[list[str]]:
+    """Split and validate a comma-separated list of scorer names."""
+    if value is None:
+        return None
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCORERS]
+    if unknown or not names:
+        raise typer.BadParameter(
+            f"Must be a comma-separated list of: {', '.join(SCORERS)}"
+        )
+    return names
+
+
+def check_dir_quota(value: Optional[List[str]]) -> List[str]:
+    """Validate DIR=TOKENS or DIR=N% quotas (parsed once --max-tokens is known)."""
+    for quota in value or []:
+        try:
+            parse_quota(quota, 0)
+        except ValueError as e:
+            raise typer.BadParameter(str(e)) from None
+    return value or []
+
+
+class _DefaultContext(click.Context):
+    """Context for the default command, named like the program itself."""
+
+    @property
+    def command_path(self) -> str:
+        return super().command_path.rstrip()
+
+
+class DefaultCommand(TyperCommand):
+    context_class = _DefaultContext
+
+
+class DefaultCommandGroup(TyperGroup):
+    """Run the main command unless the first argument names a subcommand.
+
+    Keeps `copychat [PATHS]` working next to subcommands such as `copychat du`.
+    """
+
+    default_command = "main"
+
+    def resolve_command(self, ctx, args):
+        if args[0] == self.default_command:
+            args = args[1:]
+        elif args[0] in self.commands:
+            return super().resolve_command(ctx, args)
+        # Run main with an empty name so usage reads "copychat [OPTIONS] ..."
+        return "", self.commands[self.default_command], args
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0].startswith("-")):
+            # Options (including --help) belong to the default command
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
 app = typer.Typer(
-    no_args_is_help=True,  # Show help when no args provided
+    cls=DefaultCommandGroup,
     add_completion=False,  # Disable shell completion for simplicity
 )
 console = Console()
 error_console = Console(stderr=True)
 
 
-@app.command()
+@app.command(
+    cls=DefaultCommand,
+    no_args_is_help=True,  # Show help when no args provided
+    epilog="Run 'copychat du --help' for per-directory file and token totals.",
+)
 def main(
     paths: list[str] = typer.Argument(
         None,
@@ -172,11 +312,121 @@ def main(
         "-d",
         help="Maximum directory depth to scan (0 = current dir only)",
     ),
+    max_file_size: Optional[str] = typer.Option(
+        None,
+        "--max-file-size",
+        help="Skip files larger than this size (e.g. 500K, 10M)",
+        callback=parse_size,
+    ),
+    max_tokens: Optional[int] = typer.Option(
+        None,
+        "--max-tokens",
+        min=1,
+        help="Only include the highest-priority files that fit in this many tokens",
+    ),
+    priority: Optional[str] = typer.Option(
+        None,
+        "--priority",
+        help=f"Scorers ranking files for --max-tokens (default: {','.join(DEFAULT_PRIORITY)})",
+        callback=parse_priority,
+    ),
+    dir_quota: Optional[List[str]] = typer.Option(
+        None,
+        "--dir-quota",
+        help="Cap tokens taken from a directory with --max-tokens (DIR=TOKENS or DIR=N%)",
+        callback=check_dir_quota,
+    ),
+    since_last: bool = typer.Option(
+        False,
+        "--since-last",
+        help="Only output files added or modified since the last --since-last run, "
+        "and list deleted ones",
+    ),
+    profile: str = typer.Option(
+        DEFAULT_PROFILE,
+        "--profile",
+        help="Snapshot name for --since-last, to track separate sessions",
+    ),
+    watch: bool = typer.Option(
+        False,
+        "--watch",
+        "-w",
+        help="Keep running and refresh the output when scanned files change",
+    ),
+    debounce: float = typer.Option(
+        DEFAULT_DEBOUNCE,
+        "--debounce",
+        min=0,
+        help="Seconds without changes to wait before refreshing in --watch mode",
+    ),
+    fast_status: bool = typer.Option(
+        False,
+        "--fast-status",
+        help="Use git's untracked cache and fsmonitor for diff modes, and only "
+        "look for changes under the scanned paths",
+    ),
+    refresh: bool = typer.Option(
+        False,
+        "--refresh",
+        help="Fetch the latest commit of a cached GitHub repository",
+    ),
+    cache_ttl: float = typer.Option(
+        DEFAULT_CACHE_TTL,
+        "--cache-ttl",
+        min=0,
+        help="Seconds to use a cached GitHub repository before checking for updates",
+    ),
+    cache_size: Optional[str] = typer.Option(
+        None,
+        "--cache-size",
+        help="Remove least recently used GitHub clones once the cache is larger "
+        "than this (e.g. 500M, 5G; default 2G)",
+        callback=parse_size,
+    ),
+    incremental: bool = typer.Option(
+        False,
+        "--incremental",
+        help="Reuse files, listings and token counts unchanged since the last run",
+    ),
+    manifest_size: Optional[str] = typer.Option(
+        None,
+        "--manifest-size",
+        help="Evict least recently used files once the --incremental manifest is "
+        "larger than this (e.g. 100M, 1G; default 256M)",
+        callback=parse_size,
+    ),
+    estimate: bool = typer.Option(
+        False,
+        "--estimate",
+        help="Only report file count, bytes and a token range from file sizes",
+    ),
+    use_git: bool = typer.Option(
+        False,
+        "--use-git",
+        help="List files with git ls-files inside git repositories instead of walking",
+    ),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        min=1,
+        help="Worker threads for reading files and counting tokens",
+    ),
     debug: bool = typer.Option(
         False,
         "--debug",
         help="Debug mode for development",
     ),
+    show_timings: bool = typer.Option(
+        False,
+        "--timings",
+        help="Print a per-phase timing breakdown and the slowest files to stderr",
+    ),
+    trace: Optional[Path] = typer.Option(
+        None,
+        "--trace",
+        help="Write a Chrome trace-event JSON file with per-phase and per-file spans",
+    ),
     compare_branch: Optional[str] = typer.Option(
         None,
         "--diff-branch",
@@ -191,9 +441,109 @@ def main(
 ) -> None:
     """Convert source code files to markdown format for LLM context."""
     if version:
+        from importlib.metadata import version as get_version
+
         console.print(f"copychat version {get_version('copychat')}")
         raise typer.Exit()
 
+    if watch and (estimate or since_last or max_tokens is not None):
+        error_console.print(
+            "[red]Error:[/] --watch can't be combined with --estimate, "
+            "--since-last or --max-tokens"
+        )
+        raise typer.Exit(1)
+
+    recorder = timings.start_timings() if show_timings or trace else None
+
+    # Collects skipped files across all scanned paths
+    scan_stats = ScanStats()
+    # Files named directly, ranked first by --max-tokens
+    explicit_files = set()
+    all_files = {}
+    # With --estimate, files are sized into this instead of read into all_files
+    plan = Estimate() if estimate else None
+    manifest = (
+        Manifest(
+            max_size=DEFAULT_MANIFEST_SIZE if manifest_size is None else manifest_size
+        )
+        if incremental and not estimate
+        else None
+    )
+    github_source = None
+    started = time.perf_counter()
+    # --since-last compares full contents; diff modes apply to the deltas
+    scan_mode = DiffMode.FULL if since_last else diff_mode
+    scanned_roots = []
+    git_status = FAST_STATUS if fast_status else StatusOptions()
+    # Each repository's git status is read once for the whole run
+    repos = RepoContexts()
+    # What --watch watches, with the same filters as the scan
+    watch_targets = []
+
+    def add_file(target: Path) -> None:
+        scanned_roots.append(target.resolve().parent)
+        watch_targets.append(FileTarget(target))
+        explicit_files.add(target)
+        if plan is not None:
+            estimate_files(
+                target,
+                max_file_size=max_file_size,
+                stats=scan_stats,
+                estimate=plan,
+                diff_mode=scan_mode,
+                compare_branch=compare_branch,
+                git_status=git_status,
+                repos=repos,
+            )
+            return
+        content = get_file_content(
+            target,
+            scan_mode,
+            compare_branch=compare_branch,
+            max_file_size=max_file_size,
+            stats=scan_stats,
+        )
+        if content is not None:
+            all_files[target] = content
+
+    def add_directory(target: Path) -> None:
+        scanned_roots.append(target.resolve())
+        watch_targets.append(
+            PathFilter(target, include.split(",") if include else None, exclude, depth)
+        )
+        if plan is not None:
+            estimate_files(
+                target,
+                include=include.split(",") if include else None,
+                exclude_patterns=exclude,
+                max_depth=depth,
+                max_file_size=max_file_size,
+                stats=scan_stats,
+                use_git=use_git,
+                estimate=plan,
+                diff_mode=scan_mode,
+                compare_branch=compare_branch,
+                git_status=git_status,
+                repos=repos,
+            )
+            return
+        files = scan_directory(
+            target,
+            include=include.split(",") if include else None,
+            exclude_patterns=exclude,
+            diff_mode=scan_mode,
+            max_depth=depth,
+            compare_branch=compare_branch,
+            jobs=jobs,
+            max_file_size=max_file_size,
+            stats=scan_stats,
+            use_git=use_git,
+            manifest=manifest,
+            git_status=git_status,
+            repos=repos,
+        )
+        all_files.update(files)
+
     try:
         # Parse source type and location
         source_type, source_loc = (
@@ -203,8 +553,20 @@ def main(
         # Handle different source types
         if source_type == SourceType.GITHUB:
             try:
-                github_source = GitHubSource(source_loc)
-                source_dir = github_source.fetch()
+                # Check out only the requested paths, not issue or PR references
+                clone_paths = []
+                for path in paths or []:
+                    try:
+                        parse_github_item(path)
+                    except Exception:
+                        clone_paths.append(path)
+                github_source = GitHubSource(
+                    source_loc,
+                    paths=clone_paths,
+                    ttl=cache_ttl,
+                    max_size=DEFAULT_CACHE_SIZE if cache_size is None else cache_size,
+                )
+                source_dir = github_source.fetch(refresh=refresh)
             except Exception as e:
                 if debug:
                     raise
@@ -220,24 +582,23 @@ def main(
 
         # Handle file vs directory source
         if source_dir.is_file():
-            content = get_file_content(
-                source_dir, diff_mode, compare_branch=compare_branch
-            )
-            all_files = {source_dir: content} if content is not None else {}
+            add_file(source_dir)
         else:
             # For directories, scan all paths
             if not paths:
                 paths = ["."]
 
             # Handle paths
-            all_files = {}
             for path in paths:
                 # Allow GitHub issues/PRs as direct arguments
                 try:
                     repo, num = parse_github_item(path)
                     gh_item = GitHubItem(repo, num, token)
                     p, content = gh_item.fetch()
-                    all_files[p] = content
+                    if plan is not None:
+                        plan.add(p, len(content.encode()))
+                    else:
+                        all_files[p] = content
                     continue
                 except Exception:
                     pass
@@ -246,21 +607,9 @@ def main(
                 if target.is_absolute():
                     # Use absolute paths as-is
                     if target.is_file():
-                        content = get_file_content(
-                            target, diff_mode, compare_branch=compare_branch
-                        )
-                        if content is not None:
-                            all_files[target] = content
+                        add_file(target)
                     else:
-                        files = scan_directory(
-                            target,
-                            include=include.split(",") if include else None,
-                            exclude_patterns=exclude,
-                            diff_mode=diff_mode,
-                            max_depth=depth,
-                            compare_branch=compare_branch,
-                        )
-                        all_files.update(files)
+                        add_directory(target)
                 else:
                     # For relative paths, try source dir first, then current dir
                     targets = []
@@ -276,27 +625,95 @@ def main(
                     for target in targets:
                         if target.exists():
                             if target.is_file():
-                                content = get_file_content(
-                                    target, diff_mode, compare_branch=compare_branch
-                                )
-                                if content is not None:
-                                    all_files[target] = content
-                                break
+                                add_file(target)
                             else:
-                                files = scan_directory(
-                                    target,
-                                    include=include.split(",") if include else None,
-                                    exclude_patterns=exclude,
-                                    diff_mode=diff_mode,
-                                    max_depth=depth,
-                                    compare_branch=compare_branch,
-                                )
-                                all_files.update(files)
-                                break
-        if not all_files:
+                                add_directory(target)
+                            break
+        if github_source is not None and not watch:
+            # Everything has been read; other runs may update the clone now
+            # (--watch keeps reading it until the session ends)
+            github_source.release()
+        if scan_stats.skipped:
+            reasons = ", ".join(
+                f"{count} {reason}"
+                for reason, count in sorted(scan_stats.skipped.items())
+            )
+            error_console.print(
+                f"Skipped [yellow]{sum(scan_stats.skipped.values())}[/] files ({reasons})"
+            )
+
+        if plan is not None:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            console.print(
+                f"{plan.files:,} files, {plan.bytes:,} bytes, "
+                f"~{plan.min_tokens:,}-{plan.max_tokens:,} tokens "
+                f"(estimated in {elapsed_ms:.0f} ms)",
+                highlight=False,
+            )
+            return
+
+        snapshot = None
+        deleted = []
+        if since_last:
+            # Paths are keyed relative to the directory holding everything scanned
+            base = Path(os.path.commonpath(scanned_roots or [Path.cwd()]))
+            snapshot = Snapshot(
+                source_loc if source_type == SourceType.GITHUB else str(base), profile
+            )
+            rel_paths = {path: _snapshot_path(path, base) for path in all_files}
+            full_contents = {rel_paths[path]: c for path, c in all_files.items()}
+            delta = snapshot.delta(full_contents)
+            changed_paths = set(delta.changed)
+            all_files = {
+                path: render_delta(
+                    rel, full_contents[rel], snapshot.previous(rel), diff_mode
+                )
+                for path, rel in rel_paths.items()
+                if rel in changed_paths
+            }
+            deleted = delta.deleted
+            error_console.print(
+                f"Since last copy: [green]{len(delta.added)}[/] added, "
+                f"[green]{len(delta.modified)}[/] modified, "
+                f"[green]{len(delta.deleted)}[/] deleted"
+            )
+            if not all_files and not deleted:
+                return
+
+        if not all_files and not deleted:
             error_console.print("Found [red]0[/] matching files")
             return
 
+        if max_tokens is not None and all_files:
+            priority = priority or DEFAULT_PRIORITY
+            quotas = [parse_quota(q, max_tokens) for q in dir_quota or []]
+            changed = set()
+            if "changed" in priority:
+                # Each scanned repository's own changes
+                for root in set(scanned_roots):
+                    changed |= get_changed_files(
+                        compare_branch, root, git_status, repos
+                    )
+            candidates = [
+                Candidate(
+                    path=path,
+                    content=content,
+                    explicit=path in explicit_files,
+                    changed=isinstance(path, Path) and path.resolve() in changed,
+                )
+                for path, content in all_files.items()
+            ]
+            selection = select_files(
+                candidates, max_tokens, priority=priority, quotas=quotas, jobs=jobs
+            )
+            error_console.print(
+                f"Selected [green]{len(selection.files)}[/] of {len(candidates)} files "
+                f"(~{selection.total_tokens:,} of {max_tokens:,} tokens)"
+            )
+            all_files = dict(selection.files)
+            if not all_files and not deleted:
+                return
+
         # Separate GitHub issues/PRs from regular files for better reporting
         github_items = []
         filesystem_files = []
@@ -311,14 +728,21 @@ def main(
             else:
                 filesystem_files.append((path, content))
 
+        # Output files are streamed block by block rather than joined in memory
+        # (--watch keeps the rendered blocks to update them in place)
+        streaming = outfile is not None and not watch
+
         # Format files - pass both paths and content
         format_result = format_files_xml(
-            [(path, content) for path, content in all_files.items()]
+            [(path, content) for path, content in all_files.items()],
+            jobs=jobs,
+            render=not streaming,
+            manifest=manifest,
+            deleted=deleted,
         )
 
         # Get the formatted content, conditionally including header
         if verbose:
-            result = str(format_result)
             # Print the display header to stderr for visibility
             error_console.print(
                 "\nFile summary:",
@@ -326,10 +750,26 @@ def main(
             )
             # Use the display-friendly header
             error_console.print(create_display_header(format_result))
+            token_cache = get_token_cache()
+            error_console.print(
+                f"Token cache: {token_cache.hits:,} hits, {token_cache.misses:,} misses"
+            )
+            if manifest is not None:
+                error_console.print(
+                    f"Manifest: {manifest.files_reused:,} files and "
+                    f"{manifest.listings_reused:,} directory listings reused"
+                )
             error_console.print()  # Add blank line after header
-        else:
-            # Skip the header by taking only the formatted files
-            result = "\n".join(f.formatted_content for f in format_result.files)
+
+        result = ""
+        if not streaming:
+            if verbose:
+                result = str(format_result)
+            else:
+                # Skip the header by taking only the formatted files
+                result = "\n".join(f.formatted_content for f in format_result.files)
+                if deleted:
+                    result = "\n".join(filter(None, [result, format_deleted(deleted)]))
 
         # Custom message based on content types
         if github_items and filesystem_files:
@@ -345,27 +785,37 @@ def main(
                 f"Found [green]{len(format_result.files)}[/] matching files"
             )
 
+        # Where this run's output starts, for --watch to rewrite just that
+        output_start = 0
+        clipboard_prefix = ""
+
         # Handle outputs
         if outfile:
-            if append and outfile.exists():
-                existing_content = outfile.read_text()
-                result = existing_content + "\n\n" + result
-            outfile.write_text(result)
+            # Append without reading the existing file back in
+            add_separator = append and outfile.exists()
+            with timings.span("write"), open(outfile, "a" if append else "w") as out:
+                if add_separator:
+                    out.write("\n\n")
+                output_start = out.tell()
+                write_result(format_result, out, include_header=verbose)
             error_console.print(
                 f"Output {'appended' if append else 'written'} to [green]{outfile}[/]"
             )
         # Handle clipboard only if not writing to file
         else:
-            if append:
-                try:
-                    existing_clipboard = pyperclip.paste()
-                    result = existing_clipboard + "\n\n" + result
-                except Exception:
-                    error_console.print(
-                        "[yellow]Warning: Could not read clipboard for append[/]"
-                    )
+            import pyperclip
+
+            with timings.span("clipboard"):
+                if append:
+                    try:
+                        clipboard_prefix = pyperclip.paste() + "\n\n"
+                        result = clipboard_prefix + result
+                    except Exception:
+                        error_console.print(
+                            "[yellow]Warning: Could not read clipboard for append[/]"
+                        )
 
-            pyperclip.copy(result)
+                pyperclip.copy(result)
             # Calculate total lines outside the f-string
             total_lines = sum(f.content.count("\n") + 1 for f in format_result.files)
             error_console.print(
@@ -375,10 +825,191 @@ def main(
 
         # Print to stdout only if explicitly requested
         if print_output:
-            print(result)
+            if streaming:
+                write_result(format_result, sys.stdout, include_header=verbose)
+                sys.stdout.write("\n")
+            else:
+                print(result)
+
+        if snapshot is not None:
+            # Remember what was sent; files dropped by --max-tokens stay pending
+            snapshot.record(
+                {rel_paths[path]: full_contents[rel_paths[path]] for path in all_files},
+                deleted,
+            )
+            snapshot.save()
+
+        if watch:
+            # Files git reports as changed, as of the latest batch of changes
+            watch_changed: dict[str, Optional[set[Path]]] = {"files": None}
+
+            def prepare() -> None:
+                if diff_mode == DiffMode.FULL:
+                    return
+                # Diff modes need the current git status
+                repos = RepoContexts()
+                watch_changed["files"] = set().union(
+                    *(
+                        get_changed_files(compare_branch, root, git_status, repos)
+                        for root in set(scanned_roots)
+                    )
+                )
+
+            def read(path: Path) -> Optional[str]:
+                return get_file_content(
+                    # Resolved like the changed files (named files may be relative)
+                    path.resolve(),
+                    diff_mode,
+                    changed_files=watch_changed["files"],
+                    compare_branch=compare_branch,
+                    max_file_size=max_file_size,
+                )
+
+            def rescan() -> dict:
+                # Diff modes need the current git status
+                repos = RepoContexts()
+                files = {}
+                for target in watch_targets:
+                    if isinstance(target, FileTarget):
+                        content = read(target.key)
+                        if content is not None:
+                            files[target.key] = content
+                        continue
+                    files.update(
+                        scan_directory(
+                            target.root,
+                            include=include.split(",") if include else None,
+                            exclude_patterns=exclude,
+                            diff_mode=diff_mode,
+                            max_depth=depth,
+                            compare_branch=compare_branch,
+                            jobs=jobs,
+                            max_file_size=max_file_size,
+                            use_git=use_git,
+                            git_status=git_status,
+                            repos=repos,
+                        )
+                    )
+                return files
+
+            def emit(bundle: Bundle, changed: int) -> None:
+                _write_bundle(
+                    bundle.result(),
+                    outfile,
+                    verbose,
+                    print_output,
+                    start=output_start,
+                    prefix=clipboard_prefix,
+                )
+                error_console.print(
+                    f"{f'{changed:,} changed, ' if changed else 'Refreshed, '}"
+                    f"{len(bundle.contents):,} files "
+                    f"(~{sum(b.stats.tokens for b in bundle.blocks.values()):,} tokens)",
+                    highlight=False,
+                )
+
+            error_console.print(
+                "Watching for changes (Enter to refresh, Ctrl-C to stop)"
+            )
+            run_watch(
+                watch_targets,
+                Bundle.from_result(format_result, jobs),
+                read,
+                rescan,
+                emit,
+                debounce=debounce,
+                # Don't pick up our own output
+                skip=frozenset([str(outfile.resolve())] if outfile else []),
+                prepare=prepare,
+            )
 
     except Exception as e:
         if debug:
             raise
         error_console.print(f"[red]Error:[/] {str(e)}")
         raise typer.Exit(1)
+    finally:
+        if manifest is not None:
+            manifest.close()
+        if github_source is not None:
+            github_source.release()
+        if recorder is not None:
+            timings.stop_timings()
+            if show_timings:
+                error_console.print(recorder.report(), markup=False, highlight=False)
+            if trace:
+                recorder.write_chrome_trace(trace)
+                error_console.print(f"Trace written to [green]{trace}[/]")
+
+
+@app.command("du")
+def du(
+    paths: list[Path] = typer.Argument(
+        None,
+        help="Directories to summarize (defaults to current directory)",
+    ),
+    include: Optional[str] = typer.Option(
+        None,
+        "--include",
+        "-i",
+        help="Extensions to include (comma-separated, e.g. 'py,js,ts')",
+    ),
+    exclude: Optional[List[str]] = typer.Option(
+        None,
+        "--exclude",
+        "-x",
+        help="Glob patterns to exclude",
+    ),
+    depth: Optional[int] = typer.Option(
+        None,
+        "--depth",
+        "-d",
+        min=0,
+        help="Show directories at most this deep (totals still include everything)",
+    ),
+    sort: str = typer.Option(
+        "name",
+        "--sort",
+        help=f"Order entries by {' or '.join(SORT_KEYS)}",
+        click_type=click.Choice(SORT_KEYS),
+    ),
+    show_files: bool = typer.Option(
+        False,
+        "--all",
+        "-a",
+        help="Show a row for every file, not just directories",
+    ),
+    max_file_size: Optional[str] = typer.Option(
+        None,
+        "--max-file-size",
+        help="Skip files larger than this size (e.g. 500K, 10M)",
+        callback=parse_size,
+    ),
+    use_git: bool = typer.Option(
+        False,
+        "--use-git",
+        help="List files with git ls-files inside git repositories instead of walking",
+    ),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        min=1,
+        help="Worker threads for reading files and counting tokens",
+    ),
+) -> None:
+    """Show files, lines and tokens per directory, filtered like a normal run."""
+    for path in paths or [Path(".")]:
+        if not path.is_dir():
+            error_console.print(f"[red]Error:[/] {path} is not a directory")
+            raise typer.Exit(1)
+        usage = collect_usage(
+            path,
+            include=include.split(",") if include else None,
+            exclude_patterns=exclude,
+            max_file_size=max_file_size,
+            use_git=use_git,
+            jobs=jobs,
+        )
+        for line in render_usage(usage, depth, sort, show_files):
+            console.print(line, markup=False, highlight=False)
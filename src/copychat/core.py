@@ -1,12 +1,26 @@
+from collections import deque
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Optional
-import pathspec
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, TypeVar
 import subprocess
 from enum import Enum
 import os
+import re
+import threading
+import time
 
+from . import timings
+from .ignore import GitignoreChain, IgnoreMatcher, has_negations
 from .patterns import DEFAULT_EXTENSIONS, EXCLUDED_DIRS, EXCLUDED_PATTERNS
 
+if TYPE_CHECKING:
+    # Imported lazily at runtime to keep CLI startup fast
+    import pathspec
+
+    from .manifest import Manifest
+
+T = TypeVar("T")
+
 
 class DiffMode(Enum):
     FULL = "full"  # All files as-is
@@ -15,6 +29,57 @@ class DiffMode(Enum):
     DIFF_ONLY = "diff-only"  # Only the diff chunks
 
 
+@dataclass
+class ScanStats:
+    """Counters collected while scanning a directory tree."""
+
+    entries: int = 0  # Directory entries listed via os.scandir
+    dirs_pruned: int = 0  # Subtrees skipped without being listed
+    files_matched: int = 0  # Files that passed all filters
+    skipped: dict[str, int] = field(default_factory=dict)  # Unread files by reason
+
+    def skip(self, reason: str) -> None:
+        """Count a file that was skipped instead of read."""
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+
+# Characters read up front to detect binary content before the full read
+SNIFF_SIZE = 8192
+
+
+class SkippedFile(Exception):
+    """A file was not read because it is too large, binary or undecodable."""
+
+    def __init__(self, path: Path, reason: str):
+        super().__init__(f"{path}: {reason}")
+        self.path = path
+        self.reason = reason
+
+
+def read_text_checked(path: Path, max_file_size: Optional[int] = None) -> str:
+    """Read a text file like Path.read_text, refusing files we can't use.
+
+    The size is checked from the open file's stat before anything is read,
+    and the first SNIFF_SIZE characters are checked for NUL bytes (binary
+    content) before reading the rest. Raises SkippedFile with the reason.
+    """
+    try:
+        with open(path) as f:
+            if (
+                max_file_size is not None
+                and os.fstat(f.fileno()).st_size > max_file_size
+            ):
+                raise SkippedFile(path, "too large")
+            head = f.read(SNIFF_SIZE)
+            if "\0" in head:
+                raise SkippedFile(path, "binary")
+            return head + f.read()
+    except UnicodeDecodeError:
+        raise SkippedFile(path, "undecodable") from None
+    except OSError:
+        raise SkippedFile(path, "unreadable") from None
+
+
 def is_glob_pattern(path: str) -> bool:
     """Check if a path contains glob patterns."""
     return "*" in path
@@ -91,10 +156,8 @@ def find_ccignore_files(start_path: Path) -> list[tuple[Path, Path]]:
     return ccignore_files
 
 
-def get_gitignore_spec(
-    path: Path, extra_patterns: Optional[list[str]] = None
-) -> pathspec.PathSpec:
-    """Load .gitignore patterns and combine with our default exclusions."""
+def _default_ignore_patterns(extra_patterns: Optional[list[str]] = None) -> list[str]:
+    """Our default exclusions plus any extra patterns."""
     patterns = list(EXCLUDED_PATTERNS)
 
     # Add directory exclusions
@@ -104,6 +167,29 @@ def get_gitignore_spec(
     # Add any extra patterns provided
     if extra_patterns:
         patterns.extend(extra_patterns)
+    return patterns
+
+
+@timings.timed("ignore")
+def get_default_spec(
+    extra_patterns: Optional[list[str]] = None,
+) -> "pathspec.PathSpec":
+    """Build a spec of the default exclusions and extra patterns, without .gitignore."""
+    import pathspec
+
+    return pathspec.PathSpec.from_lines(
+        "gitwildmatch", _default_ignore_patterns(extra_patterns)
+    )
+
+
+@timings.timed("ignore")
+def get_gitignore_spec(
+    path: Path, extra_patterns: Optional[list[str]] = None
+) -> "pathspec.PathSpec":
+    """Load .gitignore patterns and combine with our default exclusions."""
+    import pathspec
+
+    patterns = _default_ignore_patterns(extra_patterns)
 
     # Add patterns from .gitignore if found
     gitignore_path = find_gitignore(path)
@@ -117,9 +203,10 @@ def get_gitignore_spec(
     return pathspec.PathSpec.from_lines("gitwildmatch", patterns)
 
 
+@timings.timed("ignore")
 def get_ccignore_spec(
     path: Path, extra_patterns: Optional[list[str]] = None
-) -> pathspec.PathSpec:
+) -> "pathspec.PathSpec":
     """
     Load .ccignore patterns from all applicable directories.
 
@@ -127,6 +214,8 @@ def get_ccignore_spec(
     from the most specific (closest to the path) to the most general (root).
     Patterns from more specific .ccignore files take precedence over more general ones.
     """
+    import pathspec
+
     patterns = []
 
     # Add any extra patterns provided
@@ -139,124 +228,417 @@ def get_ccignore_spec(
     # Process files from most general to most specific
     # This way, more specific patterns override more general ones
     for ccignore_path, dir_path in reversed(ccignore_files):
-        with open(ccignore_path) as f:
-            ccignore_patterns = [
-                line.strip() for line in f if line.strip() and not line.startswith("#")
-            ]
-            patterns.extend(ccignore_patterns)
+        patterns.extend(read_ignore_patterns(ccignore_path))
 
     return pathspec.PathSpec.from_lines("gitwildmatch", patterns)
 
 
-def get_git_diff(path: Path, compare_branch: Optional[str] = None) -> str:
-    """Get git diff for the given path, optionally comparing against a specific branch."""
-    try:
-        # First check if file is tracked by git
-        result = subprocess.run(
-            ["git", "ls-files", "--error-unmatch", str(path)],
+def read_ignore_patterns(ignore_file: Path) -> list[str]:
+    """Read the patterns from an ignore file, skipping blanks and comments."""
+    with open(ignore_file) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+@dataclass(frozen=True)
+class StatusOptions:
+    """How git status looks for changes, for large work trees.
+
+    untracked_cache and fsmonitor turn on git's own caches for one command
+    (``-c core.untrackedCache=true``, ``-c core.fsmonitor=true``); an
+    fsmonitor hook the repository already configures is left in place. Git
+    ignores fsmonitor where its daemon isn't supported. With
+    limit_to_paths, status and diffs only cover the paths being scanned,
+    so untracked files elsewhere in the repository aren't searched for.
+    """
+
+    untracked_cache: bool = False
+    fsmonitor: bool = False
+    limit_to_paths: bool = False
+
+
+# All of the above, for --fast-status
+FAST_STATUS = StatusOptions(untracked_cache=True, fsmonitor=True, limit_to_paths=True)
+
+
+class GitRepoContext:
+    """Git state for one repository, computed once and shared by every scan in it.
+
+    All git commands run with ``git -C <toplevel>``, so results don't depend
+    on the process's working directory. The merge base with compare_branch,
+    the set of changed files (from ``git status --porcelain=v2 -z``) and the
+    batched diffs are each computed on first use and then reused, so several
+    paths in the same repository cost one set of git calls. With
+    status.limit_to_paths they are computed per scanned path instead, unless
+    the whole repository's are already known. Get contexts from a
+    RepoContexts, which keeps one per repository, branch and options.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        compare_branch: Optional[str] = None,
+        status: StatusOptions = StatusOptions(),
+    ):
+        self.root = root
+        self.compare_branch = compare_branch
+        self.status = status
+        self._lock = threading.RLock()
+        self._merge_base: Optional[str] = None
+        self._status_config: Optional[list[str]] = None
+        # By pathspec ("" for the whole repository)
+        self._changed: dict[str, set[Path]] = {}
+        self._diffs: dict[str, Optional[dict[Path, str]]] = {}
+
+    def git(self, *args: str, check: bool = True) -> subprocess.CompletedProcess:
+        """Run a git command in this repository and return its text output."""
+        return subprocess.run(
+            ["git", "-C", str(self.root), *args],
             capture_output=True,
             text=True,
-            check=False,  # Don't raise error for untracked files
+            check=check,
         )
-        if result.returncode != 0:
-            return ""  # File is not tracked by git
-
-        # Get the diff, either against the index (default) or specified branch
-        if compare_branch:
-            # First get the merge base
-            merge_base = subprocess.run(
-                ["git", "merge-base", "HEAD", compare_branch],
-                capture_output=True,
-                text=True,
-                check=True,
-            ).stdout.strip()
-
-            # Then do the diff against the merge base
-            result = subprocess.run(
-                ["git", "diff", merge_base, "--", str(path)],
-                capture_output=True,
-                text=True,
-                check=False,
-            )
-        else:
-            result = subprocess.run(
-                ["git", "diff", "--", str(path)],  # Removed --exit-code
-                capture_output=True,
-                text=True,
-                check=False,
-            )
-        return result.stdout  # Return output regardless of return code
 
-    except subprocess.CalledProcessError:
-        return ""
+    @property
+    def merge_base(self) -> Optional[str]:
+        """Merge base of HEAD and compare_branch, or None if there isn't one."""
+        if self.compare_branch and self._merge_base is None:
+            with self._lock:
+                if self._merge_base is None:
+                    try:
+                        self._merge_base = self.git(
+                            "merge-base", "HEAD", self.compare_branch
+                        ).stdout.strip()
+                    except subprocess.CalledProcessError:
+                        self._merge_base = ""
+        return self._merge_base or None
+
+    def _config_args(self) -> list[str]:
+        """``-c`` options enabling the requested status caches."""
+        if self._status_config is None:
+            args = []
+            if self.status.untracked_cache:
+                args += ["-c", "core.untrackedCache=true"]
+            if self.status.fsmonitor:
+                configured = self.git("config", "--get", "core.fsmonitor", check=False)
+                if not configured.stdout.strip():
+                    args += ["-c", "core.fsmonitor=true"]
+            self._status_config = args
+        return self._status_config
+
+    def _pathspec(self, path: Optional[Path]) -> str:
+        """path relative to the toplevel if status is limited to it, else ""."""
+        if path is None or not self.status.limit_to_paths or not path.exists():
+            return ""
+        try:
+            rel = path.resolve().relative_to(self.root).as_posix()
+        except ValueError:
+            return ""
+        return "" if rel == "." else rel
+
+    def _limited(self, spec: str) -> list[str]:
+        return ["--", spec] if spec else []
+
+    def _under(self, spec: str) -> Callable[[Path], bool]:
+        prefix = str(self.root / spec)
+        return lambda p: str(p) == prefix or str(p).startswith(prefix + os.sep)
+
+    @timings.timed("git")
+    def changed_files(self, path: Optional[Path] = None) -> set[Path]:
+        """Files with staged, unstaged or untracked changes (and, with a
+        compare branch, files changed since the merge base), as resolved paths.
+
+        With status.limit_to_paths, only files under path are listed.
+        """
+        spec = self._pathspec(path)
+        with self._lock:
+            changed = self._changed.get(spec)
+            if changed is None:
+                if spec and "" in self._changed:
+                    under = self._under(spec)
+                    changed = {p for p in self._changed[""] if under(p)}
+                else:
+                    changed = self._list_changed(spec)
+                self._changed[spec] = changed
+        return changed
 
+    def _list_changed(self, spec: str) -> set[Path]:
+        try:
+            paths = _parse_porcelain_v2(
+                self.git(
+                    "--literal-pathspecs",
+                    *self._config_args(),
+                    "status",
+                    "--porcelain=v2",
+                    "-z",
+                    "--untracked-files=all",
+                    *self._limited(spec),
+                ).stdout
+            )
+            if self.compare_branch:
+                merge_base = self.merge_base
+                if merge_base is None:
+                    return set()
+                committed = self.git(
+                    "--literal-pathspecs",
+                    "diff",
+                    "-z",
+                    "--name-only",
+                    "--no-renames",
+                    merge_base,
+                    "HEAD",
+                    *self._limited(spec),
+                ).stdout
+                paths.extend(p for p in committed.split("\0") if p)
+        except subprocess.CalledProcessError:
+            return set()
+        return {(self.root / filepath).resolve() for filepath in paths}
+
+    @timings.timed("git")
+    def diffs(self, path: Optional[Path] = None) -> Optional[dict[Path, str]]:
+        """Diffs for every changed file with one ``git diff``.
+
+        Returns a mapping of absolute path to the same text diff() returns
+        for that path, or None if the batched diff could not be produced.
+        With status.limit_to_paths, only files under path are diffed.
+        """
+        spec = self._pathspec(path)
+        with self._lock:
+            if spec not in self._diffs:
+                whole = self._diffs.get("")
+                if spec and whole is not None:
+                    under = self._under(spec)
+                    self._diffs[spec] = {p: d for p, d in whole.items() if under(p)}
+                else:
+                    self._diffs[spec] = self._batched_diffs(spec)
+            return self._diffs[spec]
+
+    def _batched_diffs(self, spec: str) -> Optional[dict[Path, str]]:
+        # Diff against the index (default) or the merge base with the branch
+        cmd = ["--literal-pathspecs", "diff", "-z", "--no-renames", "--raw", "-p"]
+        if self.compare_branch:
+            merge_base = self.merge_base
+            if merge_base is None:
+                return {}  # No merge base means no diffs, as in diff()
+            cmd.append(merge_base)
+        try:
+            output = self.git(*cmd, *self._limited(spec)).stdout
+            return {
+                self.root / filepath: diff
+                for filepath, diff in _split_git_diff(output).items()
+            }
+        except (subprocess.CalledProcessError, ValueError):
+            return None
 
-def get_changed_files(compare_branch: Optional[str] = None) -> set[Path]:
-    """Get set of files that have changes according to git."""
+    @timings.timed("git")
+    def diff(self, path: Path) -> str:
+        """Diff for one path, or "" if it is untracked or unchanged."""
+        # First check if file is tracked by git
+        if self.git(
+            "ls-files", "--error-unmatch", "--", str(path), check=False
+        ).returncode:
+            return ""
+        if self.compare_branch:
+            merge_base = self.merge_base
+            if merge_base is None:
+                return ""
+            return self.git("diff", merge_base, "--", str(path), check=False).stdout
+        # Against the index
+        return self.git("diff", "--", str(path), check=False).stdout
+
+
+def _parse_porcelain_v2(output: str) -> list[str]:
+    """Paths from ``git status --porcelain=v2 -z`` output.
+
+    Ordinary ("1") entries have 8 fields before the path, renames and
+    copies ("2") have 9 and are followed by the original path as a separate
+    record, unmerged ("u") entries have 10, and untracked ("?") entries are
+    just the path. With -z, paths are never quoted.
+    """
+    paths = []
+    records = iter(output.split("\0"))
+    for record in records:
+        kind = record[:1]
+        if kind == "1":
+            paths.append(record.split(" ", 8)[8])
+        elif kind == "2":
+            paths.append(record.split(" ", 9)[9])
+            next(records, None)  # The original path
+        elif kind == "u":
+            paths.append(record.split(" ", 10)[10])
+        elif kind == "?":
+            paths.append(record[2:])
+    return paths
+
+
+def find_repo_root(path: Path) -> Optional[Path]:
+    """Toplevel of the git work tree containing path, or None."""
+    toplevel = _show_toplevel(_lookup_dir(path))
+    return Path(toplevel) if toplevel else None
+
+
+def _lookup_dir(path: Path) -> Path:
+    """The closest existing directory at or above path."""
+    start = path.absolute()
+    # Files and patterns that don't exist yet are looked up by directory
+    while not start.is_dir() and start != start.parent:
+        start = start.parent
+    return start
+
+
+def _show_toplevel(directory: Path) -> Optional[str]:
     try:
-        # First get the git root directory
-        git_root = subprocess.run(
-            ["git", "rev-parse", "--show-toplevel"],
+        toplevel = subprocess.run(
+            ["git", "-C", str(directory), "rev-parse", "--show-toplevel"],
             capture_output=True,
             text=True,
             check=True,
         ).stdout.strip()
-        git_root_path = Path(git_root)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return toplevel or None
 
-        if compare_branch:
-            # Get all changes between current branch and compare branch
-            result = subprocess.run(
-                [
-                    "git",
-                    "diff",
-                    "--name-status",
-                    f"{compare_branch}...HEAD",  # Use triple dot to compare branches
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            # Also get any unstaged/uncommitted changes
-            unstaged_result = subprocess.run(
-                ["git", "status", "--porcelain"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            # Combine both results
-            combined_output = result.stdout + unstaged_result.stdout
-        else:
-            # Get both staged and unstaged changes (current behavior)
-            combined_output = subprocess.run(
-                ["git", "status", "--porcelain"],
-                capture_output=True,
-                text=True,
-                check=True,
-            ).stdout
-
-        changed = set()
-        for line in combined_output.splitlines():
-            if not line.strip():
-                continue
 
-            # Split on tab or space to handle both formats
-            parts = line.split(None, 1)  # Split on whitespace, max 1 split
-            if len(parts) < 2:
-                continue
+class RepoContexts:
+    """The GitRepoContexts shared by the git lookups of one scan or run.
 
-            status, filepath = parts
+    Each repository's status and diffs are read at most once per instance,
+    so scanning several paths in it costs one set of git calls. Later
+    changes to the work tree are only seen by a new instance.
+    """
 
-            # Handle renamed files (they have arrow notation)
-            if " -> " in filepath:
-                filepath = filepath.split(" -> ")[-1]
+    def __init__(self):
+        # By (toplevel, compare branch, status options)
+        self._contexts: dict[
+            tuple[str, Optional[str], StatusOptions], GitRepoContext
+        ] = {}
+        # Toplevels by directory
+        self._toplevels: dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def find_root(self, path: Path) -> Optional[Path]:
+        """Like find_repo_root, but each directory is looked up once."""
+        start = _lookup_dir(path)
+        key = str(start)
+        if key not in self._toplevels:
+            self._toplevels[key] = _show_toplevel(start)
+        toplevel = self._toplevels[key]
+        return Path(toplevel) if toplevel else None
+
+    def get(
+        self,
+        path: Optional[Path] = None,
+        compare_branch: Optional[str] = None,
+        status: StatusOptions = StatusOptions(),
+    ) -> Optional[GitRepoContext]:
+        """The context for the repository containing path (default: the
+        current directory), or None if path isn't in a git work tree.
+        """
+        root = self.find_root(path if path is not None else Path.cwd())
+        if root is None:
+            return None
+        key = (str(root), compare_branch, status)
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is None:
+                context = self._contexts[key] = GitRepoContext(
+                    root, compare_branch, status
+                )
+        return context
 
-            # Convert relative path to absolute using git root
-            abs_path = (git_root_path / filepath).resolve()
-            changed.add(abs_path)
 
-        return changed
-    except subprocess.CalledProcessError:
-        return set()
+def get_repo_context(
+    path: Optional[Path] = None,
+    compare_branch: Optional[str] = None,
+    status: StatusOptions = StatusOptions(),
+    repos: Optional[RepoContexts] = None,
+) -> Optional[GitRepoContext]:
+    """The GitRepoContext for the repository containing path (default: the
+    current directory), or None if path isn't in a git work tree.
+
+    The context comes from repos, if given, and is otherwise new.
+    """
+    return (repos if repos is not None else RepoContexts()).get(
+        path, compare_branch, status
+    )
+
+
+def get_git_diff(
+    path: Path,
+    compare_branch: Optional[str] = None,
+    repos: Optional[RepoContexts] = None,
+) -> str:
+    """Get git diff for the given path, optionally comparing against a specific branch."""
+    context = get_repo_context(path, compare_branch, repos=repos)
+    if context is None:
+        return ""
+    try:
+        return context.diff(path)
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _split_git_diff(output: str) -> dict[str, str]:
+    """Split ``git diff -z --raw -p`` output into per-file patch sections.
+
+    The raw records come first (``:meta\\0path\\0`` each, terminated by an
+    extra NUL), followed by one ``diff --git`` section per record in the
+    same order. Deleted paths are left out because get_git_diff never
+    reports a diff for them: they are either missing from the work tree or
+    no longer tracked.
+    """
+    raw, sep, patch = output.partition("\0\0")
+    if not sep:
+        return {}
+
+    records = raw.split("\0")
+    # Pair each ":meta" record with the path that follows it
+    entries = list(zip(records[0::2], records[1::2]))
+    sections = re.split(r"^(?=diff --git )", patch, flags=re.MULTILINE)
+    sections = [section for section in sections if section]
+    if len(sections) != len(entries):
+        raise ValueError("Unexpected git diff output")
+
+    diffs = {}
+    for (meta, filepath), section in zip(entries, sections):
+        if meta.split()[-1] == "D":
+            continue
+        diffs[filepath] = section
+    return diffs
+
+
+def get_git_diffs(
+    compare_branch: Optional[str] = None,
+    path: Optional[Path] = None,
+    status: StatusOptions = StatusOptions(),
+    repos: Optional[RepoContexts] = None,
+) -> Optional[dict[Path, str]]:
+    """Get diffs for every changed file in the repository with one git diff.
+
+    The repository is the one containing path (default: the current
+    directory). Returns a mapping of absolute path to the same text
+    get_git_diff returns for that path, or None if the batched diff could
+    not be produced. With status.limit_to_paths, only path is diffed.
+    Lookups sharing repos reuse its git state.
+    """
+    context = get_repo_context(path, compare_branch, status, repos)
+    return context.diffs(path) if context is not None else None
+
+
+def get_changed_files(
+    compare_branch: Optional[str] = None,
+    path: Optional[Path] = None,
+    status: StatusOptions = StatusOptions(),
+    repos: Optional[RepoContexts] = None,
+) -> set[Path]:
+    """Get set of files that have changes according to git.
+
+    The repository is the one containing path (default: the current
+    directory). Its status is read once per repos (RepoContexts), or on
+    every call without one. See StatusOptions for making git status faster
+    in large work trees.
+    """
+    context = get_repo_context(path, compare_branch, status, repos)
+    return context.changed_files(path) if context is not None else set()
 
 
 def get_file_content(
@@ -264,26 +646,62 @@ def get_file_content(
     diff_mode: DiffMode,
     changed_files: Optional[set[Path]] = None,
     compare_branch: Optional[str] = None,
+    git_diffs: Optional[dict[Path, str]] = None,
+    max_file_size: Optional[int] = None,
+    stats: Optional[ScanStats] = None,
 ) -> Optional[str]:
-    """Get file content based on diff mode."""
+    """Get file content based on diff mode.
+
+    If git_diffs (from get_git_diffs) is given, diffs are looked up there
+    instead of running git for this file. Files larger than max_file_size,
+    binary or undecodable files return None and are counted in stats.
+    """
     if not path.is_file():
         return None
 
+    try:
+        return _read_file_content(
+            path, diff_mode, changed_files, compare_branch, git_diffs, max_file_size
+        )
+    except SkippedFile as e:
+        if stats is not None:
+            stats.skip(e.reason)
+        return None
+
+
+def _read_file_content(
+    path: Path,
+    diff_mode: DiffMode,
+    changed_files: Optional[set[Path]] = None,
+    compare_branch: Optional[str] = None,
+    git_diffs: Optional[dict[Path, str]] = None,
+    max_file_size: Optional[int] = None,
+) -> Optional[str]:
+    """Read content for a path already known to be a regular file.
+
+    Raises SkippedFile if the file fails the size or binary checks.
+    """
     # Get content
-    content = path.read_text()
+    with timings.span("read", str(path)):
+        content = read_text_checked(path, max_file_size)
 
     # Return full content immediately if that's what we want
     if diff_mode == DiffMode.FULL:
         return content
 
+    def _diff() -> str:
+        if git_diffs is not None:
+            return git_diffs.get(path.absolute(), "")
+        return get_git_diff(path, compare_branch)
+
     # Check if file has changes and get diff if needed
     if changed_files is not None:
         has_changes = path in changed_files
         # Get diff here so we can use it for all diff modes
-        diff = get_git_diff(path, compare_branch) if has_changes else ""
+        diff = _diff() if has_changes else ""
     else:
         # Get diff first, then check if there are changes
-        diff = get_git_diff(path, compare_branch)
+        diff = _diff()
         has_changes = bool(diff)
 
     # Handle different modes
@@ -301,6 +719,385 @@ def get_file_content(
     return None
 
 
+# Per-directory ignore files, applied below the directory they're in
+IGNORE_FILES = (".gitignore", ".ccignore")
+
+
+@dataclass
+class _DirRules:
+    """Ignore rules in effect for a directory during walk_files.
+
+    A subdirectory gets a copy extended with its own .gitignore and
+    .ccignore, so each ignore file is read and compiled once per walk.
+    """
+
+    git_spec: "pathspec.PathSpec"  # Defaults, exclude patterns, top .gitignore
+    git_levels: tuple  # Nested .gitignore files as (relative dir, spec)
+    cc_spec: "pathspec.PathSpec"
+    git_matcher: IgnoreMatcher  # Git rules only, the base for rebuilding matcher
+    matcher: IgnoreMatcher  # Git and ccignore rules, for directories and files
+
+    @classmethod
+    def for_root(
+        cls, git_spec: "pathspec.PathSpec", cc_spec: "pathspec.PathSpec"
+    ) -> "_DirRules":
+        """Rules at the scan root, from its git and ccignore specs."""
+        return cls(
+            git_spec=git_spec,
+            git_levels=(),
+            cc_spec=cc_spec,
+            git_matcher=IgnoreMatcher([git_spec]),
+            matcher=IgnoreMatcher([git_spec, cc_spec]),
+        )
+
+    def with_ignore_file(self, rel_dir: str, ignore_file: Path) -> "_DirRules":
+        """Add the .gitignore or .ccignore found in rel_dir."""
+        import pathspec
+
+        spec = pathspec.PathSpec.from_lines(
+            "gitwildmatch", read_ignore_patterns(ignore_file)
+        )
+        if ignore_file.name == ".gitignore":
+            return self.with_gitignore(rel_dir, spec)
+        return self.with_ccignore(spec)
+
+    def with_gitignore(self, rel_dir: str, spec: "pathspec.PathSpec") -> "_DirRules":
+        """Add a nested .gitignore whose patterns are relative to rel_dir."""
+        levels = self.git_levels + ((rel_dir, spec),)
+        if has_negations(spec):
+            # "!" rules can re-include what a parent ignores: match in git's order
+            git_matcher = IgnoreMatcher([GitignoreChain(self.git_spec, levels)])
+            matcher = git_matcher.extend(self.cc_spec)
+        else:
+            git_matcher = self.git_matcher.extend_scoped(rel_dir, spec)
+            matcher = self.matcher.extend_scoped(rel_dir, spec)
+        return replace(
+            self, git_levels=levels, git_matcher=git_matcher, matcher=matcher
+        )
+
+    def with_ccignore(self, spec: "pathspec.PathSpec") -> "_DirRules":
+        """Add a directory's own .ccignore."""
+        # Later patterns take precedence, as in get_ccignore_spec
+        cc_spec = self.cc_spec + spec
+        if has_negations(spec):
+            # "!" rules can re-include paths, so rebuild
+            matcher = self.git_matcher.extend(cc_spec)
+        else:
+            matcher = self.matcher.extend(spec)
+        return replace(self, cc_spec=cc_spec, matcher=matcher)
+
+
+class IgnoreRules:
+    """The ignore rules walk_files applies, resolved per directory on demand.
+
+    For matching paths below root without walking the tree (list_git_files
+    and --watch). Each directory's rules are its parent's extended with its
+    own ignore files, as listed by ignore_files(rel_dir) (by default any
+    .gitignore and .ccignore in it), and are compiled once. Relative paths
+    use "/" separators.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        git_spec: "pathspec.PathSpec",
+        exclude_patterns: Optional[list[str]] = None,
+        max_depth: Optional[int] = None,
+        ignore_files: Optional[Callable[[str], Iterable[Path]]] = None,
+    ):
+        self.root = root
+        self.max_depth = max_depth
+        self._ignore_files = ignore_files or self._own_ignore_files
+        with timings.span("ignore"):
+            cc_spec = get_ccignore_spec(root, exclude_patterns)
+        self._rules = {"": _DirRules.for_root(git_spec, cc_spec)}
+        self._excluded = {"": False}
+
+    def _own_ignore_files(self, rel_dir: str) -> list[Path]:
+        return [
+            path
+            for name in IGNORE_FILES
+            for path in (self.root / rel_dir / name,)
+            if path.is_file()
+        ]
+
+    def _rules_for(self, rel_dir: str) -> _DirRules:
+        rules = self._rules.get(rel_dir)
+        if rules is None:
+            rules = self._rules_for(rel_dir.rpartition("/")[0])
+            for ignore_file in self._ignore_files(rel_dir):
+                with timings.span("ignore"):
+                    rules = rules.with_ignore_file(rel_dir, ignore_file)
+            self._rules[rel_dir] = rules
+        return rules
+
+    def excludes_dir(self, rel_dir: str) -> bool:
+        """Whether walk_files would prune rel_dir (or one of its parents)."""
+        excluded = self._excluded.get(rel_dir)
+        if excluded is None:
+            parent = rel_dir.rpartition("/")[0]
+            excluded = (
+                self.excludes_dir(parent)
+                or (self.max_depth is not None and rel_dir.count("/") >= self.max_depth)
+                or self._rules_for(parent).matcher.match_file(rel_dir + "/")
+                or self._rules_for(rel_dir).matcher.match_file(rel_dir + "/")
+            )
+            self._excluded[rel_dir] = excluded
+        return excluded
+
+    def excludes_file(self, rel: str) -> bool:
+        """Whether the file at rel is ignored, or in a pruned directory."""
+        rel_dir = rel.rpartition("/")[0]
+        return self.excludes_dir(rel_dir) or self._rules_for(
+            rel_dir
+        ).matcher.match_file(rel)
+
+
+def walk_files(
+    root: Path,
+    include_set: set[str],
+    git_spec: "pathspec.PathSpec",
+    exclude_patterns: Optional[list[str]] = None,
+    max_depth: Optional[int] = None,
+    stats: Optional[ScanStats] = None,
+    manifest: Optional["Manifest"] = None,
+) -> Iterator[tuple[Path, str]]:
+    """Yield (path, relative path) for files under root that pass all filters.
+
+    Directories that are ignored (by git or .ccignore rules) or deeper than
+    max_depth are pruned before they are listed, so nothing below them is
+    ever visited; as in git, ignore files inside them aren't read. Files are
+    classified from the cached os.DirEntry type information, so callers
+    don't need to stat them again.
+
+    The ccignore spec is built once for root (including ancestor .ccignore
+    files) and then inherited: each subdirectory extends its parent's
+    compiled rules with its own .ccignore and .gitignore, found in the
+    listing, if any. Nested .gitignore patterns are relative to their own
+    directory and the deepest matching file wins, as in git. Files are
+    checked against all of these rules together with one IgnoreMatcher.
+
+    With a manifest, directories whose mtime hasn't changed since the last
+    run aren't listed again; their stored listing is used instead.
+    """
+    stats = stats if stats is not None else ScanStats()
+    recorder = timings.get_recorder()
+
+    with timings.span("ignore"):
+        root_rules = _DirRules.for_root(
+            git_spec, get_ccignore_spec(root, exclude_patterns)
+        )
+
+    # Depth-first stack of (directory, relative path, depth, inherited ignore
+    # rules); subdirectories are pushed in reverse so they're visited in
+    # listing order like os.walk
+    stack = [(root, "", 0, root_rules)]
+    while stack:
+        dir_path, rel_root, depth, rules = stack.pop()
+
+        try:
+            with timings.span("walk"):
+                if manifest is not None:
+                    entries = manifest.list_dir(str(dir_path))
+                else:
+                    with os.scandir(dir_path) as it:
+                        entries = list(it)
+        except OSError:
+            continue  # Unreadable directory, skip it like os.walk does
+
+        if rel_root:
+            # Add this directory's own ignore files (the root's are already
+            # included)
+            for entry in entries:
+                if entry.name not in IGNORE_FILES:
+                    continue
+                if not entry.is_file():
+                    continue
+                with timings.span("ignore"):
+                    rules = rules.with_ignore_file(rel_root, Path(entry.path))
+
+            # A directory's own .ccignore may exclude it (the parent's rules
+            # were already checked before it was listed)
+            if rules.matcher.match_file(rel_root + "/"):
+                stats.dirs_pruned += 1
+                continue
+
+        matcher = rules.matcher
+
+        subdirs = []
+        for entry in entries:
+            stats.entries += 1
+            # Build relative path string directly
+            rel_path_str = (
+                os.path.join(rel_root, entry.name) if rel_root else entry.name
+            )
+
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                # Don't follow symlinked directories (os.walk default)
+                if entry.is_symlink():
+                    continue
+                # Prune subtrees that are too deep or ignored before listing them
+                if max_depth is not None and depth + 1 > max_depth:
+                    stats.dirs_pruned += 1
+                    continue
+                if matcher.match_file(rel_path_str + "/"):
+                    stats.dirs_pruned += 1
+                    continue
+                subdirs.append((Path(entry.path), rel_path_str, depth + 1, rules))
+                continue
+
+            # Quick extension check before more expensive operations
+            ext = os.path.splitext(entry.name)[1].lower()
+            if ext not in include_set:
+                continue
+
+            # Check both gitignore and ccignore patterns (timed without a span
+            # per file, which would cost more than the match itself)
+            if recorder is not None:
+                start = time.perf_counter()
+            ignored = matcher.match_file(rel_path_str)
+            if recorder is not None:
+                recorder.add("ignore", time.perf_counter() - start)
+            if ignored:
+                continue
+
+            try:
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            stats.files_matched += 1
+            yield Path(entry.path), rel_path_str
+
+        stack.extend(reversed(subdirs))
+
+
+@timings.timed("walk")
+def list_git_files(
+    root: Path,
+    include_set: set[str],
+    exclude_patterns: Optional[list[str]] = None,
+    max_depth: Optional[int] = None,
+    stats: Optional[ScanStats] = None,
+) -> Optional[list[tuple[Path, str]]]:
+    """List files under root using git's index instead of walking the tree.
+
+    Runs ``git ls-files --cached --others --exclude-standard`` once, so git
+    applies its own ignore rules (every .gitignore, .git/info/exclude and
+    the global excludes file). The extension filter, max_depth, the default
+    exclusions, exclude_patterns and .ccignore files are then applied in
+    memory with the same rules and precedence as walk_files. Tracked files
+    are listed even if a .gitignore matches them, as in git. Listed paths
+    aren't stat()ed: files deleted from the work tree are dropped using
+    git's own --deleted listing.
+
+    Returns (path, relative path) pairs sorted by path, or None if root is
+    not inside a git work tree.
+    """
+    try:
+        result = subprocess.run(
+            [
+                "git",
+                "-C",
+                str(root),
+                "ls-files",
+                "-z",
+                "-t",
+                "--cached",
+                "--deleted",
+                "--others",
+                "--exclude-standard",
+            ],
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    stats = stats if stats is not None else ScanStats()
+    # Each record is "<tag> <path>". Files deleted from the work tree are
+    # still in the index, so they're listed again with the "R" tag; dropping
+    # those means listed files never need to be stat()ed
+    present = {}
+    deleted = set()
+    for record in result.stdout.split(b"\0"):
+        if not record:
+            continue
+        rel = os.fsdecode(record[2:])
+        if record[:1] == b"R":
+            deleted.add(rel)
+        else:
+            present[rel] = None  # Unmerged paths are listed once per stage
+    listed = sorted(rel for rel in present if rel not in deleted)
+    stats.entries += len(listed)
+
+    # Directories with their own .ccignore (the root's is loaded with its
+    # ancestors by get_ccignore_spec)
+    ccignore_dirs = {
+        rel.rpartition("/")[0] for rel in listed if rel.endswith("/.ccignore")
+    }
+
+    with timings.span("ignore"):
+        default_spec = get_default_spec(exclude_patterns)
+    # Git applied the .gitignore files; only the .ccignore files are left
+    rules = IgnoreRules(
+        root,
+        default_spec,
+        exclude_patterns,
+        ignore_files=lambda rel_dir: (
+            [root / rel_dir / ".ccignore"] if rel_dir in ccignore_dirs else []
+        ),
+    )
+
+    root_str = str(root)
+    files = []
+    for rel in listed:
+        rel_dir, _, name = rel.rpartition("/")
+        if max_depth is not None and rel.count("/") > max_depth:
+            continue
+        if os.path.splitext(name)[1].lower() not in include_set:
+            continue
+        if rules.excludes_file(rel):
+            continue
+        stats.files_matched += 1
+        files.append((Path(os.path.join(root_str, rel)), rel))
+    return files
+
+
+def read_pipelined(
+    paths: Iterable[Path],
+    read: Callable[[Path], T],
+    jobs: int,
+    queue_depth: Optional[int] = None,
+) -> Iterator[tuple[Path, T]]:
+    """Read paths on a thread pool, yielding (path, read(path)) in input order.
+
+    At most queue_depth reads (default: 4 per worker) are in flight or
+    waiting to be consumed, so memory is bounded by the queue rather than by
+    the number of paths. paths is consumed lazily, letting a directory walk
+    continue while earlier files are being read.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    queue_depth = queue_depth or jobs * 4
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for path in paths:
+            pending.append((path, executor.submit(read, path)))
+            if len(pending) >= queue_depth:
+                done_path, future = pending.popleft()
+                yield done_path, future.result()
+        while pending:
+            done_path, future = pending.popleft()
+            yield done_path, future.result()
+
+
 def scan_directory(
     path: Path,
     include: Optional[list[str]] = None,
@@ -308,13 +1105,107 @@ def scan_directory(
     diff_mode: DiffMode = DiffMode.FULL,
     max_depth: Optional[int] = None,
     compare_branch: Optional[str] = None,
+    stats: Optional[ScanStats] = None,
+    jobs: Optional[int] = None,
+    max_file_size: Optional[int] = None,
+    use_git: bool = False,
+    manifest: Optional["Manifest"] = None,
+    git_status: StatusOptions = StatusOptions(),
+    repos: Optional[RepoContexts] = None,
 ) -> dict[Path, str]:
-    """Scan directory for files to process."""
-    # Get changed files upfront if we're using a diff mode
-    changed_files = (
-        get_changed_files(compare_branch) if diff_mode != DiffMode.FULL else None
+    """Scan directory for files to process.
+
+    With jobs > 1, files are read on a bounded thread pool while the walk
+    continues; results keep the same order as a serial scan. Files larger
+    than max_file_size bytes, binary files and files that can't be decoded
+    are skipped and counted in stats.skipped by reason. With use_git, files
+    inside a git work tree are listed by list_git_files instead of walking
+    the directory; outside a repository the walker is used.
+
+    With a manifest (see copychat.manifest), unchanged directories aren't
+    listed again and, in full diff mode, files whose size and mtime match
+    the previous run are taken from the manifest instead of being read.
+    git_status controls how diff modes find changed files (see StatusOptions).
+    Scans sharing repos (a RepoContexts) read each repository's git state
+    once between them; otherwise it is read for this scan.
+    """
+    stats = stats if stats is not None else ScanStats()
+    repos = repos if repos is not None else RepoContexts()
+
+    # Get changed files and their diffs upfront if we're using a diff mode
+    changed_files = None
+    git_diffs = None
+    if diff_mode != DiffMode.FULL:
+        # Diffs come from the repository being scanned, not the current one
+        changed_files = get_changed_files(compare_branch, Path(path), git_status, repos)
+        git_diffs = (
+            get_git_diffs(compare_branch, Path(path), git_status, repos)
+            if changed_files
+            else {}
+        )
+
+    result = {}
+    candidates = iter_scan_files(
+        path, include, exclude_patterns, max_depth, stats, use_git, manifest
     )
+    # Stored content is only valid for the full file, not for diffs
+    reuse_content = manifest is not None and diff_mode == DiffMode.FULL
+
+    def read(file_path: Path) -> tuple[Optional[str], Optional[str]]:
+        # Get content based on diff mode, returning (content, skip reason);
+        # skips are counted by the consumer so workers share no state
+        if reuse_content:
+            try:
+                record, st = manifest.lookup(str(file_path))
+            except OSError:
+                return None, "unreadable"
+            if record is not None:
+                if max_file_size is not None and record.size > max_file_size:
+                    return None, "too large"
+                return record.content, None
+        try:
+            content = _read_file_content(
+                file_path,
+                diff_mode,
+                changed_files,
+                compare_branch,
+                git_diffs,
+                max_file_size,
+            )
+        except SkippedFile as e:
+            return None, e.reason
+        if reuse_content and content is not None:
+            manifest.update(str(file_path), st, content)
+        return content, None
+
+    if jobs is not None and jobs > 1:
+        contents = read_pipelined(candidates, read, jobs)
+    else:
+        contents = ((file_path, read(file_path)) for file_path in candidates)
+
+    for file_path, (content, skip_reason) in contents:
+        if skip_reason is not None:
+            stats.skip(skip_reason)
+        elif content is not None:
+            result[file_path] = content
 
+    return result
+
+
+def iter_scan_files(
+    path: Path,
+    include: Optional[list[str]] = None,
+    exclude_patterns: Optional[list[str]] = None,
+    max_depth: Optional[int] = None,
+    stats: Optional[ScanStats] = None,
+    use_git: bool = False,
+    manifest: Optional["Manifest"] = None,
+) -> Iterator[Path]:
+    """Yield the files scan_directory would read, without reading them.
+
+    path may be a file, a directory or a glob pattern. A manifest is used
+    for directory listings when walking (git listings don't need it).
+    """
     # Convert string paths to Path objects and handle globs
     if isinstance(path, str):
         if is_glob_pattern(path):
@@ -324,21 +1215,14 @@ def scan_directory(
     else:
         paths = [path]
 
-    result = {}
-
     # Pre-compute extension set
     include_set = {f".{ext.lstrip('.')}" for ext in (include or DEFAULT_EXTENSIONS)}
 
     for current_path in paths:
         if current_path.is_file():
             # For single files, just check if it matches filters
-            if include and current_path.suffix.lstrip(".") not in include:
-                continue
-            content = get_file_content(
-                current_path, diff_mode, changed_files, compare_branch
-            )
-            if content is not None:
-                result[current_path] = content
+            if not include or current_path.suffix.lstrip(".") in include:
+                yield current_path
             continue
 
         # Convert to absolute path once
@@ -346,69 +1230,28 @@ def scan_directory(
         if not abs_path.exists():
             continue
 
-        # Get gitignore spec once for the starting directory
-        git_spec = get_gitignore_spec(abs_path, exclude_patterns)
-
-        # Use os.walk for better performance than rglob
-        for root, _, files in os.walk(abs_path):
-            root_path = Path(root)
-
-            # Check depth if max_depth is specified
-            if max_depth is not None:
-                try:
-                    # Calculate current depth relative to the starting path
-                    rel_path = root_path.relative_to(abs_path)
-                    current_depth = len(rel_path.parts)
-                    if current_depth > max_depth:
-                        continue
-                except ValueError:
-                    continue
-
-            # Get relative path once per directory
-            try:
-                rel_root = str(root_path.relative_to(abs_path))
-                if rel_root == ".":
-                    rel_root = ""
-            except ValueError:
-                continue
-
-            # Get ccignore spec for the current directory (to handle hierarchical patterns)
-            cc_spec = get_ccignore_spec(root_path, exclude_patterns)
-
-            # Check if directory should be skipped (via gitignore or ccignore)
-            if rel_root:
-                dir_path = rel_root + "/"
-                if git_spec.match_file(dir_path) or cc_spec.match_file(dir_path):
-                    continue
-
-            for filename in files:
-                # Quick extension check before more expensive operations
-                ext = Path(filename).suffix.lower()
-                if ext not in include_set:
-                    continue
-
-                # Build relative path string directly
-                rel_path_str = (
-                    os.path.join(rel_root, filename) if rel_root else filename
-                )
-
-                # Check both gitignore and ccignore patterns
-                if git_spec.match_file(rel_path_str) or cc_spec.match_file(
-                    rel_path_str
-                ):
-                    continue
-
-                # Only create Path object if file passes all filters
-                file_path = root_path / filename
-
-                # Get content based on diff mode
-                content = get_file_content(
-                    file_path, diff_mode, changed_files, compare_branch
-                )
-                if content is not None:
-                    result[file_path] = content
+        listed = None
+        if use_git:
+            listed = list_git_files(
+                abs_path, include_set, exclude_patterns, max_depth, stats
+            )
+        if manifest is not None:
+            manifest.load_root(abs_path)
+        if listed is None:
+            # Get gitignore spec once for the starting directory
+            git_spec = get_gitignore_spec(abs_path, exclude_patterns)
+            listed = walk_files(
+                abs_path,
+                include_set,
+                git_spec,
+                exclude_patterns,
+                max_depth,
+                stats,
+                manifest,
+            )
 
-    return result
+        for file_path, _ in listed:
+            yield file_path
 
 
 def scan_files(patterns: list[str], root: Path) -> set[Path]:
@@ -0,0 +1,111 @@
+"""Per-directory file, line and token rollups for `copychat du`."""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .core import ScanStats, scan_directory
+from .format import count_tokens, get_token_cache
+
+# Orders accepted by render_usage
+SORT_KEYS = ("name", "tokens")
+
+
+@dataclass
+class UsageNode:
+    """Totals for a directory (or a single file) and everything below it."""
+
+    name: str
+    is_dir: bool = True
+    files: int = 0
+    lines: int = 0
+    tokens: int = 0
+    children: dict[str, "UsageNode"] = field(default_factory=dict)
+
+    def add(self, parts: tuple[str, ...], lines: int, tokens: int) -> None:
+        """Add a file at parts (relative to this node) to every level."""
+        self.files += 1
+        self.lines += lines
+        self.tokens += tokens
+        if parts:
+            child = self.children.get(parts[0])
+            if child is None:
+                child = self.children[parts[0]] = UsageNode(
+                    parts[0], is_dir=len(parts) > 1
+                )
+            child.add(parts[1:], lines, tokens)
+
+
+def collect_usage(
+    root: Path,
+    include: Optional[list[str]] = None,
+    exclude_patterns: Optional[list[str]] = None,
+    max_file_size: Optional[int] = None,
+    use_git: bool = False,
+    jobs: Optional[int] = None,
+    stats: Optional[ScanStats] = None,
+) -> UsageNode:
+    """Scan root like scan_directory and total files, lines and tokens per directory.
+
+    Token counts come from the shared token cache where available; misses
+    are tokenized and stored for later runs.
+    """
+    files = scan_directory(
+        root,
+        include=include,
+        exclude_patterns=exclude_patterns,
+        max_file_size=max_file_size,
+        use_git=use_git,
+        jobs=jobs,
+        stats=stats,
+    )
+    paths = list(files)
+    tokens = count_tokens([files[path] for path in paths], jobs=jobs)
+    get_token_cache().flush()
+
+    base = root.resolve()
+    usage = UsageNode(str(root))
+    for path, count in zip(paths, tokens):
+        content = files[path]
+        try:
+            parts = path.relative_to(base).parts
+        except ValueError:
+            parts = (path.name,)
+        usage.add(parts, content.count("\n") + 1 if content else 0, count)
+    return usage
+
+
+def render_usage(
+    usage: UsageNode,
+    max_depth: Optional[int] = None,
+    sort: str = "name",
+    show_files: bool = False,
+) -> list[str]:
+    """Render usage as an indented table, one row per directory.
+
+    Directories deeper than max_depth (0 = the root only) are folded into
+    their parent's totals. With sort="tokens", the largest entries come
+    first at every level. show_files adds a row for each file.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort {sort!r}, expected one of {SORT_KEYS}")
+
+    lines = [f"{'tokens':>10}  {'lines':>8}  {'files':>6}  path"]
+
+    def visit(node: UsageNode, depth: int, label: str) -> None:
+        lines.append(f"{node.tokens:>10,}  {node.lines:>8,}  {node.files:>6,}  {label}")
+        if max_depth is not None and depth >= max_depth:
+            return
+        children = [
+            child for child in node.children.values() if child.is_dir or show_files
+        ]
+        if sort == "tokens":
+            children.sort(key=lambda child: (-child.tokens, child.name))
+        else:
+            children.sort(key=lambda child: child.name)
+        for child in children:
+            suffix = "/" if child.is_dir else ""
+            visit(child, depth + 1, "  " * (depth + 1) + child.name + suffix)
+
+    visit(usage, 0, usage.name)
+    return lines
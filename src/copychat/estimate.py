@@ -0,0 +1,127 @@
+"""Estimate bundle size from file sizes alone, without reading files."""
+
+import math
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .core import (
+    DiffMode,
+    RepoContexts,
+    ScanStats,
+    StatusOptions,
+    get_changed_files,
+    get_git_diffs,
+    iter_scan_files,
+)
+from .format import guess_language
+
+# Characters per token (low, high) by language. These are uncalibrated
+# defaults until benchmarks/calibrate.py is run to measure the 10th to 90th
+# percentile of per-file ratios.
+CHARS_PER_TOKEN: dict[Optional[str], tuple[float, float]] = {
+    "python": (3.2, 4.4),
+    "javascript": (3.0, 4.1),
+    "typescript": (3.0, 4.1),
+    "jsx": (2.9, 4.0),
+    "tsx": (2.9, 4.0),
+    "html": (2.6, 3.8),
+    "css": (2.7, 3.7),
+    "scss": (2.7, 3.7),
+    "rust": (2.9, 4.0),
+    "go": (2.9, 4.1),
+    "java": (3.3, 4.6),
+    "kotlin": (3.1, 4.3),
+    "scala": (3.0, 4.2),
+    "c": (2.8, 3.9),
+    "cpp": (2.8, 3.9),
+    "ruby": (3.1, 4.3),
+    "php": (2.9, 4.0),
+    "bash": (2.8, 4.0),
+    "yaml": (2.6, 3.9),
+    "json": (2.2, 3.6),
+    "markdown": (3.6, 4.8),
+    "sql": (3.0, 4.3),
+    None: (2.6, 4.4),  # Anything else
+}
+
+
+@dataclass
+class Estimate:
+    """File count, bytes and a token range for a planned bundle."""
+
+    files: int = 0
+    bytes: int = 0
+    min_tokens: int = 0
+    max_tokens: int = 0
+    by_language: dict[Optional[str], int] = field(default_factory=dict)  # Bytes
+
+    def add(self, path: Path, size: int) -> None:
+        language = guess_language(path)
+        low, high = CHARS_PER_TOKEN.get(language, CHARS_PER_TOKEN[None])
+        self.files += 1
+        self.bytes += size
+        self.min_tokens += int(size / high)
+        self.max_tokens += math.ceil(size / low)
+        self.by_language[language] = self.by_language.get(language, 0) + size
+
+
+def estimate_files(
+    path: Path,
+    include: Optional[list[str]] = None,
+    exclude_patterns: Optional[list[str]] = None,
+    max_depth: Optional[int] = None,
+    max_file_size: Optional[int] = None,
+    stats: Optional[ScanStats] = None,
+    use_git: bool = False,
+    estimate: Optional[Estimate] = None,
+    diff_mode: DiffMode = DiffMode.FULL,
+    compare_branch: Optional[str] = None,
+    git_status: StatusOptions = StatusOptions(),
+    repos: Optional[RepoContexts] = None,
+) -> Estimate:
+    """Estimate what scan_directory would return for the same arguments.
+
+    Files are selected exactly as scan_directory selects them, but only
+    their sizes are read. Byte counts stand in for character counts, and
+    binary or undecodable files (which scanning would skip) can't be told
+    apart without reading them, so they are included. Pass estimate to add
+    to an existing total.
+
+    In diff modes, git is asked for the changed files and their diffs, as
+    scan_directory does: unchanged files are left out where the mode skips
+    them, and each diff's size is added (or, with diff-only, counted alone).
+    """
+    estimate = estimate if estimate is not None else Estimate()
+    changed_files = None
+    git_diffs: Optional[dict[Path, str]] = {}
+    if diff_mode != DiffMode.FULL:
+        changed_files = get_changed_files(compare_branch, Path(path), git_status, repos)
+        if changed_files:
+            git_diffs = get_git_diffs(compare_branch, Path(path), git_status, repos)
+    only_changed = diff_mode in (DiffMode.CHANGED_WITH_DIFF, DiffMode.DIFF_ONLY)
+
+    for file_path in iter_scan_files(
+        path, include, exclude_patterns, max_depth, stats, use_git
+    ):
+        changed = changed_files is not None and file_path.resolve() in changed_files
+        if only_changed and not changed:
+            continue
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            if stats is not None:
+                stats.skip("unreadable")
+            continue
+        if max_file_size is not None and size > max_file_size:
+            if stats is not None:
+                stats.skip("too large")
+            continue
+        if changed and git_diffs is not None:
+            # Without batched diffs, the file's size stands in for its diff
+            diff = git_diffs.get(file_path.absolute(), "")
+            diff_size = len(diff.encode("utf-8", "surrogatepass"))
+            size = diff_size if diff_mode == DiffMode.DIFF_ONLY else size + diff_size
+        estimate.add(file_path, size)
+    return estimate
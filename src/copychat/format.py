@@ -1,9 +1,56 @@
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional, TextIO
 from os.path import commonpath
 from datetime import datetime, timezone
-import tiktoken
-from dataclasses import dataclass
+import atexit
+import os
+import threading
+from dataclasses import dataclass, field
+
+from . import timings
+from .cache import TokenCache
+
+if TYPE_CHECKING:
+    from .manifest import Manifest
+
+# Tokenizer used for token counts (used by GPT-4, Claude)
+TOKEN_ENCODING = "cl100k_base"
+
+# Token count cache shared by all formatting in this process
+_token_cache: Optional[TokenCache] = None
+
+# Tokenizer loaded once per process (False if it could not be loaded)
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def get_token_cache() -> TokenCache:
+    """Get the persistent token count cache for this process."""
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenCache()
+        atexit.register(_token_cache.close)
+    return _token_cache
+
+
+def get_encoding():
+    """Get the tiktoken encoding, loading it once per process.
+
+    Returns None if the encoding can't be loaded (e.g. offline without a
+    cached BPE file), in which case token counts fall back to estimates.
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    # Imported lazily: tiktoken is slow to import
+                    import tiktoken
+
+                    _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+                except Exception:
+                    _encoding = False
+    return _encoding or None
 
 
 @dataclass
@@ -22,6 +69,17 @@ class FormattedFile:
     content: str
     stats: FileStats
     formatted_content: str
+    open_tag: str = ""  # Opening <file> tag, kept for streaming output
+
+    def write_to(self, out: TextIO) -> None:
+        """Write the formatted file to out without building it as one string."""
+        if self.formatted_content or not self.open_tag:
+            out.write(self.formatted_content)
+            return
+        out.write(self.open_tag)
+        out.write("\n")
+        out.write(self.content)
+        out.write("\n</file>")
 
 
 @dataclass
@@ -35,6 +93,7 @@ class FormatResult:
     total_chars: int = 0
     total_tokens: int = 0
     has_header: bool = True
+    deleted: list[str] = field(default_factory=list)  # Paths reported as deleted
 
     def __str__(self) -> str:
         """Return the formatted content."""
@@ -42,37 +101,36 @@ class FormatResult:
 
 
 def format_file(
-    file_path: Path, root_path: Path, content: Optional[str] = None
+    file_path: Path,
+    root_path: Path,
+    content: Optional[str] = None,
+    tokens: Optional[int] = None,
+    render: bool = True,
+    open_tag: Optional[str] = None,
 ) -> FormattedFile:
-    """Format a single file as XML-style markdown and return structured result."""
+    """Format a single file as XML-style markdown and return structured result.
+
+    If tokens is given (e.g. from count_tokens), the content isn't tokenized again.
+    With render=False, formatted_content is left empty and the file is rendered
+    later by FormattedFile.write_to. A previously built open_tag for the same
+    file and root_path can be passed to skip building it.
+    """
     try:
         # Use provided content or read from file
         if content is None:
             content = file_path.read_text()
 
         # Calculate stats
-        stats = FileStats(chars=len(content), tokens=estimate_tokens(content))
-
-        # Use string paths for comparison to handle symlinks and different path formats
-        file_str = str(file_path.resolve())
-        root_str = str(root_path.resolve())
-
-        # Remove the root path and any leading slashes
-        if file_str.startswith(root_str):
-            rel_path = file_str[len(root_str) :].lstrip("/\\")
-        else:
-            rel_path = file_str  # Fallback to full path if not a subpath
-
-        language = guess_language(file_path)
+        if tokens is None:
+            tokens = estimate_tokens(content)
+        stats = FileStats(chars=len(content), tokens=tokens)
 
-        # Build the XML tag with attributes
-        tag_attrs = [f'path="{rel_path}"']
-        if language:
-            tag_attrs.append(f'language="{language}"')
+        if open_tag is None:
+            open_tag = _open_tag(file_path, root_path)
 
-        attrs_str = " ".join(tag_attrs)
-
-        formatted_content = f"""<file {attrs_str}>
+        formatted_content = ""
+        if render:
+            formatted_content = f"""{open_tag}
 {content}
 </file>"""
 
@@ -81,6 +139,7 @@ def format_file(
             content=content,
             stats=stats,
             formatted_content=formatted_content,
+            open_tag=open_tag,
         )
 
     except Exception as e:
@@ -93,30 +152,62 @@ def format_file(
         )
 
 
+def _open_tag(file_path: Path, root_path: Path) -> str:
+    """Build the opening <file> tag for file_path relative to root_path."""
+    # Use string paths for comparison to handle symlinks and different path formats
+    file_str = str(file_path.resolve())
+    root_str = str(root_path.resolve())
+
+    # Remove the root path and any leading slashes
+    if file_str.startswith(root_str):
+        rel_path = file_str[len(root_str) :].lstrip("/\\")
+    else:
+        rel_path = file_str  # Fallback to full path if not a subpath
+
+    language = guess_language(file_path)
+
+    # Build the XML tag with attributes
+    tag_attrs = [f'path="{rel_path}"']
+    if language:
+        tag_attrs.append(f'language="{language}"')
+
+    attrs_str = " ".join(tag_attrs)
+    return f"<file {attrs_str}>"
+
+
+def _relative_display_path(path: Path, root_str: str) -> str:
+    """Return path relative to root_str for the header's file table.
+
+    Paths are compared as strings, which is much cheaper than
+    Path.relative_to for large file lists.
+    """
+    path_str = str(path)
+    root_prefix = root_str.rstrip(os.sep) + os.sep
+    if path_str == root_str:
+        rel_path = ""
+    elif path_str.startswith(root_prefix):
+        rel_path = path_str[len(root_prefix) :]
+    else:
+        return path_str  # Fallback to full path if not a subpath
+    # Make sure path is not empty or just "."
+    if not rel_path or rel_path == ".":
+        # For GitHub items, use a more descriptive name
+        if path.name and ("_pr_" in path.name or "_issue_" in path.name):
+            # This appears to be a GitHub item, use a more descriptive name
+            rel_path = path.name
+        else:
+            rel_path = path.name or path_str
+    return rel_path
+
+
+@timings.timed("header")
 def create_header(result: FormatResult) -> str:
     """Create a header with metadata about the export."""
     timestamp = result.timestamp.strftime("%Y-%m-%d %H:%M:%S UTC")
 
     # Create a table-like format for files
-    rel_paths = []
-    for f in result.files:
-        try:
-            rel_path = str(f.path.relative_to(result.root_path))
-            # Make sure path is not empty or just "."
-            if not rel_path or rel_path == ".":
-                # For GitHub items, use a more descriptive name
-                if (
-                    isinstance(f.path, Path)
-                    and f.path.name
-                    and ("_pr_" in f.path.name or "_issue_" in f.path.name)
-                ):
-                    # This appears to be a GitHub item, use a more descriptive name
-                    rel_path = f.path.name
-                else:
-                    rel_path = f.path.name or str(f.path)
-        except ValueError:
-            rel_path = str(f.path)  # Fallback to full path if not a subpath
-        rel_paths.append(rel_path)
+    root_str = str(result.root_path)
+    rel_paths = [_relative_display_path(f.path, root_str) for f in result.files]
 
     # Use the minimum of the longest path or 50 chars
     max_path_len = (
@@ -169,25 +260,8 @@ def create_display_header(result: FormatResult) -> str:
     timestamp = result.timestamp.strftime("%Y-%m-%d %H:%M:%S UTC")
 
     # Create a table-like format for files
-    rel_paths = []
-    for f in result.files:
-        try:
-            rel_path = str(f.path.relative_to(result.root_path))
-            # Make sure path is not empty or just "."
-            if not rel_path or rel_path == ".":
-                # For GitHub items, use a more descriptive name
-                if (
-                    isinstance(f.path, Path)
-                    and f.path.name
-                    and ("_pr_" in f.path.name or "_issue_" in f.path.name)
-                ):
-                    # This appears to be a GitHub item, use a more descriptive name
-                    rel_path = f.path.name
-                else:
-                    rel_path = f.path.name or str(f.path)
-        except ValueError:
-            rel_path = str(f.path)  # Fallback to full path if not a subpath
-        rel_paths.append(rel_path)
+    root_str = str(result.root_path)
+    rel_paths = [_relative_display_path(f.path, root_str) for f in result.files]
 
     # Use the minimum of the longest path or 50 chars
     max_path_len = (
@@ -229,22 +303,38 @@ def create_display_header(result: FormatResult) -> str:
     return "\n".join(header)
 
 
-def format_files(files: list[tuple[Path, str]]) -> FormatResult:
+def format_files(
+    files: list[tuple[Path, str]],
+    jobs: Optional[int] = None,
+    render: bool = True,
+    manifest: Optional["Manifest"] = None,
+    deleted: Optional[list[str]] = None,
+) -> FormatResult:
     """Format files into markdown with XML-style tags.
 
     Args:
         files: List of (path, content) tuples to format
+        jobs: Number of threads used to count tokens (defaults to CPU count)
+        render: If False, only compute paths and stats; the output is produced
+            by write_result instead of being joined in memory
+        manifest: Manifest from the scan; token counts and tags stored for
+            unchanged files are reused, and new ones are recorded
+        deleted: Paths to list as deleted after the files (see format_deleted)
 
     Returns:
         FormatResult containing all formatting information
     """
+    deleted = deleted or []
     if not files:
         return FormatResult(
             files=[],
             root_path=Path("."),
             timestamp=datetime.now(timezone.utc),
-            formatted_content="<!-- No files found matching criteria -->\n",
+            formatted_content=format_deleted(deleted)
+            if deleted
+            else "<!-- No files found matching criteria -->\n",
             has_header=False,
+            deleted=deleted,
         )
 
     # Find common root path using os.path.commonpath
@@ -257,8 +347,44 @@ def format_files(files: list[tuple[Path, str]]) -> FormatResult:
     total_chars = 0
     total_tokens = 0
 
-    for file_path, content in files:
-        formatted = format_file(file_path, root_path, content)
+    records = [
+        manifest.current(str(file_path), content) if manifest is not None else None
+        for file_path, content in files
+    ]
+    root_str = str(root_path)
+    # Like the token cache, don't keep fallback estimates
+    keep_tokens = get_encoding() is not None
+
+    # Count tokens for all files up front so it can run in parallel
+    token_counts = [record.tokens if record is not None else None for record in records]
+    todo = [i for i, tokens in enumerate(token_counts) if tokens is None]
+    counted = count_tokens(
+        [files[i][1] for i in todo],
+        jobs=jobs,
+        labels=[str(files[i][0]) for i in todo],
+    )
+    for i, tokens in zip(todo, counted):
+        token_counts[i] = tokens
+
+    for (file_path, content), tokens, record in zip(files, token_counts, records):
+        open_tag = None
+        if record is not None and record.tag_root == root_str:
+            open_tag = record.open_tag
+        formatted = format_file(
+            file_path,
+            root_path,
+            content,
+            tokens=tokens,
+            render=render,
+            open_tag=open_tag,
+        )
+        if record is not None:
+            manifest.remember_format(
+                str(file_path),
+                tokens if keep_tokens else None,
+                root_str,
+                formatted.open_tag,
+            )
         formatted_files.append(formatted)
         total_chars += formatted.stats.chars
         total_tokens += formatted.stats.tokens
@@ -270,30 +396,133 @@ def format_files(files: list[tuple[Path, str]]) -> FormatResult:
         total_chars=total_chars,
         total_tokens=total_tokens,
         formatted_content="",  # Will be set after header
+        deleted=deleted,
     )
 
-    # Create header and combine all parts
-    header = create_header(result)
-    formatted_content = "\n".join(
-        [header] + [f.formatted_content for f in formatted_files]
-    )
+    if render:
+        # Create header and combine all parts
+        header = create_header(result)
+        formatted_content = "\n".join(
+            [header]
+            + [f.formatted_content for f in formatted_files]
+            + ([format_deleted(deleted)] if deleted else [])
+        )
+
+        # Update the formatted content
+        result.formatted_content = formatted_content
 
-    # Update the formatted content
-    result.formatted_content = formatted_content
+    # Persist any new token counts
+    get_token_cache().flush()
 
     return result
 
 
+def write_result(
+    result: FormatResult, out: TextIO, include_header: bool = True
+) -> None:
+    """Stream a FormatResult to a text file handle.
+
+    Writes the header and each <file> block as it is produced, giving the same
+    text as str(result) (or the files alone when include_header is False)
+    without holding the whole bundle in memory.
+    """
+    if not result.files:
+        if result.deleted:
+            out.write(format_deleted(result.deleted))
+        elif include_header:
+            out.write("<!-- No files found matching criteria -->\n")
+        return
+
+    if include_header:
+        out.write(create_header(result))
+        out.write("\n")
+    for i, formatted in enumerate(result.files):
+        if i:
+            out.write("\n")
+        formatted.write_to(out)
+    if result.deleted:
+        out.write("\n")
+        out.write(format_deleted(result.deleted))
+
+
+def format_deleted(paths: list[str]) -> str:
+    """Format a list of deleted paths as a <deleted> block."""
+    return "<deleted>\n" + "\n".join(paths) + "\n</deleted>"
+
+
 # Keep existing helper functions unchanged
 def estimate_tokens(text: str) -> int:
-    """Estimate the number of tokens in the text using GPT tokenizer."""
+    """Estimate the number of tokens in the text using GPT tokenizer.
+
+    Counts are cached on disk by content hash, so unchanged content is only
+    tokenized once across runs.
+    """
+    return count_tokens([text], jobs=1)[0]
+
+
+def _encode_count(text: str) -> Optional[int]:
+    """Tokenize text, returning None if the tokenizer can't handle it."""
+    encoding = get_encoding()
+    if encoding is None:
+        return None
     try:
-        # Using cl100k_base (used by GPT-4, Claude)
-        encoding = tiktoken.get_encoding("cl100k_base")
         return len(encoding.encode(text))
     except Exception:
-        # Fallback to rough estimate if tiktoken fails
-        return len(text) // 4  # Rough estimate: ~4 chars per token
+        return None
+
+
+@timings.timed("tokenize")
+def count_tokens(
+    texts: list[str], jobs: Optional[int] = None, labels: Optional[list[str]] = None
+) -> list[int]:
+    """Count tokens for many texts, tokenizing cache misses in parallel.
+
+    tiktoken releases the GIL while encoding, so a thread pool of `jobs`
+    workers (defaults to the CPU count) uses all cores. Returns counts in the
+    same order as texts. labels (e.g. file paths) only name the per-text
+    spans recorded when timings are enabled.
+    """
+    cache = get_token_cache()
+    keys = [cache.key(text, TOKEN_ENCODING) for text in texts]
+    counts: list[Optional[int]] = [cache.get(key) for key in keys]
+
+    # Tokenize each distinct uncached text once
+    todo: dict[str, str] = {}
+    todo_labels: dict[str, str] = {}
+    for i, (key, text, count) in enumerate(zip(keys, texts, counts)):
+        if count is None:
+            todo.setdefault(key, text)
+            if labels is not None:
+                todo_labels.setdefault(key, labels[i])
+
+    def encode(key: str) -> Optional[int]:
+        # Already counted in the tokenize phase; the span attributes it to a file
+        with timings.span("tokenize", todo_labels.get(key), counted=False):
+            return _encode_count(todo[key])
+
+    workers = min(jobs or os.cpu_count() or 1, len(todo))
+    if workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            encoded = dict(zip(todo, executor.map(encode, todo)))
+    else:
+        encoded = {key: encode(key) for key in todo}
+
+    for key, count in encoded.items():
+        # Fallback estimates are not cached
+        if count is not None:
+            cache.put(key, count)
+
+    result = []
+    for key, text, count in zip(keys, texts, counts):
+        if count is None:
+            count = encoded[key]
+        if count is None:
+            # Fallback to rough estimate if tiktoken fails
+            count = len(text) // 4  # Rough estimate: ~4 chars per token
+        result.append(count)
+    return result
 
 
 def guess_language(file_path: Path) -> Optional[str]:
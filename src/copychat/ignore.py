@@ -0,0 +1,219 @@
+"""Single-pass matching of gitignore, ccignore and exclude rules."""
+
+import os
+import re
+from typing import TYPE_CHECKING, Iterable, Sequence
+
+if TYPE_CHECKING:
+    import pathspec
+
+# Characters with a special meaning in gitwildmatch patterns
+_GLOB_CHARS = set("*?[\\")
+
+# pathspec names a group in every pattern; names can't repeat in one regex
+_NAMED_GROUP = re.compile(r"\(\?P<\w+>")
+
+
+def _is_literal(text: str) -> bool:
+    return bool(text) and not (_GLOB_CHARS & set(text)) and text not in (".", "..")
+
+
+def has_negations(spec: "pathspec.PathSpec") -> bool:
+    """Whether spec has "!" patterns, making its pattern order significant."""
+    return any(p.include is False for p in spec.patterns)
+
+
+class IgnoreMatcher:
+    """Answers "is this path ignored by any of these specs?" in one pass.
+
+    Equivalent to ``any(spec.match_file(path) for spec in specs)`` for
+    gitwildmatch PathSpecs, but faster for the rules copychat uses:
+
+    - Specs without negations are merged. Their pattern order doesn't
+      matter, since any match ignores the path, so patterns are grouped by
+      shape: literal names (``.DS_Store``) and pure suffixes (``*.pyc``) are
+      checked with a set lookup and a single str.endswith, directory-only
+      forms (``node_modules/``) likewise, and all other patterns are joined
+      into one regex per spec.
+    - Name and suffix patterns match any path component, so the result for
+      a file's parent directory is memoized and shared by its siblings.
+    - Specs with negations depend on pattern order and are matched by
+      pathspec as before. So is any other rule object with a match_file
+      method, such as a GitignoreChain.
+    - Specs for a subdirectory (nested .gitignore files, see extend_scoped)
+      only see paths below it, relative to it.
+    """
+
+    def __init__(self, specs: Iterable["pathspec.PathSpec"] = ()):
+        self._names: set[str] = set()  # Match any path component
+        self._suffixes: tuple[str, ...] = ()
+        self._dir_names: set[str] = set()  # Match components followed by "/"
+        self._dir_suffixes: tuple[str, ...] = ()
+        self._regexes: list[re.Pattern] = []
+        self._ordered: list["pathspec.PathSpec"] = []
+        self._scoped: list[tuple[str, IgnoreMatcher]] = []  # (prefix/, matcher)
+        self._dir_memo: dict[str, bool] = {}
+        self._specs: list["pathspec.PathSpec"] = []  # Everything, for odd paths
+        for spec in specs:
+            self._add(spec)
+
+    def extend(self, spec: "pathspec.PathSpec") -> "IgnoreMatcher":
+        """Return a new matcher that also ignores paths matched by spec.
+
+        Compiled rules are shared with this matcher; only spec is processed.
+        """
+        child = self._copy()
+        child._add(spec)
+        return child
+
+    def extend_scoped(self, base: str, spec: "pathspec.PathSpec") -> "IgnoreMatcher":
+        """Return a new matcher that also applies spec below directory base.
+
+        spec's patterns are relative to base, as for a .gitignore in that
+        directory; base itself is not matched. Only valid as an extra "or"
+        rule, so spec must not have negations (see GitignoreChain).
+        """
+        child = self._copy()
+        child._scoped.append((base.rstrip("/") + "/", IgnoreMatcher([spec])))
+        return child
+
+    def _copy(self) -> "IgnoreMatcher":
+        """Copy the rule tables (not the memo) so they can be extended."""
+        child = IgnoreMatcher()
+        child._names = set(self._names)
+        child._suffixes = self._suffixes
+        child._dir_names = set(self._dir_names)
+        child._dir_suffixes = self._dir_suffixes
+        child._regexes = list(self._regexes)
+        child._ordered = list(self._ordered)
+        child._specs = list(self._specs)
+        child._scoped = list(self._scoped)
+        return child
+
+    def _add(self, spec: "pathspec.PathSpec") -> None:
+        self._specs.append(spec)
+        if not hasattr(spec, "patterns") or has_negations(spec):
+            self._ordered.append(spec)
+            return
+
+        patterns = [p for p in spec.patterns if p.include is not None]
+
+        suffixes = []
+        dir_suffixes = []
+        generic = []
+        for p in patterns:
+            text = getattr(p, "pattern", None)
+            # Only patterns without a slash (other than a trailing one) match
+            # by path component; anything else keeps its own regex
+            body = text[:-1] if isinstance(text, str) and text.endswith("/") else text
+            dir_only = body is not text
+            if not isinstance(body, str) or "/" in body or body != body.strip():
+                generic.append(p.regex.pattern)
+            elif _is_literal(body):
+                (self._dir_names if dir_only else self._names).add(body)
+            elif body.startswith("*") and _is_literal(body[1:]):
+                (dir_suffixes if dir_only else suffixes).append(body[1:])
+            else:
+                generic.append(p.regex.pattern)
+
+        self._suffixes += tuple(suffixes)
+        self._dir_suffixes += tuple(dir_suffixes)
+        if generic:
+            self._regexes.append(
+                re.compile(
+                    "|".join(
+                        f"(?:{_NAMED_GROUP.sub('(?:', regex)})" for regex in generic
+                    )
+                )
+            )
+
+    def _dir_matches(self, dir_path: str) -> bool:
+        """Whether a name rule matches any component of dir_path (memoized)."""
+        matched = self._dir_memo.get(dir_path)
+        if matched is None:
+            parent, _, name = dir_path.rpartition("/")
+            matched = (
+                name in self._names
+                or name in self._dir_names
+                or name.endswith(self._suffixes)
+                or name.endswith(self._dir_suffixes)
+                or (bool(parent) and self._dir_matches(parent))
+            )
+            self._dir_memo[dir_path] = matched
+        return matched
+
+    def match_file(self, path: str) -> bool:
+        """Check whether path (relative, "/"-separated) is ignored.
+
+        As with pathspec, a trailing "/" marks a directory.
+        """
+        if os.sep != "/":
+            path = path.replace(os.sep, "/")
+        if path.startswith("./"):
+            path = path[2:]
+
+        if path.startswith("/") or "//" in path or "\n" in path:
+            # Unusual paths: let pathspec normalize and match them
+            if any(spec.match_file(path) for spec in self._specs):
+                return True
+            return self._match_scoped(path)
+
+        if path.endswith("/"):
+            if self._dir_matches(path[:-1]):
+                return True
+        else:
+            parent, _, name = path.rpartition("/")
+            if name in self._names or name.endswith(self._suffixes):
+                return True
+            if parent and self._dir_matches(parent):
+                return True
+
+        for regex in self._regexes:
+            if regex.match(path):
+                return True
+        if self._match_scoped(path):
+            return True
+        for spec in self._ordered:
+            if spec.match_file(path):
+                return True
+        return False
+
+    def _match_scoped(self, path: str) -> bool:
+        for prefix, scoped in self._scoped:
+            if (
+                path.startswith(prefix)
+                and len(path) > len(prefix)
+                and scoped.match_file(path[len(prefix) :])
+            ):
+                return True
+        return False
+
+
+class GitignoreChain:
+    """A base spec plus nested .gitignore files, matched the way git does.
+
+    levels are (directory, spec) pairs for .gitignore files below the scan
+    root, with patterns relative to their directory. For a path, the
+    deepest .gitignore that has a matching pattern decides, so a nested
+    file's "!" rules can re-include what a parent ignores; paths no nested
+    file has an opinion on fall back to base.
+    """
+
+    def __init__(
+        self,
+        base: "pathspec.PathSpec",
+        levels: Sequence[tuple[str, "pathspec.PathSpec"]] = (),
+    ):
+        self.base = base
+        # Deepest first, as (prefix/, spec)
+        self.levels = [
+            (directory.rstrip("/") + "/", spec) for directory, spec in reversed(levels)
+        ]
+
+    def match_file(self, path: str) -> bool:
+        for prefix, spec in self.levels:
+            if path.startswith(prefix) and len(path) > len(prefix):
+                include = spec.check_file(path[len(prefix) :]).include
+                if include is not None:
+                    return include
+        return self.base.match_file(path)
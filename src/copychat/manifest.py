@@ -0,0 +1,404 @@
+"""Persisted manifest of scanned files and directory listings for --incremental."""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .cache import content_hash, get_cache_dir
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# Bump when the stored layout changes; older manifests are discarded
+MANIFEST_VERSION = 2
+
+# Default size limit for the manifest (bytes of live database pages)
+DEFAULT_MANIFEST_SIZE = 256 * 1024 * 1024
+
+# Entries modified this close to the start of a scan may change again within
+# the same mtime tick, so their stat data isn't trusted on the next run
+RACY_NS = 2 * 10**9
+
+# Entry kinds in a stored directory listing
+FILE, DIR, SYMLINK_DIR, OTHER = range(4)
+
+
+@dataclass
+class FileRecord:
+    """What the manifest knows about a file as of its last scan."""
+
+    size: int
+    mtime_ns: int  # 0 if the file was modified too recently to trust
+    hash: str
+    content: str
+    tokens: Optional[int] = None
+    open_tag: Optional[str] = None  # <file> tag as formatted below tag_root
+    tag_root: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ListedEntry:
+    """A directory entry from a stored listing, usable like os.DirEntry."""
+
+    name: str
+    path: str
+    kind: int
+
+    def is_dir(self) -> bool:
+        return self.kind in (DIR, SYMLINK_DIR)
+
+    def is_file(self) -> bool:
+        return self.kind == FILE
+
+    def is_symlink(self) -> bool:
+        return self.kind == SYMLINK_DIR
+
+
+def _entry_kind(entry: os.DirEntry) -> int:
+    try:
+        if entry.is_dir():
+            return SYMLINK_DIR if entry.is_symlink() else DIR
+        return FILE if entry.is_file() else OTHER
+    except OSError:
+        return OTHER
+
+
+class Manifest:
+    """Stat data, content, token counts and listings from previous scans.
+
+    With a manifest, walk_files reuses a directory's stored listing while
+    the directory's mtime is unchanged, scan_directory reuses a file's
+    stored content while its size and mtime are unchanged, and format_files
+    reuses the stored token count and <file> tag, so only new and modified
+    files are read and tokenized.
+
+    Records are loaded per scan root by load_root and changes are written
+    in one transaction by save(), which also drops the records of files and
+    directories that a fresh listing of their parent no longer shows (so
+    scanning with narrower filters keeps the others). Once the database
+    exceeds max_size, the least recently used file records are evicted, as
+    in TokenCache. Like TokenCache, the manifest is best-effort: if the
+    database can't be used, everything is read afresh and nothing is stored.
+
+    lookup, update, current and remember_format may be called from several
+    threads (scan_directory and format_files with jobs > 1).
+    """
+
+    def __init__(
+        self, path: Optional[Path] = None, max_size: int = DEFAULT_MANIFEST_SIZE
+    ):
+        self.path = path or get_cache_dir() / "manifest" / "manifest.sqlite3"
+        self.max_size = max_size
+        self.started_ns = time.time_ns()
+        self.files_reused = 0
+        self.listings_reused = 0
+        self._conn: Optional["sqlite3.Connection"] = None
+        self._disabled = False
+        self._roots: list[str] = []
+        self._files: dict[str, FileRecord] = {}
+        self._dirs: dict[str, tuple[int, list[ListedEntry]]] = {}
+        # Paths loaded from the database, by parent directory
+        self._children: dict[str, set[str]] = {}
+        self._removed: set[str] = set()  # Loaded paths found to be gone
+        self._seen: set[str] = set()  # Files and directories seen this run
+        self._changed_files: set[str] = set()
+        self._changed_dirs: set[str] = set()
+        self._used: set[str] = set()  # Unchanged files reused this run
+        # Guards the records and bookkeeping above
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Optional["sqlite3.Connection"]:
+        """Open the database on first use, disabling the manifest on failure."""
+        if self._conn is not None or self._disabled:
+            return self._conn
+        import sqlite3
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Records are loaded and saved from the thread that scans
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != MANIFEST_VERSION:
+                conn.execute("DROP TABLE IF EXISTS files")
+                conn.execute("DROP TABLE IF EXISTS dirs")
+                conn.execute(f"PRAGMA user_version = {MANIFEST_VERSION}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, hash TEXT NOT NULL, tokens INTEGER, "
+                "open_tag TEXT, tag_root TEXT, content TEXT NOT NULL, "
+                "last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dirs ("
+                "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, "
+                "entries TEXT NOT NULL) WITHOUT ROWID"
+            )
+            conn.commit()
+            self._conn = conn
+        except (OSError, sqlite3.Error):
+            self._disabled = True
+        return self._conn
+
+    def load_root(self, root: Path) -> None:
+        """Load the records for everything below root (an absolute directory)."""
+        root_str = str(root)
+        if any(
+            root_str == loaded or root_str.startswith(loaded.rstrip(os.sep) + os.sep)
+            for loaded in self._roots
+        ):
+            return
+        self._roots.append(root_str)
+        conn = self._connect()
+        if conn is None:
+            return
+        import sqlite3
+
+        # Every path starting with "root/": "/" sorts just before "0"
+        low = root_str.rstrip(os.sep) + os.sep
+        high = low[:-1] + chr(ord(os.sep) + 1)
+        try:
+            for (
+                path,
+                size,
+                mtime_ns,
+                hash_,
+                tokens,
+                tag,
+                tag_root,
+                content,
+            ) in conn.execute(
+                "SELECT path, size, mtime_ns, hash, tokens, open_tag, tag_root, "
+                "content FROM files WHERE path >= ? AND path < ?",
+                (low, high),
+            ):
+                self._files[path] = FileRecord(
+                    size, mtime_ns, hash_, content, tokens, tag, tag_root
+                )
+                self._children.setdefault(os.path.dirname(path), set()).add(path)
+            for path, mtime_ns, entries in conn.execute(
+                "SELECT path, mtime_ns, entries FROM dirs "
+                "WHERE path = ? OR (path >= ? AND path < ?)",
+                (root_str, low, high),
+            ):
+                self._dirs[path] = (
+                    mtime_ns,
+                    [
+                        ListedEntry(name, os.path.join(path, name), kind)
+                        for name, kind in json.loads(entries)
+                    ],
+                )
+                self._children.setdefault(os.path.dirname(path), set()).add(path)
+        except (sqlite3.Error, ValueError):
+            self._files.clear()
+            self._dirs.clear()
+            self._children.clear()
+
+    def _under_root(self, path: str) -> bool:
+        return any(
+            path.startswith(root.rstrip(os.sep) + os.sep) for root in self._roots
+        )
+
+    def _trusted(self, mtime_ns: int) -> bool:
+        return mtime_ns < self.started_ns - RACY_NS
+
+    def list_dir(self, dir_path: str) -> list[ListedEntry]:
+        """List dir_path, reusing the stored listing if its mtime is unchanged.
+
+        Raises OSError if the directory can't be read.
+        """
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+        with self._lock:
+            self._seen.add(dir_path)
+            stored = self._dirs.get(dir_path)
+            if stored is not None and stored[0] == mtime_ns:
+                self.listings_reused += 1
+                return stored[1]
+
+        with os.scandir(dir_path) as it:
+            entries = [ListedEntry(e.name, e.path, _entry_kind(e)) for e in it]
+        # Stored entries missing from the listing were removed or renamed
+        listed = {entry.path for entry in entries}
+        with self._lock:
+            for path in self._children.pop(dir_path, ()):
+                if path not in listed:
+                    self._removed.add(path)
+            if self._trusted(mtime_ns):
+                self._dirs[dir_path] = (mtime_ns, entries)
+                self._changed_dirs.add(dir_path)
+            else:
+                self._dirs.pop(dir_path, None)
+        return entries
+
+    def lookup(self, path: str) -> tuple[Optional[FileRecord], os.stat_result]:
+        """Stat path and return its record if the file is unchanged.
+
+        The stat result is returned for passing to update() after a read.
+        Raises OSError if the file can't be stat()ed.
+        """
+        st = os.stat(path)
+        with self._lock:
+            self._seen.add(path)
+            record = self._files.get(path)
+            if (
+                record is not None
+                and record.mtime_ns
+                and record.size == st.st_size
+                and record.mtime_ns == st.st_mtime_ns
+            ):
+                self.files_reused += 1
+                self._used.add(path)
+                return record, st
+        return None, st
+
+    def update(self, path: str, st: os.stat_result, content: str) -> FileRecord:
+        """Record content read from path, which had stat data st before the read.
+
+        If the content is unchanged (by hash), the stored token count and tag
+        are kept.
+        """
+        digest = content_hash(content)
+        record = FileRecord(
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns if self._trusted(st.st_mtime_ns) else 0,
+            hash=digest,
+            content=content,
+        )
+        with self._lock:
+            previous = self._files.get(path)
+            if previous is not None and previous.hash == digest:
+                record.tokens = previous.tokens
+                record.open_tag = previous.open_tag
+                record.tag_root = previous.tag_root
+            self._files[path] = record
+            self._changed_files.add(path)
+        return record
+
+    def current(self, path: str, content: str) -> Optional[FileRecord]:
+        """The record for path if it was seen this run and holds content."""
+        with self._lock:
+            record = self._files.get(path)
+            if record is None or path not in self._seen:
+                return None
+        return record if record.content == content else None
+
+    def remember_format(
+        self, path: str, tokens: Optional[int], tag_root: str, open_tag: str
+    ) -> None:
+        """Store the token count and <file> tag computed for a current record."""
+        with self._lock:
+            record = self._files.get(path)
+            if record is None:
+                return
+            if (record.tokens, record.tag_root, record.open_tag) != (
+                tokens,
+                tag_root,
+                open_tag,
+            ):
+                record.tokens = tokens
+                record.tag_root = tag_root
+                record.open_tag = open_tag
+                self._changed_files.add(path)
+
+    def save(self) -> None:
+        """Write changed records and drop those of removed files and directories."""
+        conn = self._connect()
+        if conn is None:
+            return
+        import sqlite3
+
+        now = time.time()
+        with self._lock:
+            # A removed path and, if it was a directory, everything below it
+            removed = [
+                (path, low, low[:-1] + chr(ord(os.sep) + 1))
+                for path in self._removed
+                for low in (path.rstrip(os.sep) + os.sep,)
+            ]
+            try:
+                with conn:
+                    for table in ("files", "dirs"):
+                        conn.executemany(
+                            f"DELETE FROM {table} WHERE path = ? "
+                            "OR (path >= ? AND path < ?)",
+                            removed,
+                        )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO files (path, size, mtime_ns, hash, "
+                        "tokens, open_tag, tag_root, content, last_used) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                path,
+                                r.size,
+                                r.mtime_ns,
+                                r.hash,
+                                r.tokens,
+                                r.open_tag,
+                                r.tag_root,
+                                r.content,
+                                now,
+                            )
+                            for path in self._changed_files
+                            if path in self._seen and self._under_root(path)
+                            for r in (self._files[path],)
+                        ],
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO dirs (path, mtime_ns, entries) "
+                        "VALUES (?, ?, ?)",
+                        [
+                            (
+                                path,
+                                self._dirs[path][0],
+                                json.dumps(
+                                    [[e.name, e.kind] for e in self._dirs[path][1]]
+                                ),
+                            )
+                            for path in self._changed_dirs
+                            if path in self._dirs
+                        ],
+                    )
+                    conn.executemany(
+                        "UPDATE files SET last_used = ? WHERE path = ?",
+                        [(now, path) for path in self._used - self._changed_files],
+                    )
+                self._evict(conn)
+            except sqlite3.Error:
+                pass  # Another process may hold the lock for too long; skip this run
+            self._removed.clear()
+            self._used.clear()
+            self._changed_files.clear()
+            self._changed_dirs.clear()
+
+    def _evict(self, conn: "sqlite3.Connection") -> None:
+        """Delete least recently used file records until under 80% of max."""
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        size = (page_count - free_pages) * page_size
+        if size <= self.max_size:
+            return
+
+        total = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        keep = int(total * (self.max_size * 0.8) / size)
+        with conn:
+            conn.execute(
+                "DELETE FROM files WHERE path IN "
+                "(SELECT path FROM files ORDER BY last_used LIMIT ?)",
+                (total - keep,),
+            )
+
+    def close(self) -> None:
+        """Save and close the database."""
+        self.save()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,138 @@
+"""Snapshots of what was last copied, for --since-last."""
+
+import difflib
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .cache import content_hash, get_cache_dir
+from .core import DiffMode
+
+DEFAULT_PROFILE = "default"
+
+
+@dataclass
+class SnapshotDelta:
+    """Files that differ from a snapshot, by relative path."""
+
+    added: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> list[str]:
+        return sorted(self.added + self.modified)
+
+
+class Snapshot:
+    """The files last copied from a root under a profile name.
+
+    Each file is kept as its content hash and content, keyed by its path
+    relative to the root, so later runs can tell which files were added,
+    modified or deleted and diff against what was sent. Snapshots are JSON
+    files in the cache directory, replaced atomically on save().
+    """
+
+    def __init__(
+        self, root: str, profile: str = DEFAULT_PROFILE, path: Optional[Path] = None
+    ):
+        self.root = root
+        self.profile = profile
+        if path is None:
+            key = hashlib.blake2b(
+                f"{root}\0{profile}".encode(), digest_size=16
+            ).hexdigest()
+            path = get_cache_dir() / "snapshots" / f"{key}.json"
+        self.path = path
+        self.files: dict[str, tuple[str, str]] = {}  # path -> (hash, content)
+        self.exists = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("root") != self.root or data.get("profile") != self.profile:
+            return
+        self.files = {
+            path: (entry["hash"], entry["content"])
+            for path, entry in data.get("files", {}).items()
+        }
+        self.exists = True
+
+    def previous(self, path: str) -> Optional[str]:
+        """Content of path as last copied, or None if it wasn't."""
+        entry = self.files.get(path)
+        return entry[1] if entry is not None else None
+
+    def delta(self, current: dict[str, str]) -> SnapshotDelta:
+        """Compare current contents (by relative path) with the snapshot."""
+        delta = SnapshotDelta()
+        for path, content in current.items():
+            entry = self.files.get(path)
+            if entry is None:
+                delta.added.append(path)
+            elif entry[0] != content_hash(content):
+                delta.modified.append(path)
+        delta.deleted = sorted(set(self.files) - set(current))
+        delta.added.sort()
+        delta.modified.sort()
+        return delta
+
+    def record(self, sent: dict[str, str], deleted: list[str]) -> None:
+        """Update the snapshot with files that were sent and ones reported deleted."""
+        for path, content in sent.items():
+            self.files[path] = (content_hash(content), content)
+        for path in deleted:
+            self.files.pop(path, None)
+
+    def save(self) -> None:
+        """Write the snapshot, replacing the previous one atomically."""
+        data = {
+            "root": self.root,
+            "profile": self.profile,
+            "files": {
+                path: {"hash": digest, "content": content}
+                for path, (digest, content) in sorted(self.files.items())
+            },
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.exists = True
+
+
+def render_delta(
+    path: str, content: str, previous: Optional[str], diff_mode: DiffMode
+) -> str:
+    """Content to emit for a changed file under diff_mode.
+
+    Diffs are against the snapshot content (or empty for added files),
+    with the same "content, then diff" layout as git diff modes.
+    """
+    if diff_mode == DiffMode.FULL:
+        return content
+    diff = "".join(
+        difflib.unified_diff(
+            (previous or "").splitlines(keepends=True),
+            content.splitlines(keepends=True),
+            fromfile=f"a/{path}" if previous is not None else "/dev/null",
+            tofile=f"b/{path}",
+        )
+    )
+    if diff_mode == DiffMode.DIFF_ONLY:
+        return diff
+    if previous is None:
+        return content  # Nothing to diff a new file against
+    return f"{content}\n\n# Diff since last copy:\n{diff}"
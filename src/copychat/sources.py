@@ -1,10 +1,20 @@
 from pathlib import Path
+import json
+import os
 import shutil
+import time
 from typing import Optional
-import git
 from rich.console import Console
 import tempfile
 
+from .cache import get_cache_dir
+from .core import IGNORE_FILES
+
+try:
+    import fcntl
+except ImportError:  # Windows: cached clones aren't locked
+    fcntl = None
+
 error_console = Console(stderr=True)
 
 # Shared temporary directory for GitHub items
@@ -19,47 +29,359 @@ def get_github_temp_dir() -> Path:
     return _github_temp_dir
 
 
-class GitHubSource:
-    """Handle GitHub repositories as sources."""
+# Where GitHubSource clones from by default
+GITHUB_URL = "https://github.com"
+
+# Seconds a cached clone is used without checking GitHub for new commits
+DEFAULT_CACHE_TTL = 300
+
+# Size limit for the clone cache; least recently used clones are removed
+DEFAULT_CACHE_SIZE = 2 * 1024**3
+
+
+def sparse_patterns(paths: list[str]) -> Optional[list[str]]:
+    """Sparse-checkout patterns for paths inside a repository.
 
-    def __init__(self, repo_path: str, cache_dir: Optional[Path] = None):
+    Each path is checked out with everything below it, along with the
+    ignore files in its parent directories, so scans apply the same rules.
+    Returns None if a path covers the whole repository.
+    """
+    patterns = {f"/{name}" for name in IGNORE_FILES}
+    for path in paths:
+        path = path.strip("/")
+        while path.startswith("./"):
+            path = path[2:]
+        if path in ("", "."):
+            return None
+        patterns.add(f"/{path}")
+        parts = path.split("/")[:-1]
+        for i in range(1, len(parts) + 1):
+            parent = "/".join(parts[:i])
+            patterns.update(f"/{parent}/{name}" for name in IGNORE_FILES)
+    return sorted(patterns)
+
+
+class _FileLock:
+    """An flock(2) lock on a file, held shared or exclusive until released.
+
+    Locks belong to the open file, so two instances conflict even within a
+    process. Without fcntl every acquire succeeds.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def acquire(self, exclusive: bool, blocking: bool = True) -> bool:
+        """Take (or convert to) the lock; False if not blocking and it's held."""
+        if fcntl is None:
+            return True
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        while True:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(self._fd, flags)
+            except BlockingIOError:
+                return False
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self._fd).st_ino:
+                    return True
+            except FileNotFoundError:
+                pass
+            # The file was removed (with its evicted clone) while we waited;
+            # lock the one that replaces it instead
+            self.release()
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)  # Closing the file drops the lock
+            self._fd = None
+
+
+def _dir_size(path: Path) -> int:
+    """Total size in bytes of the files below path."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class _CloneBusy(Exception):
+    """The clone has to be changed but another run is reading it."""
+
+
+class GitHubSource:
+    """Handle GitHub repositories as sources.
+
+    Repositories are cloned shallow and blobless (``--filter=blob:none``)
+    into the cache directory. When paths are given, the checkout is sparse
+    and limited to them, so only the blobs for those files are downloaded.
+
+    A clone checked less than ttl seconds ago is used as is. After that,
+    the tracked branch's head is looked up with ``git ls-remote`` and only
+    if it moved is it fetched, again at depth 1. When each clone was last
+    checked, and at which commit, is kept in a JSON file next to it.
+
+    Clones are shared safely between processes through two lock files per
+    repository. The update lock is held while deciding whether to fetch and
+    fetching, so concurrent runs wait for one fetch instead of each making
+    their own. Readers hold the readers lock shared from fetch() until
+    release(); the work tree is only changed with it held exclusively.
+    That lock is never waited for while holding the update lock: if another
+    run (such as a --watch session) is still reading, a newer commit is
+    left for later and the current checkout reused, and a checkout of
+    different paths waits for the reader without blocking other runs.
+    After an update, least recently used clones are removed until the cache
+    is below max_size bytes.
+    """
+
+    def __init__(
+        self,
+        repo_path: str,
+        cache_dir: Optional[Path] = None,
+        paths: Optional[list[str]] = None,
+        base_url: str = GITHUB_URL,
+        ttl: float = DEFAULT_CACHE_TTL,
+        max_size: int = DEFAULT_CACHE_SIZE,
+    ):
         """Initialize GitHub source."""
         self.repo_path = repo_path.strip("/")
-        self.cache_dir = cache_dir or Path.home() / ".cache" / "copychat" / "github"
+        self.cache_dir = cache_dir or get_cache_dir() / "github"
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.paths = list(paths or [])
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.max_size = max_size
+        self._update_lock, self._read_lock = self._locks(self.repo_dir.name)
 
     @property
     def clone_url(self) -> str:
         """Get HTTPS clone URL for repository."""
-        return f"https://github.com/{self.repo_path}.git"
+        return f"{self.base_url}/{self.repo_path}.git"
 
     @property
     def repo_dir(self) -> Path:
         """Get path to cached repository."""
         return self.cache_dir / self.repo_path.replace("/", "_")
 
-    def fetch(self) -> Path:
-        """Fetch repository and return path to files."""
+    @property
+    def state_path(self) -> Path:
+        """Get path to the freshness record of the cached repository."""
+        return self.cache_dir / f"{self.repo_dir.name}.json"
+
+    def _locks(self, name: str) -> tuple[_FileLock, _FileLock]:
+        """The update and readers locks of the clone called name."""
+        return (
+            _FileLock(self.cache_dir / f"{name}.lock"),
+            _FileLock(self.cache_dir / f"{name}.read.lock"),
+        )
+
+    def _load_state(self, name: Optional[str] = None) -> dict:
+        path = self.cache_dir / f"{name}.json" if name else self.state_path
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, repo, patterns: Optional[list[str]]) -> None:
+        state = {
+            "checked_at": time.time(),
+            "commit": repo.head.commit.hexsha,
+            "sparse": patterns,
+            "size": _dir_size(self.repo_dir),
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
         try:
-            if self.repo_dir.exists():
-                # Update existing repo
-                repo = git.Repo(self.repo_dir)
-                repo.remotes.origin.fetch()
-                repo.remotes.origin.pull()
-            else:
-                # Clone new repo
-                git.Repo.clone_from(self.clone_url, self.repo_dir, depth=1)
-
-            return self.repo_dir
-
-        except git.GitCommandError as e:
-            error_console.print(f"[red]Error accessing repository:[/] {str(e)}")
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.state_path)
+        except BaseException:
+            os.unlink(tmp)
             raise
 
+    def fetch(self, refresh: bool = False) -> Path:
+        """Fetch repository and return path to files.
+
+        With refresh, the tracked branch is fetched even if the clone is
+        within its ttl or already at the remote head, unless another run
+        fetched it while this one waited. The clone is locked for reading
+        until release().
+        """
+        # Imported lazily: GitPython is slow to import and only needed here
+        import git
+
+        patterns = sparse_patterns(self.paths) if self.paths else None
+        started = time.time()
+        while True:
+            self._update_lock.acquire(exclusive=True)
+            try:
+                updated = self._update(patterns, refresh, started)
+                # Readers wait on the update lock, so this can't let one in early
+                self._read_lock.acquire(exclusive=False)
+                break
+            except _CloneBusy:
+                pass
+            except git.GitCommandError as e:
+                self._read_lock.release()
+                error_console.print(f"[red]Error accessing repository:[/] {str(e)}")
+                raise
+            except BaseException:
+                self._read_lock.release()
+                raise
+            finally:
+                self._update_lock.release()
+            self._wait_for_readers()
+        if updated:
+            self._evict()
+        return self.repo_dir
+
+    def _update(
+        self, patterns: Optional[list[str]], refresh: bool, started: float
+    ) -> bool:
+        """Clone or update the repository as needed; True if it was changed."""
+        import git
+
+        if self.repo_dir.exists():
+            repo = git.Repo(self.repo_dir)
+            state = self._load_state()
+            checked_at = state.get("checked_at", 0)
+            # Also fresh if another run checked while we waited for the lock
+            fresh = checked_at >= started or time.time() - checked_at < self.ttl
+            if (refresh and checked_at < started) or (not fresh and self._behind(repo)):
+                # Update the tracked branch only, keeping the clone shallow
+                branch = repo.active_branch.name
+                repo.git.fetch("--depth=1", "--filter=blob:none", "origin", branch)
+                try:
+                    self._checkout(repo, patterns, "FETCH_HEAD")
+                except _CloneBusy:
+                    if state.get("sparse", False) != patterns:
+                        raise
+                    error_console.print(
+                        f"[yellow]Warning:[/] {self.repo_path} is being read by "
+                        "another copychat run; using the cached checkout without "
+                        "the latest commits"
+                    )
+                    return False
+            elif state.get("sparse", False) != patterns:
+                # Same commit, different paths
+                self._checkout(repo, patterns, "HEAD")
+            elif fresh:
+                os.utime(self.state_path)  # Mark as recently used
+                return False
+        else:
+            # Clone without blobs; checkout fetches the ones it needs
+            repo = git.Repo.clone_from(
+                self.clone_url,
+                self.repo_dir,
+                depth=1,
+                filter="blob:none",
+                single_branch=True,
+                no_checkout=True,
+            )
+            self._checkout(repo, patterns, "HEAD")
+
+        self._save_state(repo, patterns)
+        return True
+
+    @staticmethod
+    def _behind(repo) -> bool:
+        """Whether the remote branch has moved from the clone's HEAD."""
+        import git
+
+        head = repo.head.commit.hexsha
+        try:
+            branch = repo.active_branch.name
+            remote = repo.git.ls_remote("origin", f"refs/heads/{branch}")
+        except (git.GitCommandError, TypeError):
+            return True  # Let the fetch report what's wrong
+        return remote.split("\t", 1)[0] != head
+
+    def _checkout(self, repo, patterns: Optional[list[str]], commit: str) -> None:
+        """Limit the work tree to patterns (or all files) and check out commit.
+
+        Raises _CloneBusy if another run is still reading the current files.
+        """
+        if not self._read_lock.acquire(exclusive=True, blocking=False):
+            raise _CloneBusy
+        if patterns is None:
+            repo.git.sparse_checkout("disable")
+        else:
+            repo.git.sparse_checkout("set", "--no-cone", *patterns)
+        repo.git.reset("--hard", "--quiet", commit)
+
+    def _wait_for_readers(self) -> None:
+        """Block until no other run reads the clone (without the update lock)."""
+        error_console.print(
+            f"Waiting for another copychat session to finish reading "
+            f"{self.repo_path}..."
+        )
+        self._read_lock.acquire(exclusive=True)
+        self._read_lock.release()
+
+    def _evict(self) -> None:
+        """Remove least recently used clones until the cache fits in max_size.
+
+        The current clone is kept, as are clones other runs have locked.
+        """
+        clones = []
+        for path in self.cache_dir.iterdir():
+            if not path.is_dir() or path == self.repo_dir:
+                continue
+            state_path = self.cache_dir / f"{path.name}.json"
+            try:
+                used = (state_path if state_path.exists() else path).stat().st_mtime
+            except OSError:
+                continue
+            size = self._load_state(path.name).get("size")
+            clones.append((used, path, size if size is not None else _dir_size(path)))
+        total = self._load_state().get("size", 0) + sum(size for _, _, size in clones)
+
+        for _, path, size in sorted(clones, key=lambda clone: clone[0]):
+            if total <= self.max_size:
+                break
+            update_lock, read_lock = self._locks(path.name)
+            try:
+                if update_lock.acquire(
+                    exclusive=True, blocking=False
+                ) and read_lock.acquire(exclusive=True, blocking=False):
+                    shutil.rmtree(path, ignore_errors=True)
+                    (self.cache_dir / f"{path.name}.json").unlink(missing_ok=True)
+                    # Runs waiting on these locks notice and lock new files
+                    update_lock.path.unlink(missing_ok=True)
+                    read_lock.path.unlink(missing_ok=True)
+                    total -= size
+            finally:
+                read_lock.release()
+                update_lock.release()
+
+    def release(self) -> None:
+        """Let other runs update the clone once this one has read it."""
+        self._read_lock.release()
+
     def cleanup(self) -> None:
         """Remove cached repository."""
-        if self.repo_dir.exists():
-            shutil.rmtree(self.repo_dir)
+        while True:
+            self._update_lock.acquire(exclusive=True)
+            try:
+                if self._read_lock.acquire(exclusive=True, blocking=False):
+                    if self.repo_dir.exists():
+                        shutil.rmtree(self.repo_dir)
+                    self.state_path.unlink(missing_ok=True)
+                    self._read_lock.release()
+                    return
+            except BaseException:
+                self._read_lock.release()
+                raise
+            finally:
+                self._update_lock.release()
+            self._wait_for_readers()
 
 
 class GitHubItem:
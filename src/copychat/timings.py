@@ -0,0 +1,186 @@
+"""Per-phase timing and Chrome trace export for --timings and --trace."""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+# Order phases are reported in; any other phase is listed after these
+PHASES = ["walk", "ignore", "read", "git", "tokenize", "header", "write", "clipboard"]
+
+
+@dataclass
+class Span:
+    """A timed interval, optionally attributed to a file."""
+
+    phase: str
+    start: float
+    end: float
+    tid: int
+    path: Optional[str] = None
+    counted: bool = True  # Whether it adds to the phase totals
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Timings:
+    """Collects timing spans for one run.
+
+    Spans may be recorded from several threads (list.append is atomic), so
+    phase totals are summed across threads and can exceed wall-clock time.
+    Within a thread, phases nest (ignore files are parsed during the walk,
+    for example); each phase is only charged its exclusive time, so nested
+    time isn't counted twice.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: list[Span] = []
+        self.accumulated: dict[str, float] = defaultdict(float)
+
+    @contextmanager
+    def span(self, phase: str, path: Optional[str] = None, counted: bool = True):
+        """Time the enclosed block as part of phase (and of path, if given)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append(
+                Span(
+                    phase=phase,
+                    start=start,
+                    end=time.perf_counter(),
+                    tid=threading.get_ident(),
+                    path=path,
+                    counted=counted,
+                )
+            )
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Add time to a phase without recording a span (for very hot paths)."""
+        self.accumulated[phase] += seconds
+
+    def phase_totals(self) -> dict[str, float]:
+        """Total exclusive seconds per phase, in report order.
+
+        A counted span's time is charged to its own phase minus the time of
+        the counted spans nested directly inside it on the same thread.
+        """
+        totals: dict[str, float] = defaultdict(float, self.accumulated)
+        by_thread: dict[int, list[Span]] = defaultdict(list)
+        for s in self.spans:
+            if s.counted:
+                by_thread[s.tid].append(s)
+        for spans in by_thread.values():
+            # Parents sort before the spans they contain
+            spans.sort(key=lambda s: (s.start, -s.end))
+            open_spans: list[Span] = []
+            for s in spans:
+                while open_spans and open_spans[-1].end <= s.start:
+                    open_spans.pop()
+                totals[s.phase] += s.duration
+                if open_spans:
+                    totals[open_spans[-1].phase] -= s.duration
+                open_spans.append(s)
+        order = PHASES + sorted(set(totals) - set(PHASES))
+        return {phase: totals[phase] for phase in order if phase in totals}
+
+    def slowest_files(self, n: int = 10) -> list[tuple[str, float]]:
+        """The n files with the most time attributed to them."""
+        per_file: dict[str, float] = defaultdict(float)
+        for s in self.spans:
+            if s.path is not None:
+                per_file[s.path] += s.duration
+        return sorted(per_file.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def report(self, n: int = 10) -> str:
+        """Format the per-phase breakdown and the slowest files."""
+        elapsed = time.perf_counter() - self.origin
+        lines = ["Timings:"]
+        for phase, seconds in self.phase_totals().items():
+            lines.append(f"  {phase:<10} {seconds * 1000:10.1f} ms")
+        lines.append(f"  {'total':<10} {elapsed * 1000:10.1f} ms")
+
+        slowest = self.slowest_files(n)
+        if slowest:
+            lines.append("")
+            lines.append(f"Slowest {len(slowest)} files:")
+            for path, seconds in slowest:
+                lines.append(f"  {seconds * 1000:10.1f} ms  {path}")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        """Build Chrome trace-event JSON (viewable in Perfetto or chrome://tracing)."""
+        pid = os.getpid()
+        events = []
+        for s in self.spans:
+            event = {
+                "name": s.path or s.phase,
+                "cat": s.phase,
+                "ph": "X",
+                "ts": (s.start - self.origin) * 1e6,
+                "dur": s.duration * 1e6,
+                "pid": pid,
+                "tid": s.tid,
+            }
+            if s.path is not None:
+                event["args"] = {"path": s.path}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """Write the Chrome trace to path."""
+        path.write_text(json.dumps(self.chrome_trace()))
+
+
+# Recorder for the current run, or None when timings are disabled
+_recorder: Optional[Timings] = None
+
+
+def start_timings() -> Timings:
+    """Enable timing collection for this process."""
+    global _recorder
+    _recorder = Timings()
+    return _recorder
+
+
+def stop_timings() -> None:
+    """Disable timing collection."""
+    global _recorder
+    _recorder = None
+
+
+def get_recorder() -> Optional[Timings]:
+    """Get the active recorder, or None when timings are disabled."""
+    return _recorder
+
+
+def span(phase: str, path: Optional[str] = None, counted: bool = True):
+    """Time a block if timings are enabled; a no-op context otherwise."""
+    if _recorder is None:
+        return nullcontext()
+    return _recorder.span(phase, path, counted)
+
+
+def timed(phase: str):
+    """Decorator that times every call of the function as part of phase."""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return fn(*args, **kwargs)
+            with _recorder.span(phase):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
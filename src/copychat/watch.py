@@ -0,0 +1,574 @@
+"""Watch scanned paths and keep a formatted bundle up to date for --watch."""
+
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from os.path import commonpath
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from .core import IGNORE_FILES, IgnoreRules, get_gitignore_spec
+from .format import (
+    FormatResult,
+    FormattedFile,
+    count_tokens,
+    create_header,
+    format_file,
+    get_token_cache,
+)
+from .patterns import DEFAULT_EXTENSIONS
+
+# Seconds to wait after the last change before re-rendering
+DEFAULT_DEBOUNCE = 0.3
+
+# Seconds between scans of the tree when inotify isn't available
+POLL_INTERVAL = 1.0
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+class PathFilter:
+    """Which paths below a directory scan_directory would pick up.
+
+    Applies the same extension filter, max_depth and .gitignore/.ccignore
+    rules as walk_files (through IgnoreRules), so events for ignored paths
+    (build output, node_modules, ...) can be dropped without listing
+    anything. Call reset() after an ignore file changes.
+    """
+
+    recursive = True
+
+    def __init__(
+        self,
+        root: Path,
+        include: Optional[list[str]] = None,
+        exclude_patterns: Optional[list[str]] = None,
+        max_depth: Optional[int] = None,
+    ):
+        self.root = root.resolve()
+        self.include_set = {
+            f".{ext.lstrip('.')}" for ext in (include or DEFAULT_EXTENSIONS)
+        }
+        self.exclude_patterns = exclude_patterns
+        self.max_depth = max_depth
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget compiled rules so ignore files are read again."""
+        self._rules = IgnoreRules(
+            self.root,
+            get_gitignore_spec(self.root, self.exclude_patterns),
+            self.exclude_patterns,
+            self.max_depth,
+        )
+
+    def _rel(self, path: str) -> Optional[str]:
+        """path relative to root with "/" separators, or None if outside it."""
+        root = str(self.root)
+        if path == root:
+            return ""
+        prefix = root.rstrip(os.sep) + os.sep
+        if not path.startswith(prefix):
+            return None
+        return path[len(prefix) :].replace(os.sep, "/")
+
+    def watches_dir(self, path: str) -> bool:
+        """Whether files below the directory at path can be scanned."""
+        rel = self._rel(path)
+        return rel is not None and not self._rules.excludes_dir(rel)
+
+    def wants_file(self, path: str) -> bool:
+        """Whether the file at path would be scanned."""
+        rel = self._rel(path)
+        if not rel:
+            return False
+        name = rel.rpartition("/")[2]
+        if os.path.splitext(name)[1].lower() not in self.include_set:
+            return False
+        return not self._rules.excludes_file(rel)
+
+    def is_rule_file(self, path: str) -> bool:
+        """Whether path is an ignore file that applies below root."""
+        rel = self._rel(path)
+        if not rel or os.path.basename(rel) not in IGNORE_FILES:
+            return False
+        return not self._rules.excludes_dir(rel.rpartition("/")[0])
+
+    def key_for(self, path: str) -> Path:
+        return Path(path)
+
+
+class FileTarget:
+    """A file named on the command line, watched through its directory."""
+
+    recursive = False
+
+    def __init__(self, path: Path):
+        self.key = path
+        self.path = str(path.resolve())
+        self.root = Path(os.path.dirname(self.path))
+
+    def reset(self) -> None:
+        pass
+
+    def watches_dir(self, path: str) -> bool:
+        return path == str(self.root)
+
+    def wants_file(self, path: str) -> bool:
+        return path == self.path
+
+    def is_rule_file(self, path: str) -> bool:
+        return False
+
+    def key_for(self, path: str) -> Path:
+        return self.key
+
+
+Target = Union[PathFilter, FileTarget]
+
+
+class Bundle:
+    """Formatted files kept in memory so a change re-renders only its blocks.
+
+    Token counts and <file> blocks are stored per file. update() tokenizes
+    and renders just the files it is given, unless the common root of the
+    bundle moves, in which case every block is re-rendered with its stored
+    token count.
+    """
+
+    def __init__(self, jobs: Optional[int] = None):
+        self.jobs = jobs
+        self.contents: dict[Path, str] = {}
+        self.blocks: dict[Path, FormattedFile] = {}
+        self.root_path = Path(".")
+
+    @classmethod
+    def from_result(cls, result: FormatResult, jobs: Optional[int] = None):
+        """Start from the rendered result of format_files."""
+        bundle = cls(jobs)
+        for formatted in result.files:
+            bundle.contents[formatted.path] = formatted.content
+            bundle.blocks[formatted.path] = formatted
+        bundle.root_path = result.root_path
+        return bundle
+
+    def update(self, changed: dict[Path, Optional[str]]) -> int:
+        """Apply new contents (None removes a file); return blocks rendered."""
+        for path, content in changed.items():
+            if content is None:
+                self.contents.pop(path, None)
+                self.blocks.pop(path, None)
+            else:
+                self.contents[path] = content
+
+        root_path = Path(".")
+        if self.contents:
+            root_path = Path(commonpath([str(p.absolute()) for p in self.contents]))
+        if root_path != self.root_path:
+            stale = list(self.contents)
+        else:
+            stale = [path for path, content in changed.items() if content is not None]
+        self.root_path = root_path
+
+        todo = [path for path in stale if path in changed or path not in self.blocks]
+        counts = dict(
+            zip(
+                todo,
+                count_tokens(
+                    [self.contents[path] for path in todo],
+                    jobs=self.jobs,
+                    labels=[str(path) for path in todo],
+                ),
+            )
+        )
+        for path in stale:
+            tokens = counts.get(path)
+            if tokens is None:
+                tokens = self.blocks[path].stats.tokens
+            self.blocks[path] = format_file(
+                path, root_path, self.contents[path], tokens=tokens
+            )
+        get_token_cache().flush()
+        return len(stale)
+
+    def result(self) -> FormatResult:
+        """The bundle as a rendered FormatResult, like format_files returns."""
+        files = [self.blocks[path] for path in self.contents]
+        result = FormatResult(
+            files=files,
+            root_path=self.root_path,
+            timestamp=datetime.now(timezone.utc),
+            total_chars=sum(f.stats.chars for f in files),
+            total_tokens=sum(f.stats.tokens for f in files),
+            formatted_content="",
+        )
+        if files:
+            result.formatted_content = "\n".join(
+                [create_header(result)] + [f.formatted_content for f in files]
+            )
+        else:
+            result.formatted_content = "<!-- No files found matching criteria -->\n"
+            result.has_header = False
+        return result
+
+
+@dataclass
+class Changes:
+    """Paths reported by a watcher since the last call."""
+
+    paths: set[str] = field(default_factory=set)
+    rescan: bool = False  # Events were lost; everything may have changed
+
+
+def _list_dirs(targets: list[Target], path: str) -> tuple[list[str], list[str]]:
+    """(subdirectories to watch, files) directly in the directory at path."""
+    recursive = any(t.recursive and t.watches_dir(path) for t in targets)
+    dirs, files = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and any(
+                            t.recursive and t.watches_dir(entry.path) for t in targets
+                        ):
+                            dirs.append(entry.path)
+                    elif entry.is_file():
+                        files.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return dirs, files
+
+
+class InotifyWatcher:
+    """Watches every scanned directory with Linux inotify (through ctypes).
+
+    Directories ruled out by the targets' ignore rules get no watch, so
+    changes there cost nothing. Directories created later are watched as
+    they appear, and the files already in them are reported.
+    """
+
+    MASK = (
+        IN_MODIFY
+        | IN_CLOSE_WRITE
+        | IN_MOVED_FROM
+        | IN_MOVED_TO
+        | IN_CREATE
+        | IN_DELETE
+        | IN_DELETE_SELF
+        | IN_MOVE_SELF
+        | IN_ONLYDIR
+    )
+
+    def __init__(self, targets: list[Target]):
+        import ctypes
+        import ctypes.util
+
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.targets = targets
+        self._paths: dict[int, str] = {}  # Watch descriptor -> directory
+        self._wds: dict[str, int] = {}
+        self.resync()
+
+    def _add_tree(self, path: str) -> list[str]:
+        """Watch path and the watched directories below it; return their files."""
+        import ctypes
+
+        found = []
+        stack = [path]
+        while stack:
+            dir_path = stack.pop()
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dir_path), self.MASK)
+            if wd < 0:
+                if ctypes.get_errno() == 28:  # ENOSPC: out of watches
+                    raise OSError(28, "inotify watch limit reached")
+                continue  # Removed (or unreadable) before it could be watched
+            self._paths[wd] = dir_path
+            self._wds[dir_path] = wd
+            dirs, files = _list_dirs(self.targets, dir_path)
+            found.extend(files)
+            stack.extend(dirs)
+        return found
+
+    def _remove_tree(self, path: str) -> None:
+        prefix = path.rstrip(os.sep) + os.sep
+        for dir_path in [p for p in self._wds if p == path or p.startswith(prefix)]:
+            wd = self._wds.pop(dir_path)
+            self._paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def resync(self) -> None:
+        """Watch the targets' directories again, e.g. after ignore rules changed."""
+        for root in {str(t.root) for t in self.targets}:
+            self._add_tree(root)
+
+    def wait(self, timeout: float) -> Changes:
+        """Wait up to timeout seconds and return the paths that changed."""
+        changes = Changes()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changes
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            self._parse(data, changes)
+        return changes
+
+    def _parse(self, data: bytes, changes: Changes) -> None:
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                changes.rescan = True
+                continue
+            dir_path = self._paths.get(wd)
+            if dir_path is None:
+                continue
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+                if self._wds.get(dir_path) == wd:
+                    del self._wds[dir_path]
+                continue
+            path = os.path.join(dir_path, name) if name else dir_path
+            changes.paths.add(path)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    if any(t.recursive and t.watches_dir(path) for t in self.targets):
+                        changes.paths.update(self._add_tree(path))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._remove_tree(path)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Finds changes by walking the watched directories every interval.
+
+    Used where inotify isn't available. Files are compared by mtime and
+    size; ignored directories aren't walked.
+    """
+
+    def __init__(self, targets: list[Target], interval: float = POLL_INTERVAL):
+        self.targets = targets
+        self.interval = interval
+        self._next = time.monotonic() + interval
+        self.resync()
+
+    def _stat_files(self) -> dict[str, tuple[int, int]]:
+        state = {}
+        stack = list({str(t.root) for t in self.targets})
+        while stack:
+            dirs, files = _list_dirs(self.targets, stack.pop())
+            stack.extend(dirs)
+            for path in files:
+                if not any(
+                    t.wants_file(path) or t.is_rule_file(path) for t in self.targets
+                ):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def resync(self) -> None:
+        """Take a fresh baseline to compare against."""
+        self._state = self._stat_files()
+
+    def wait(self, timeout: float) -> Changes:
+        """Wait up to timeout seconds and return the paths that changed."""
+        remaining = self._next - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return Changes()
+        time.sleep(max(remaining, 0))
+        self._next = time.monotonic() + self.interval
+        previous, self._state = self._state, self._stat_files()
+        return Changes(
+            {
+                path
+                for path in previous.keys() | self._state.keys()
+                if previous.get(path) != self._state.get(path)
+            }
+        )
+
+    def close(self) -> None:
+        pass
+
+
+def create_watcher(targets: list[Target]) -> Union[InotifyWatcher, PollingWatcher]:
+    """An inotify watcher if possible, otherwise a polling one."""
+    try:
+        return InotifyWatcher(targets)
+    except OSError:
+        return PollingWatcher(targets)
+
+
+def collect_changes(
+    targets: list[Target],
+    bundle: Bundle,
+    paths: set[str],
+    read: Callable[[Path], Optional[str]],
+    skip: frozenset[str] = frozenset(),
+) -> tuple[dict[Path, Optional[str]], bool]:
+    """Turn changed paths into new bundle contents (None = removed).
+
+    Paths the targets wouldn't scan, and those in skip (such as the output
+    file), are dropped. Returns the changes and whether an ignore file
+    changed, which calls for a full rescan.
+    """
+    changed: dict[Path, Optional[str]] = {}
+    rules_changed = False
+    for path in sorted(paths - skip):
+        if any(t.is_rule_file(path) for t in targets):
+            rules_changed = True
+            continue
+        if os.path.isdir(path):
+            continue  # The watcher reports the files in new directories
+        if not os.path.exists(path):
+            # A removed or renamed directory takes its files with it
+            prefix = path.rstrip(os.sep) + os.sep
+            for key in bundle.contents:
+                if str(key).startswith(prefix):
+                    changed[key] = None
+        for target in targets:
+            if target.wants_file(path):
+                key = target.key_for(path)
+                changed[key] = read(key) if os.path.isfile(path) else None
+
+    # Saving a file without changing it (or touching it) costs nothing
+    changed = {
+        key: content
+        for key, content in changed.items()
+        if bundle.contents.get(key) != content
+    }
+    return changed, rules_changed
+
+
+def stdin_requested() -> bool:
+    """Whether Enter was pressed on an interactive stdin (consumes the line)."""
+    try:
+        if not sys.stdin.isatty():
+            return False
+        ready, _, _ = select.select([sys.stdin], [], [], 0)
+    except (OSError, ValueError):
+        return False  # No select() on console handles on Windows
+    if not ready:
+        return False
+    sys.stdin.readline()
+    return True
+
+
+def run_watch(
+    targets: list[Target],
+    bundle: Bundle,
+    read: Callable[[Path], Optional[str]],
+    rescan: Callable[[], dict[Path, str]],
+    emit: Callable[[Bundle, int], None],
+    debounce: float = DEFAULT_DEBOUNCE,
+    watcher=None,
+    requested: Callable[[], bool] = stdin_requested,
+    stop: Optional[threading.Event] = None,
+    skip: frozenset[str] = frozenset(),
+    prepare: Optional[Callable[[], None]] = None,
+) -> None:
+    """Keep bundle up to date with changes under targets until interrupted.
+
+    Changes are collected until none arrive for debounce seconds, then only
+    the affected files are re-read, re-tokenized and re-rendered and
+    emit(bundle, files changed) is called. emit is also called, with 0
+    changes, whenever requested() returns True (Enter on the terminal by
+    default). A changed ignore file re-applies the rules with rescan(),
+    which returns the full scan. Changes to paths in skip (absolute paths,
+    such as the file being written) are ignored. prepare(), if given, is
+    called before each batch of changes is read, e.g. to refresh the git
+    status diff modes depend on. Returns when stop is set or on Ctrl-C.
+    """
+    watcher = watcher if watcher is not None else create_watcher(targets)
+    pending: set[str] = set()
+    rescan_pending = False
+    last_change = 0.0
+    try:
+        while stop is None or not stop.is_set():
+            changes = watcher.wait(debounce if pending or rescan_pending else 0.5)
+            if changes.paths or changes.rescan:
+                pending |= changes.paths
+                rescan_pending = rescan_pending or changes.rescan
+                last_change = time.monotonic()
+                continue
+            if (pending or rescan_pending) and (
+                time.monotonic() - last_change >= debounce
+            ):
+                if prepare is not None:
+                    prepare()
+                changed, rules_changed = collect_changes(
+                    targets, bundle, pending, read, skip
+                )
+                pending = set()
+                if rules_changed or rescan_pending:
+                    for target in targets:
+                        target.reset()
+                    files = {
+                        path: content
+                        for path, content in rescan().items()
+                        if str(path) not in skip
+                    }
+                    changed = {
+                        path: content
+                        for path, content in files.items()
+                        if bundle.contents.get(path) != content
+                    }
+                    changed.update(
+                        {path: None for path in bundle.contents if path not in files}
+                    )
+                    watcher.resync()
+                    rescan_pending = False
+                if changed:
+                    bundle.update(changed)
+                    emit(bundle, len(changed))
+            elif requested():
+                emit(bundle, 0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
@@ -31,3 +31,29 @@ def test_fixture_structure(sample_project):
     assert (sample_project / "db" / "schema.sql").exists()
     assert (sample_project / ".gitignore").exists()
     assert (sample_project / ".env").exists()
+
+
+@pytest.fixture
+def make_tree():
+    """Write files under a root, given as {relative path: content}."""
+
+    def make(root: Path, files: dict[str, str]) -> Path:
+        for rel, content in files.items():
+            path = root / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+        return root
+
+    return make
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path_factory, monkeypatch):
+    """Keep on-disk caches out of the user's home directory during tests."""
+    from copychat import format as format_module
+
+    cache_dir = tmp_path_factory.mktemp("copychat_cache")
+    monkeypatch.setenv("COPYCHAT_CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(format_module, "_token_cache", None)
+    monkeypatch.setattr(format_module, "_encoding", None)
+    return cache_dir
@@ -0,0 +1,91 @@
+"""Tests for the benchmark harness in benchmarks/."""
+
+from benchmarks.run import compare_results, main, run_benchmarks
+from benchmarks.synthetic import RepoShape, generate_repo
+from copychat.core import get_changed_files, scan_directory
+
+
+def small_shape(**overrides) -> RepoShape:
+    values = dict(
+        files=40,
+        depth=2,
+        fanout=2,
+        lines_per_file=5,
+        ignored_files=12,
+        binary_files=4,
+        large_files=1,
+        large_file_size=4096,
+        changed_files=5,
+        branch_changes=3,
+    )
+    values.update(overrides)
+    return RepoShape(**values)
+
+
+def test_generate_repo_shape(tmp_path, monkeypatch):
+    """The generated repository has the requested files, ignores and changes."""
+    repo = generate_repo(tmp_path / "repo", small_shape())
+
+    assert len(repo.source_files) == 41  # 40 sources + 1 large file
+    assert len(repo.changed_files) == 5
+    assert (repo.root / ".git").is_dir()
+    assert len(list(repo.root.rglob(".ccignore"))) > 1
+
+    # Ignored, binary and dependency files are all skipped by the scan
+    files = scan_directory(repo.root)
+    assert set(files) == set(repo.source_files)
+
+    monkeypatch.chdir(repo.root)
+    assert {p.name for p in get_changed_files()} == {p.name for p in repo.changed_files}
+
+
+def test_run_benchmarks_reports_each_benchmark():
+    """Every selected benchmark gets timing results and metadata."""
+    results = run_benchmarks(
+        small_shape(), repeat=1, only=["scan_directory", "get_changed_files"]
+    )
+    assert set(results["benchmarks"]) == {"scan_directory", "get_changed_files"}
+    assert results["meta"]["shape"]["files"] == 40
+    assert results["benchmarks"]["scan_directory"]["median_s"] > 0
+
+
+def test_compare_results_flags_regressions():
+    """Benchmarks slower than the threshold are flagged as regressions."""
+    baseline = {"benchmarks": {"a": {"median_s": 1.0}, "b": {"median_s": 1.0}}}
+    current = {
+        "benchmarks": {
+            "a": {"median_s": 1.1},
+            "b": {"median_s": 1.5},
+            "new": {"median_s": 9.0},
+        }
+    }
+    rows = {row["name"]: row for row in compare_results(current, baseline, 0.2)}
+    assert set(rows) == {"a", "b"}
+    assert not rows["a"]["regressed"]
+    assert rows["b"]["regressed"]
+
+
+def test_main_exits_nonzero_on_regression(tmp_path, monkeypatch):
+    """The runner exits with status 1 when the baseline comparison fails."""
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text('{"benchmarks": {"scan_directory": {"median_s": 0.000000001}}}')
+    argv = [
+        "--files",
+        "10",
+        "--depth",
+        "1",
+        "--changed-files",
+        "0",
+        "--large-files",
+        "0",
+        "--repeat",
+        "1",
+        "--only",
+        "scan_directory",
+        "--baseline",
+        str(baseline),
+        "--output",
+        str(tmp_path / "results.json"),
+    ]
+    assert main(argv) == 1
+    assert (tmp_path / "results.json").exists()
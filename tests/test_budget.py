@@ -0,0 +1,159 @@
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from copychat import budget
+from copychat.budget import Candidate, Quota, parse_quota, select_files
+from copychat.cli import app
+from copychat.format import count_tokens
+
+runner = CliRunner(mix_stderr=False)
+
+
+def _candidates(tmp_path, sizes):
+    return [
+        Candidate(path=tmp_path / name, content="word " * size)
+        for name, size in sizes.items()
+    ]
+
+
+def _tokens(content):
+    return count_tokens([content])[0]
+
+
+def test_selection_fits_budget_and_keeps_order(tmp_path):
+    """Smaller files are preferred and the selection keeps input order."""
+    candidates = _candidates(tmp_path, {"big.py": 400, "a.py": 50, "b.py": 60})
+    budget_tokens = _tokens("word " * 50) + _tokens("word " * 60)
+
+    selection = select_files(candidates, budget_tokens)
+
+    assert [p.name for p, _ in selection.files] == ["a.py", "b.py"]
+    assert selection.total_tokens <= budget_tokens
+    assert selection.total_tokens == sum(_tokens(c) for _, c in selection.files)
+
+
+def test_explicit_and_changed_files_rank_first(tmp_path):
+    """Explicit files beat changed files, which beat smaller ones."""
+    candidates = _candidates(tmp_path, {"small.py": 10, "changed.py": 200, "x.py": 300})
+    candidates[1].changed = True
+    candidates[2].explicit = True
+    per_file = _tokens("word " * 300)
+
+    selection = select_files(candidates, per_file)
+    assert [p.name for p, _ in selection.files] == ["x.py"]
+
+    selection = select_files(candidates, per_file, priority=["changed", "size"])
+    assert [p.name for p, _ in selection.files] == ["small.py", "changed.py"]
+
+
+def test_depth_scorer_prefers_shallow_paths(tmp_path):
+    deep = Candidate(path=tmp_path / "a" / "b" / "deep.py", content="x = 1\n")
+    shallow = Candidate(path=tmp_path / "shallow.py", content="x = 1\n")
+    tokens = _tokens("x = 1\n")
+
+    selection = select_files([deep, shallow], tokens, priority=["depth"])
+
+    assert [p.name for p, _ in selection.files] == ["shallow.py"]
+
+
+def test_custom_scorer(tmp_path, monkeypatch):
+    """Registered scorers can be named in the priority list."""
+    monkeypatch.setattr(budget, "SCORERS", dict(budget.SCORERS))
+
+    @budget.scorer("tests-last")
+    def tests_last(candidate):
+        return 1 if candidate.path.name.startswith("test_") else 0
+
+    candidates = _candidates(tmp_path, {"test_a.py": 10, "app.py": 10})
+    selection = select_files(candidates, _tokens("word " * 10), priority=["tests-last"])
+
+    assert [p.name for p, _ in selection.files] == ["app.py"]
+    with pytest.raises(ValueError, match="Unknown priority"):
+        select_files(candidates, 100, priority=["missing"])
+
+
+def test_directory_quota(tmp_path):
+    """A quota caps the tokens taken from its directory."""
+    vendor = tmp_path / "vendor"
+    candidates = [
+        Candidate(path=vendor / "a.py", content="word " * 10),
+        Candidate(path=vendor / "b.py", content="word " * 10),
+        Candidate(path=tmp_path / "main.py", content="word " * 30),
+    ]
+    per_file = _tokens("word " * 10)
+    quota = Quota(directory=vendor, max_tokens=per_file)
+
+    selection = select_files(candidates, 10_000, quotas=[quota])
+
+    names = [p.name for p, _ in selection.files]
+    assert names == ["a.py", "main.py"]
+    assert quota.used == per_file
+
+
+def test_parse_quota(tmp_path):
+    quota = parse_quota(f"{tmp_path}=25%", 1000)
+    assert quota.directory == tmp_path
+    assert quota.max_tokens == 250
+    assert parse_quota("src=300", 1000).max_tokens == 300
+    assert parse_quota("src=300", 1000).directory == Path("src").absolute()
+    for value in ("src", "=10", "src=lots"):
+        with pytest.raises(ValueError):
+            parse_quota(value, 1000)
+
+
+def test_large_inputs_are_pruned_without_counting(tmp_path, monkeypatch):
+    """Files that can't fit on their size alone are never tokenized."""
+    counted = []
+
+    def fake_count(texts, jobs=None):
+        counted.extend(texts)
+        return [len(text) // 4 for text in texts]
+
+    monkeypatch.setattr(budget, "count_tokens", fake_count)
+    candidates = [
+        Candidate(path=tmp_path / f"f{i}.py", content="x" * 4000) for i in range(1000)
+    ]
+
+    selection = select_files(candidates, 10_000)
+
+    assert len(selection.files) == 10
+    assert selection.total_tokens == 10_000
+    # Only about a budget's worth of files is tokenized
+    assert len(counted) == 10
+    assert selection.pruned == 990
+
+
+def test_cli_max_tokens(tmp_path):
+    """--max-tokens drops files that don't fit and reports the selection."""
+    (tmp_path / "small.py").write_text("x = 1\n")
+    (tmp_path / "large.py").write_text("value = 'word'\n" * 500)
+    out = tmp_path / "out.md"
+
+    result = runner.invoke(
+        app, [str(tmp_path), "--out", str(out), "--max-tokens", "100"]
+    )
+
+    assert result.exit_code == 0
+    assert "Selected 1 of 2 files" in result.stderr
+    text = out.read_text()
+    assert "x = 1" in text
+    assert "value = 'word'" not in text
+
+
+def test_cli_invalid_priority(tmp_path):
+    result = runner.invoke(
+        app, [str(tmp_path), "--max-tokens", "100", "--priority", "size,bogus"]
+    )
+    assert result.exit_code != 0
+
+
+def test_cli_invalid_dir_quota(tmp_path):
+    """A malformed quota is reported as a bad --dir-quota value."""
+    result = runner.invoke(
+        app, [str(tmp_path), "--max-tokens", "100", "--dir-quota", "src=lots"]
+    )
+    assert result.exit_code == 2
+    assert "--dir-quota" in result.stderr
+    assert "Invalid quota limit" in result.stderr
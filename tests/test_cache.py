@@ -0,0 +1,123 @@
+"""Tests for the persistent token count cache."""
+
+import pytest
+import tiktoken
+from copychat import format as format_module
+from copychat.cache import TokenCache, get_cache_dir
+from copychat.format import estimate_tokens, format_files
+
+
+class FakeEncoding:
+    """Stand-in for a tiktoken encoding that counts words and calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text):
+        self.calls += 1
+        return text.split()
+
+
+@pytest.fixture
+def fake_encoding(monkeypatch):
+    encoding = FakeEncoding()
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: encoding)
+    return encoding
+
+
+def test_cache_dir_override(isolated_cache_dir):
+    """COPYCHAT_CACHE_DIR controls where caches live."""
+    assert get_cache_dir() == isolated_cache_dir
+
+
+def test_token_cache_roundtrip(tmp_path):
+    """Counts survive across cache instances and hits/misses are counted."""
+    path = tmp_path / "tokens.sqlite3"
+    key = TokenCache.key("hello world", "cl100k_base")
+
+    cache = TokenCache(path)
+    assert cache.get(key) is None
+    cache.put(key, 2)
+    assert cache.get(key) == 2  # Pending counts are visible before flush
+    cache.close()
+
+    cache = TokenCache(path)
+    assert cache.get(key) == 2
+    assert (cache.hits, cache.misses) == (1, 0)
+    cache.close()
+
+
+def test_token_cache_key_includes_encoding():
+    """The same text under different encodings gets different keys."""
+    assert TokenCache.key("text", "cl100k_base") != TokenCache.key("text", "o200k")
+
+
+def test_token_cache_shared_between_instances(tmp_path):
+    """Two caches on the same file (like two processes) see each other's writes."""
+    path = tmp_path / "tokens.sqlite3"
+    first = TokenCache(path)
+    second = TokenCache(path)
+
+    first.put("a", 1)
+    second.put("b", 2)
+    first.flush()
+    second.flush()
+
+    third = TokenCache(path)
+    assert third.get("a") == 1
+    assert third.get("b") == 2
+    for cache in (first, second, third):
+        cache.close()
+
+
+def test_token_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    """Once over the size limit, the oldest entries are evicted first."""
+    clock = iter(range(1, 1000))
+    monkeypatch.setattr("copychat.cache.time.time", lambda: next(clock))
+    path = tmp_path / "tokens.sqlite3"
+
+    cache = TokenCache(path, max_size=10 * 1024 * 1024)
+    for i in range(2000):
+        cache.put(f"old-{i}", i)
+    cache.flush()
+    for i in range(2000):
+        cache.put(f"new-{i}", i)
+    cache.flush()
+    cache.close()
+
+    cache = TokenCache(path, max_size=64 * 1024)
+    cache.put("latest", 1)
+    cache.flush()
+    keys = {row[0] for row in cache._conn.execute("SELECT key FROM tokens")}
+    cache.close()
+
+    assert "latest" in keys
+    assert 0 < len(keys) < 4001
+    # Everything from the oldest batch goes before anything newer
+    assert not any(key.startswith("old-") for key in keys)
+
+
+def test_estimate_tokens_uses_cache(fake_encoding):
+    """Repeated content is only tokenized once, including across processes."""
+    assert estimate_tokens("one two three") == 3
+    assert estimate_tokens("one two three") == 3
+    assert fake_encoding.calls == 1
+
+    format_module.get_token_cache().close()
+    format_module._token_cache = None  # Simulate a new process
+
+    assert estimate_tokens("one two three") == 3
+    assert fake_encoding.calls == 1
+    assert format_module.get_token_cache().hits == 1
+
+
+def test_format_files_only_tokenizes_new_content(tmp_path, fake_encoding):
+    """format_files tokenizes unseen content and reuses cached counts."""
+    files = [(tmp_path / "a.py", "a = 1"), (tmp_path / "b.py", "b = 2")]
+    first = format_files(files)
+    assert fake_encoding.calls == 2
+
+    files.append((tmp_path / "c.py", "c = 3"))
+    second = format_files(files)
+    assert fake_encoding.calls == 3
+    assert second.total_tokens == first.total_tokens + 3
@@ -122,3 +122,56 @@ def test_ccignore_with_extra_patterns(ccignore_test_dir):
     assert spec.match_file("test.log")
     assert spec.match_file("test.txt")
     assert not spec.match_file("test.json")
+
+
+def test_inherited_ccignore_spec_matches_per_directory_spec(ccignore_test_dir):
+    """Specs inherited down the walk give the same answers as rebuilding them."""
+    # Negations and directory patterns exercise precedence between levels
+    (ccignore_test_dir / "subdir" / ".ccignore").write_text("*.json\n!keep.md\n")
+    (ccignore_test_dir / "subdir" / "nested" / ".ccignore").write_text(
+        "*.md\n!subdir/nested/nested.json\n"
+    )
+    (ccignore_test_dir / "subdir" / "keep.md").write_text("keep")
+    hidden = ccignore_test_dir / "subdir" / "hidden"
+    hidden.mkdir()
+    (hidden / ".ccignore").write_text("subdir/hidden/\n")
+    (hidden / "secret.txt").write_text("secret")
+
+    expected = set()
+    for file_path in ccignore_test_dir.rglob("*"):
+        if not file_path.is_file() or file_path.name == ".ccignore":
+            continue
+        rel = str(file_path.relative_to(ccignore_test_dir))
+        spec = get_ccignore_spec(file_path.parent, ["*.log"])
+        if file_path.parent == hidden and spec.match_file("subdir/hidden/"):
+            continue
+        if not spec.match_file(rel):
+            expected.add(file_path)
+
+    files = scan_directory(
+        ccignore_test_dir, include=["txt", "json", "md"], exclude_patterns=["*.log"]
+    )
+    assert set(files) == expected
+    assert ccignore_test_dir / "subdir" / "nested" / "nested.json" in expected
+    assert hidden / "secret.txt" not in expected
+
+
+def test_ccignore_files_are_read_once_per_directory(ccignore_test_dir, monkeypatch):
+    """Ancestors are searched once for the root, then each file is read once."""
+    from copychat import core
+
+    searched = []
+    read = []
+    real_find = core.find_ccignore_files
+    real_read = core.read_ignore_patterns
+    monkeypatch.setattr(
+        core, "find_ccignore_files", lambda p: searched.append(p) or real_find(p)
+    )
+    monkeypatch.setattr(
+        core, "read_ignore_patterns", lambda p: read.append(p) or real_read(p)
+    )
+
+    scan_directory(ccignore_test_dir, include=["txt"])
+
+    assert len(searched) == 1
+    assert sorted(read) == sorted(ccignore_test_dir.rglob(".ccignore"))
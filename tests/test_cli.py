@@ -143,6 +143,7 @@ def test_cli_append_file(tmp_path, monkeypatch):
     assert "existing content" in content
     assert 'language="python"' in content
     assert "print('hello')" in content
+    assert content.startswith("existing content\n\n\n<file")
 
 
 def test_cli_append_clipboard(tmp_path, monkeypatch):
@@ -343,3 +344,26 @@ def test_table_alignment_with_dot_path(tmp_path, monkeypatch):
 
     # Confirm test.md appears in the table with proper alignment
     assert "test.md" in table_output, "Filename should appear in table output"
+
+
+def test_cli_max_file_size(tmp_path):
+    """--max-file-size skips large files and reports why."""
+    (tmp_path / "small.py").write_text("print('small')")
+    (tmp_path / "large.py").write_text("x = 1\n" * 1000)
+    out = tmp_path / "out.md"
+
+    result = runner.invoke(
+        app, [str(tmp_path), "--out", str(out), "--max-file-size", "1K"]
+    )
+
+    assert result.exit_code == 0
+    assert "Skipped 1 files (1 too large)" in strip_ansi(result.stderr)
+    content = out.read_text()
+    assert "print('small')" in content
+    assert "x = 1" not in content
+
+
+def test_cli_invalid_max_file_size(tmp_path):
+    """An unparseable size is rejected."""
+    result = runner.invoke(app, [str(tmp_path), "--max-file-size", "lots"])
+    assert result.exit_code != 0
@@ -1,7 +1,21 @@
+import os
+import subprocess
+
 import pytest
 from copychat.core import (
     find_gitignore,
     DiffMode,
+    FAST_STATUS,
+    IgnoreRules,
+    ScanStats,
+    get_changed_files,
+    get_file_content,
+    get_gitignore_spec,
+    get_git_diff,
+    get_git_diffs,
+    get_repo_context,
+    RepoContexts,
+    read_pipelined,
     is_glob_pattern,
     resolve_paths,
     scan_directory,
@@ -141,3 +155,432 @@ def test_scan_single_file(tmp_path):
     # Test with non-existent file
     files = scan_directory(tmp_path / "nonexistent.py", include=["py"])
     assert len(files) == 0
+
+
+def test_scan_prunes_excluded_and_deep_directories(tmp_path):
+    """Excluded and too-deep subtrees are skipped before they are listed."""
+    (tmp_path / "main.py").write_text("print('main')")
+    deps = tmp_path / "node_modules" / "pkg"
+    deps.mkdir(parents=True)
+    for i in range(50):
+        (deps / f"dep{i}.js").write_text("module.exports = {}")
+    deep = tmp_path / "a" / "b" / "c"
+    deep.mkdir(parents=True)
+    (tmp_path / "a" / "shallow.py").write_text("print('shallow')")
+    (deep / "deep.py").write_text("print('deep')")
+
+    stats = ScanStats()
+    files = scan_directory(tmp_path, max_depth=1, stats=stats)
+
+    assert {p.name for p in files} == {"main.py", "shallow.py"}
+    # Root lists main.py, node_modules and a; "a" lists shallow.py and b
+    assert stats.entries == 5
+    assert stats.dirs_pruned == 2
+    assert stats.files_matched == 2
+
+
+def test_scan_prunes_ccignored_directories_before_listing(tmp_path, monkeypatch):
+    """Directories excluded by a parent's .ccignore are never listed."""
+    (tmp_path / ".ccignore").write_text("third_party/\n")
+    (tmp_path / "third_party").mkdir()
+    (tmp_path / "third_party" / "lib.py").write_text("print('lib')")
+    (tmp_path / "main.py").write_text("print('main')")
+
+    listed = []
+    real_scandir = os.scandir
+
+    def scandir(path):
+        listed.append(Path(path))
+        return real_scandir(path)
+
+    monkeypatch.setattr(os, "scandir", scandir)
+    files = scan_directory(tmp_path)
+
+    assert {p.name for p in files} == {"main.py"}
+    assert tmp_path / "third_party" not in listed
+
+
+def _git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.email=t@example.com", "-c", "user.name=t", *args],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def changed_repo(tmp_path, monkeypatch):
+    """A git repository with committed, modified, untracked and branch changes."""
+    repo = tmp_path / "repo"
+    (repo / "pkg").mkdir(parents=True)
+    (repo / "a.py").write_text("a = 1\n")
+    (repo / "pkg" / "b.py").write_text("b = 1\n")
+    (repo / "pkg" / "c d.py").write_text("c = 1\n")
+    (repo / "same.py").write_text("same = 1\n")
+    _git(repo, "init", "-q", "-b", "main")
+    _git(repo, "add", "-A")
+    _git(repo, "commit", "-q", "-m", "initial")
+    _git(repo, "checkout", "-q", "-b", "feature")
+    (repo / "pkg" / "b.py").write_text("b = 2\n")
+    (repo / "added.py").write_text("added = 1\n")
+    _git(repo, "add", "-A")
+    _git(repo, "commit", "-q", "-m", "feature")
+    (repo / "a.py").write_text("a = 2\n")
+    (repo / "pkg" / "c d.py").write_text("c = 2\n")
+    (repo / "untracked.py").write_text("untracked = 1\n")
+    monkeypatch.chdir(repo)
+    return repo
+
+
+@pytest.mark.parametrize("compare_branch", [None, "main"])
+def test_git_diffs_match_per_file_diffs(changed_repo, compare_branch):
+    """The batched diff gives the same text as get_git_diff for every file."""
+    diffs = get_git_diffs(compare_branch)
+    assert diffs is not None
+    for path in changed_repo.rglob("*.py"):
+        assert diffs.get(path, "") == get_git_diff(path, compare_branch)
+    assert diffs[changed_repo / "a.py"]
+
+
+@pytest.mark.parametrize(
+    "diff_mode",
+    [DiffMode.DIFF_ONLY, DiffMode.CHANGED_WITH_DIFF, DiffMode.FULL_WITH_DIFF],
+)
+@pytest.mark.parametrize("compare_branch", [None, "main"])
+def test_scan_diff_modes_use_batched_diffs(
+    changed_repo, monkeypatch, diff_mode, compare_branch
+):
+    """Diff modes produce the same output as per-file git diffs."""
+    changed_files = get_changed_files(compare_branch)
+    expected = {}
+    for path in sorted(changed_repo.rglob("*.py")):
+        content = get_file_content(path, diff_mode, changed_files, compare_branch)
+        if content is not None:
+            expected[path] = content
+
+    def fail(*args, **kwargs):
+        raise AssertionError("get_git_diff should not be called per file")
+
+    monkeypatch.setattr("copychat.core.get_git_diff", fail)
+    files = scan_directory(
+        changed_repo, diff_mode=diff_mode, compare_branch=compare_branch
+    )
+    assert files == expected
+
+
+def test_changed_files_parse_porcelain_v2(changed_repo):
+    """Quoted, untracked and renamed paths all come through as real paths."""
+    (changed_repo / "new dir").mkdir()
+    (changed_repo / "new dir" / "ü.py").write_text("u = 1\n")
+    _git(changed_repo, "mv", "same.py", "renamed.py")
+
+    changed = get_changed_files()
+
+    assert {p.relative_to(changed_repo.resolve()).as_posix() for p in changed} == {
+        "a.py",
+        "pkg/c d.py",
+        "untracked.py",
+        "new dir/ü.py",
+        "renamed.py",
+    }
+
+
+@pytest.mark.parametrize("diff_mode", [DiffMode.DIFF_ONLY, DiffMode.FULL_WITH_DIFF])
+def test_diff_modes_use_scanned_repo(changed_repo, tmp_path, monkeypatch, diff_mode):
+    """Diffs come from the repository being scanned, not the working directory."""
+    expected = scan_directory(changed_repo, diff_mode=diff_mode)
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+
+    assert scan_directory(changed_repo, diff_mode=diff_mode) == expected
+    assert get_git_diff(changed_repo / "a.py")
+
+
+def test_repo_context_is_shared(changed_repo, monkeypatch):
+    """Scanning several paths in one repository runs git status once."""
+    calls = []
+    real_run = subprocess.run
+
+    def run(cmd, *args, **kwargs):
+        calls.append(cmd)
+        return real_run(cmd, *args, **kwargs)
+
+    monkeypatch.setattr(subprocess, "run", run)
+    repos = RepoContexts()
+    mode = DiffMode.CHANGED_WITH_DIFF
+    scan_directory(changed_repo / "pkg", diff_mode=mode, repos=repos)
+    scan_directory(changed_repo, diff_mode=mode, repos=repos)
+
+    assert sum("status" in cmd for cmd in calls) == 1
+    assert sum("diff" in cmd for cmd in calls) == 1
+    assert repos.get(changed_repo / "pkg") is repos.get(changed_repo)
+    assert get_repo_context(changed_repo) is not get_repo_context(changed_repo)
+
+
+def test_unshared_lookups_see_new_changes(changed_repo):
+    """Without a shared RepoContexts, each lookup reads the current status."""
+    (changed_repo / "later.py").write_text("later = 1\n")
+    assert (changed_repo / "later.py").resolve() in get_changed_files(path=changed_repo)
+    (changed_repo / "a.py").write_text("a = 'edited again'\n")
+    assert "edited again" in get_git_diff(changed_repo / "a.py")
+    files = scan_directory(changed_repo, diff_mode=DiffMode.CHANGED_WITH_DIFF)
+    assert "later = 1" in files[changed_repo / "later.py"]
+
+
+def test_fast_status_limits_to_scanned_path(changed_repo, monkeypatch):
+    """Fast status gives the same changes under a path with a limited status."""
+    expected = {
+        p for p in get_changed_files() if p.parent == (changed_repo / "pkg").resolve()
+    }
+    calls = []
+    real_run = subprocess.run
+
+    def run(cmd, *args, **kwargs):
+        calls.append(cmd)
+        return real_run(cmd, *args, **kwargs)
+
+    monkeypatch.setattr(subprocess, "run", run)
+    changed = get_changed_files(path=changed_repo / "pkg", status=FAST_STATUS)
+
+    assert changed == expected
+    (status,) = [cmd for cmd in calls if "status" in cmd]
+    assert "core.untrackedCache=true" in status
+    assert status[-2:] == ["--", "pkg"]
+    # The untracked cache was written to the index for later runs
+    assert b"UNTR" in (changed_repo / ".git" / "index").read_bytes()
+
+    files = scan_directory(
+        changed_repo / "pkg",
+        diff_mode=DiffMode.CHANGED_WITH_DIFF,
+        git_status=FAST_STATUS,
+    )
+    assert set(files) == expected
+
+
+def test_fast_status_keeps_configured_fsmonitor(changed_repo, monkeypatch):
+    _git(changed_repo, "config", "core.fsmonitor", "false")
+    calls = []
+    real_run = subprocess.run
+
+    def run(cmd, *args, **kwargs):
+        calls.append(cmd)
+        return real_run(cmd, *args, **kwargs)
+
+    monkeypatch.setattr(subprocess, "run", run)
+    get_changed_files(path=changed_repo, status=FAST_STATUS)
+
+    (status,) = [cmd for cmd in calls if "status" in cmd]
+    assert "core.fsmonitor=true" not in status
+
+
+def test_scan_directory_parallel_reads_match_serial(sample_project):
+    """Pipelined reading returns the same files in the same order."""
+    serial = scan_directory(sample_project)
+    parallel = scan_directory(sample_project, jobs=4)
+    assert list(parallel.items()) == list(serial.items())
+
+
+def test_read_pipelined_is_ordered_and_bounded():
+    """Results come back in input order with a bounded number in flight."""
+    consumed = []
+    in_flight = []
+    submitted = 0
+
+    def paths():
+        nonlocal submitted
+        for i in range(100):
+            submitted += 1
+            in_flight.append(submitted - len(consumed))
+            yield Path(f"file{i}.py")
+
+    def read(path):
+        return path.stem
+
+    for path, content in read_pipelined(paths(), read, jobs=4, queue_depth=8):
+        consumed.append(content)
+
+    assert consumed == [f"file{i}" for i in range(100)]
+    assert max(in_flight) <= 8
+
+
+@pytest.mark.parametrize("jobs", [None, 4])
+def test_scan_directory_skips_unreadable_content(tmp_path, jobs):
+    """Binary, oversized and undecodable files are skipped and counted."""
+    (tmp_path / "good.py").write_text("print('good')")
+    (tmp_path / "binary.txt").write_bytes(b"text\x00\x01\x02 more")
+    (tmp_path / "latin1.txt").write_bytes("caf\xe9".encode("latin-1"))
+    (tmp_path / "big.json").write_text("[" + "1," * 2000 + "1]")
+
+    stats = ScanStats()
+    files = scan_directory(tmp_path, max_file_size=1024, stats=stats, jobs=jobs)
+
+    assert {p.name for p in files} == {"good.py"}
+    assert stats.skipped == {"binary": 1, "undecodable": 1, "too large": 1}
+
+
+def test_scan_directory_detects_binary_after_sniff_window(tmp_path):
+    """Only the first few KB are sniffed; later invalid bytes are still caught."""
+    (tmp_path / "late.txt").write_bytes(b"a" * 20000 + b"\xff\xfe")
+
+    stats = ScanStats()
+    assert scan_directory(tmp_path, stats=stats) == {}
+    assert stats.skipped == {"undecodable": 1}
+
+
+def test_get_file_content_skips_binary(tmp_path):
+    """get_file_content returns None for a binary file instead of raising."""
+    path = tmp_path / "data.json"
+    path.write_bytes(b"\x00\x00\x00")
+
+    stats = ScanStats()
+    assert get_file_content(path, DiffMode.FULL, stats=stats) is None
+    assert stats.skipped == {"binary": 1}
+
+
+@pytest.mark.parametrize("jobs", [None, 4])
+def test_scan_directory_honors_nested_gitignore(tmp_path, jobs):
+    """Nested .gitignore files apply to their own subtree, the way git does."""
+    root = tmp_path / "repo"
+    files = {
+        ".gitignore": "*.tmp.txt\n",
+        "top.py": "",
+        "top.tmp.txt": "",
+        "pkg/.gitignore": "generated/\n/local.py\n*.out.txt\n!keep.out.txt\n",
+        "pkg/mod.py": "",
+        "pkg/local.py": "",
+        "pkg/sub/local.py": "",
+        "pkg/a.out.txt": "",
+        "pkg/keep.out.txt": "",
+        "pkg/generated/gen.py": "",
+        "pkg/sub/.gitignore": "!*.tmp.txt\nskip/\n",
+        "pkg/sub/again.tmp.txt": "",
+        "pkg/sub/skip/inner.py": "",
+        "other/a.out.txt": "",
+        "other/local.py": "",
+        "other/generated/gen.py": "",
+    }
+    for rel, text in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    _git(root.parent, "init", "-q", str(root))
+
+    listed = subprocess.run(
+        ["git", "ls-files", "--others", "--exclude-standard"],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    expected = {root / rel for rel in listed if rel.endswith((".py", ".txt"))}
+
+    scanned = scan_directory(root, include=["py", "txt"], jobs=jobs)
+    assert set(scanned) == expected
+    assert root / "pkg" / "sub" / "local.py" in expected
+    assert root / "pkg" / "sub" / "again.tmp.txt" in expected
+
+
+def _ignore_tree(root):
+    files = {
+        ".gitignore": "*.tmp.txt\n",
+        ".ccignore": "*.snap.md\n",
+        "top.py": "",
+        "top.tmp.txt": "",
+        "notes.snap.md": "",
+        "pkg/.gitignore": "generated/\n!keep.tmp.txt\n",
+        "pkg/mod.py": "",
+        "pkg/keep.tmp.txt": "",
+        "pkg/generated/gen.py": "",
+        "pkg/.ccignore": "pkg/private/\n!pkg/keep.snap.md\n",
+        "pkg/keep.snap.md": "",
+        "pkg/private/secret.py": "",
+        "pkg/deep/er/file.py": "",
+        "node_modules/dep/index.js": "",
+        "docs/guide.md": "",
+        "docs/skip.md": "",
+    }
+    for rel, text in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"include": ["py", "txt", "md"]},
+        {"exclude_patterns": ["docs/skip.md"]},
+        {"max_depth": 1},
+    ],
+)
+def test_scan_directory_git_listing_matches_walker(tmp_path, kwargs):
+    """Listing files with git gives the same files as walking the tree."""
+    root = tmp_path / "repo"
+    _ignore_tree(root)
+    _git(tmp_path, "init", "-q", str(root))
+    _git(root, "add", "top.py", "pkg/mod.py")
+    _git(root, "commit", "-q", "-m", "initial")
+
+    walked = scan_directory(root, **kwargs)
+    listed = scan_directory(root, use_git=True, **kwargs)
+    assert set(listed) == set(walked)
+    assert listed == {path: walked[path] for path in listed}
+
+
+def test_scan_directory_git_listing_skips_deleted_files(tmp_path):
+    """Tracked files deleted from the work tree are not listed."""
+    root = tmp_path / "repo"
+    root.mkdir()
+    (root / "kept.py").write_text("kept")
+    (root / "gone.py").write_text("gone")
+    _git(tmp_path, "init", "-q", str(root))
+    _git(root, "add", ".")
+    _git(root, "commit", "-q", "-m", "initial")
+    (root / "gone.py").unlink()
+
+    assert scan_directory(root, use_git=True) == {root / "kept.py": "kept"}
+
+
+def test_scan_directory_git_listing_falls_back_outside_repo(tmp_path, monkeypatch):
+    """Outside a git work tree the walker is used."""
+    monkeypatch.setenv("GIT_CEILING_DIRECTORIES", str(tmp_path))
+    (tmp_path / "a.py").write_text("a")
+    assert scan_directory(tmp_path, use_git=True) == {tmp_path / "a.py": "a"}
+
+
+def test_ignore_rules_match_walk(tmp_path):
+    """IgnoreRules reaches the same verdicts as walk_files, file by file."""
+    (tmp_path / ".gitignore").write_text("*.log\nbuild/\n")
+    (tmp_path / "src" / "gen").mkdir(parents=True)
+    (tmp_path / "src" / ".gitignore").write_text("gen/\n!keep.log\n")
+    (tmp_path / "src" / ".ccignore").write_text("secret.py\n")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "deep" / "er").mkdir(parents=True)
+    for rel in [
+        "a.py",
+        "a.log",
+        "build/b.py",
+        "src/c.py",
+        "src/keep.log",
+        "src/secret.py",
+        "src/gen/d.py",
+        "deep/e.py",
+        "deep/er/f.py",
+    ]:
+        (tmp_path / rel).write_text("x\n")
+
+    for max_depth in (None, 1):
+        scanned = {
+            p.relative_to(tmp_path).as_posix()
+            for p in scan_directory(
+                tmp_path, include=["py", "log"], max_depth=max_depth
+            )
+        }
+        rules = IgnoreRules(tmp_path, get_gitignore_spec(tmp_path), max_depth=max_depth)
+        for path in tmp_path.rglob("*.*"):
+            rel = path.relative_to(tmp_path).as_posix()
+            if path.suffix in (".py", ".log"):
+                assert (rel in scanned) != rules.excludes_file(rel), rel
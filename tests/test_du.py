@@ -0,0 +1,81 @@
+from typer.testing import CliRunner
+
+from copychat.cli import app
+from copychat.core import scan_directory
+from copychat.du import collect_usage, render_usage
+from copychat.format import count_tokens
+
+runner = CliRunner(mix_stderr=False)
+
+
+TREE = {
+    "src/pkg/big.py": "value = 1\n" * 200,
+    "src/app.py": "print('app')\n",
+    "docs/guide.md": "# Guide\n\nSome text.\n",
+    "node_modules/dep.js": "ignored\n",
+    "main.py": "x = 1\n",
+}
+
+
+def test_usage_totals_match_scan(tmp_path, make_tree):
+    """Directory totals add up the files scan_directory would return."""
+    make_tree(tmp_path, TREE)
+    files = scan_directory(tmp_path)
+
+    usage = collect_usage(tmp_path)
+
+    assert usage.files == len(files) == 4
+    assert usage.tokens == sum(count_tokens(list(files.values())))
+    src = usage.children["src"]
+    assert src.files == 2
+    assert src.children["pkg"].lines == 201
+    assert src.tokens == src.children["pkg"].tokens + src.children["app.py"].tokens
+    assert "node_modules" not in usage.children
+
+
+def test_render_depth_and_sort(tmp_path, make_tree):
+    make_tree(tmp_path, TREE)
+    usage = collect_usage(tmp_path)
+
+    rows = render_usage(usage, max_depth=1, sort="tokens")
+    labels = [row.split("  ")[-1].strip() for row in rows[1:]]
+    # Only directories one level down, largest first
+    assert labels == [str(tmp_path), "src/", "docs/"]
+
+    rows = render_usage(usage, show_files=True)
+    labels = [row.split("  ")[-1].strip() for row in rows[1:]]
+    assert labels == [
+        str(tmp_path),
+        "docs/",
+        "guide.md",
+        "main.py",
+        "src/",
+        "app.py",
+        "pkg/",
+        "big.py",
+    ]
+
+
+def test_cli_du(tmp_path, make_tree):
+    """`copychat du` prints the table; plain paths still run the main command."""
+    make_tree(tmp_path, TREE)
+
+    result = runner.invoke(
+        app, ["du", str(tmp_path), "--depth", "1", "--exclude", "docs/**"]
+    )
+
+    assert result.exit_code == 0
+    assert "tokens" in result.stdout
+    assert "src/" in result.stdout
+    assert "docs/" not in result.stdout
+
+    out = tmp_path / "out.md"
+    result = runner.invoke(app, [str(tmp_path / "src"), "--out", str(out)])
+    assert result.exit_code == 0
+    assert "print('app')" in out.read_text()
+
+
+def test_cli_du_rejects_files(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    result = runner.invoke(app, ["du", str(tmp_path / "a.py")])
+    assert result.exit_code == 1
@@ -0,0 +1,115 @@
+from typer.testing import CliRunner
+
+from copychat import estimate as estimate_module
+from copychat.cli import app
+from copychat.core import DiffMode, ScanStats, scan_directory
+from copychat.estimate import CHARS_PER_TOKEN, Estimate, estimate_files
+
+runner = CliRunner(mix_stderr=False)
+
+
+TREE = {
+    "src/app.py": "print('app')\n" * 20,
+    "src/util.js": "const x = 1;\n" * 10,
+    "README.md": "# Readme\n",
+    "node_modules/dep.js": "ignored\n",
+    ".gitignore": "*.md\n",
+    "big.py": "x = 1\n" * 1000,
+}
+
+
+def test_estimate_selects_same_files_as_scan(tmp_path, make_tree):
+    """Estimates cover exactly the files a scan would read."""
+    make_tree(tmp_path, TREE)
+    scanned = scan_directory(tmp_path, include=["py", "js", "md"])
+
+    plan = estimate_files(tmp_path, include=["py", "js", "md"])
+
+    assert plan.files == len(scanned)
+    assert plan.bytes == sum(p.stat().st_size for p in scanned)
+
+
+def test_estimate_does_not_read_files(tmp_path, monkeypatch, make_tree):
+    """Only ignore files are opened, never the files being estimated."""
+    make_tree(tmp_path, TREE)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file was read")
+
+    monkeypatch.setattr("copychat.core.read_text_checked", fail)
+    plan = estimate_files(tmp_path)
+    assert plan.files > 0
+
+
+def test_estimate_token_range_uses_language_ratios(tmp_path):
+    plan = Estimate()
+    plan.add(tmp_path / "a.py", 4400)
+    plan.add(tmp_path / "b.unknown", 1000)
+
+    low, high = CHARS_PER_TOKEN["python"]
+    other_low, other_high = CHARS_PER_TOKEN[None]
+    assert plan.files == 2
+    assert plan.bytes == 5400
+    assert plan.min_tokens == int(4400 / high) + int(1000 / other_high)
+    assert plan.max_tokens >= plan.min_tokens
+    assert plan.by_language == {"python": 4400, None: 1000}
+
+
+def test_estimate_max_file_size(tmp_path, make_tree):
+    make_tree(tmp_path, TREE)
+    stats = ScanStats()
+
+    plan = estimate_files(tmp_path, max_file_size=1000, stats=stats)
+
+    assert stats.skipped == {"too large": 1}
+    assert plan.files == 2
+
+
+def test_cli_estimate(tmp_path, monkeypatch, make_tree):
+    """--estimate reports the plan without reading or copying anything."""
+    make_tree(tmp_path, TREE)
+    monkeypatch.setattr(
+        estimate_module, "CHARS_PER_TOKEN", {None: (4.0, 4.0)}, raising=True
+    )
+    out = tmp_path / "out.md"
+
+    result = runner.invoke(app, [str(tmp_path), "--estimate", "--out", str(out)])
+
+    assert result.exit_code == 0
+    size = sum(
+        (tmp_path / name).stat().st_size
+        for name in ("src/app.py", "src/util.js", "big.py")
+    )
+    assert f"3 files, {size:,} bytes" in result.stdout
+    assert f"~{size // 4:,}-" in result.stdout
+    assert not out.exists()
+
+
+def test_estimate_diff_modes(tmp_path, monkeypatch):
+    """Diff modes count the files they would copy, with their diffs."""
+    import subprocess
+
+    def git(*args):
+        subprocess.run(
+            ["git", "-c", "user.email=t@example.com", "-c", "user.name=t", *args],
+            cwd=tmp_path,
+            check=True,
+            capture_output=True,
+        )
+
+    git("init", "-q")
+    (tmp_path / "same.py").write_text("same = 1\n")
+    (tmp_path / "edited.py").write_text("edited = 1\n")
+    git("add", "-A")
+    git("commit", "-q", "-m", "initial")
+    (tmp_path / "edited.py").write_text("edited = 2\n")
+    monkeypatch.chdir(tmp_path)
+
+    for mode in DiffMode:
+        scanned = scan_directory(tmp_path, diff_mode=mode)
+        plan = estimate_files(tmp_path, diff_mode=mode)
+        assert plan.files == len(scanned), mode
+    diff_only = estimate_files(tmp_path, diff_mode=DiffMode.DIFF_ONLY)
+    assert diff_only.bytes == len(
+        scan_directory(tmp_path, diff_mode=DiffMode.DIFF_ONLY)[tmp_path / "edited.py"]
+    )
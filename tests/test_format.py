@@ -6,7 +6,12 @@ from copychat.format import (
     create_header,
     estimate_tokens,
     format_files,
+    count_tokens,
+    write_result,
 )
+import io
+import tiktoken
+from copychat import format as format_module
 
 
 @pytest.fixture
@@ -104,3 +109,67 @@ def test_format_file_error(tmp_path):
     formatted_file = format_file(non_existent, tmp_path)
     result = formatted_file.formatted_content
     assert "Error processing" in result
+
+
+class CountingEncoding:
+    """Stand-in tokenizer that counts characters."""
+
+    def encode(self, text):
+        return list(text)
+
+
+def test_encoding_loaded_once(monkeypatch):
+    """The tokenizer is loaded once per process, not once per call."""
+    loads = []
+
+    def get_encoding(name):
+        loads.append(name)
+        return CountingEncoding()
+
+    monkeypatch.setattr(tiktoken, "get_encoding", get_encoding)
+    assert estimate_tokens("abc") == 3
+    assert estimate_tokens("abcd") == 4
+    assert count_tokens(["x", "yy"], jobs=2) == [1, 2]
+    assert loads == ["cl100k_base"]
+
+
+def test_count_tokens_parallel_matches_serial(monkeypatch):
+    """Parallel counting returns the same counts, in order, as serial counting."""
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: CountingEncoding())
+    texts = [f"text {i} " * i for i in range(50)] + ["dup", "dup"]
+    parallel = count_tokens(texts, jobs=8)
+    format_module._token_cache = None  # Don't let the cache answer the second pass
+    assert parallel == count_tokens(texts, jobs=1)
+    assert parallel == [len(text) for text in texts]
+
+
+def test_format_files_jobs_do_not_change_totals(temp_files):
+    """Token totals are independent of the worker count."""
+    _, files = temp_files
+    file_contents = [(f, f.read_text()) for f in files]
+    serial = format_files(file_contents, jobs=1)
+    parallel = format_files(file_contents, jobs=4)
+    assert serial.total_tokens == parallel.total_tokens
+    assert [f.stats.tokens for f in serial.files] == [
+        f.stats.tokens for f in parallel.files
+    ]
+
+
+def test_write_result_matches_joined_output(temp_files):
+    """Streaming a result writes exactly what format_files joins in memory."""
+    _, files = temp_files
+    file_contents = [(f, f.read_text()) for f in files]
+    rendered = format_files(file_contents)
+    streamed = format_files(file_contents, render=False)
+    streamed.timestamp = rendered.timestamp
+
+    assert streamed.formatted_content == ""
+    assert all(f.formatted_content == "" for f in streamed.files)
+
+    out = io.StringIO()
+    write_result(streamed, out)
+    assert out.getvalue() == str(rendered)
+
+    out = io.StringIO()
+    write_result(streamed, out, include_header=False)
+    assert out.getvalue() == "\n".join(f.formatted_content for f in rendered.files)
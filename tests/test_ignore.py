@@ -0,0 +1,159 @@
+"""Differential tests: IgnoreMatcher must agree with pathspec."""
+
+import random
+
+import pathspec
+import pytest
+
+from copychat.core import get_gitignore_spec
+from copychat.ignore import GitignoreChain, IgnoreMatcher, has_negations
+from copychat.patterns import EXCLUDED_DIRS, EXCLUDED_PATTERNS
+
+# Patterns covering every shape the matcher distinguishes
+PATTERNS = [
+    *sorted(EXCLUDED_PATTERNS),
+    *(f"{d}/" for d in sorted(EXCLUDED_DIRS)),
+    "build",
+    "*.tmp/",
+    "docs/*.md",
+    "/root.txt",
+    "src/**/gen_*.py",
+    "**/fixtures",
+    "file?.py",
+    "[ab].js",
+    "*",
+    ".*",
+    "a/b/",
+    "\\#hash",
+    "name with space",
+]
+NEGATIONS = ["!keep.log", "!src/", "!*.min.js", "!build/keep.py"]
+
+COMPONENTS = [
+    "src",
+    "a",
+    "b",
+    "docs",
+    "build",
+    "node_modules",
+    "x.tmp",
+    ".env",
+    ".env.local",
+    "prod.env",
+    "keep.log",
+    "app.min.js",
+    "module.pyc",
+    "file1.py",
+    "a.js",
+    "gen_x.py",
+    "fixtures",
+    "root.txt",
+    "#hash",
+    "name with space",
+    "notes~",
+    ".DS_Store",
+    "main.py",
+    "README.md",
+]
+
+
+def _random_paths(rng: random.Random, count: int) -> list[str]:
+    paths = []
+    for _ in range(count):
+        parts = [rng.choice(COMPONENTS) for _ in range(rng.randint(1, 5))]
+        path = "/".join(parts)
+        if rng.random() < 0.2:
+            path += "/"
+        paths.append(path)
+    # Paths pathspec normalizes specially
+    paths += ["", "/", "./src/main.py", "/root.txt", "a//b.py", "build\n"]
+    return paths
+
+
+def _random_spec(rng: random.Random, negations: bool) -> pathspec.PathSpec:
+    lines = rng.sample(PATTERNS, rng.randint(1, 12))
+    if negations:
+        lines += rng.sample(NEGATIONS, rng.randint(1, 2))
+        rng.shuffle(lines)
+    return pathspec.PathSpec.from_lines("gitwildmatch", lines)
+
+
+def _expected(specs, path):
+    return any(spec.match_file(path) for spec in specs)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_matcher_agrees_with_pathspec(seed):
+    """Random spec combinations give the same answers as pathspec."""
+    rng = random.Random(seed)
+    specs = [_random_spec(rng, negations=rng.random() < 0.3) for _ in range(3)]
+    matcher = IgnoreMatcher(specs)
+    for path in _random_paths(rng, 300):
+        assert matcher.match_file(path) == _expected(specs, path), (path, specs)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_extended_matcher_agrees_with_pathspec(seed):
+    """A matcher extended with more specs matches like the combined specs."""
+    rng = random.Random(seed)
+    base = [_random_spec(rng, negations=False), _random_spec(rng, negations=True)]
+    extra = _random_spec(rng, negations=False)
+    parent = IgnoreMatcher(base)
+    child = parent.extend(extra)
+    for path in _random_paths(rng, 300):
+        assert child.match_file(path) == _expected(base + [extra], path), path
+        # The parent is not changed by extending it
+        assert parent.match_file(path) == _expected(base, path), path
+
+
+def test_default_rules_agree_with_pathspec(tmp_path):
+    """The default exclusions match exactly as the gitignore spec does."""
+    (tmp_path / ".gitignore").write_text("*.tmp\ngenerated/\n/local.py\n")
+    spec = get_gitignore_spec(tmp_path, ["tests/*.snap"])
+    matcher = IgnoreMatcher([spec])
+    rng = random.Random(0)
+    paths = _random_paths(rng, 1000) + [
+        "generated/out.py",
+        "pkg/generated/out.py",
+        "local.py",
+        "pkg/local.py",
+        "tests/a.snap",
+        "pkg/tests/a.snap",
+    ]
+    for path in paths:
+        assert matcher.match_file(path) == spec.match_file(path), path
+
+
+def test_has_negations():
+    assert has_negations(pathspec.PathSpec.from_lines("gitwildmatch", ["*", "!a"]))
+    assert not has_negations(pathspec.PathSpec.from_lines("gitwildmatch", ["# c"]))
+
+
+def _spec(*lines):
+    return pathspec.PathSpec.from_lines("gitwildmatch", lines)
+
+
+def test_scoped_spec_only_applies_below_its_directory():
+    """Nested rules match paths relative to their directory, never the directory."""
+    matcher = IgnoreMatcher([_spec("*.log")]).extend_scoped("pkg", _spec("*", "/a.py"))
+    assert matcher.match_file("pkg/x.py")
+    assert matcher.match_file("pkg/a.py")
+    assert not matcher.match_file("pkg/")
+    assert not matcher.match_file("a.py")
+    assert not matcher.match_file("other/pkg.py")
+    assert matcher.match_file("other/x.log")
+
+
+def test_gitignore_chain_deepest_match_wins():
+    """A deeper .gitignore decides when it has a matching pattern."""
+    chain = GitignoreChain(
+        _spec("*.log", "build/"),
+        [("pkg", _spec("!keep.log", "/local.py")), ("pkg/sub", _spec("keep.log"))],
+    )
+    assert chain.match_file("x.log")
+    assert not chain.match_file("pkg/keep.log")
+    assert chain.match_file("pkg/other.log")
+    assert chain.match_file("pkg/sub/keep.log")
+    assert chain.match_file("pkg/local.py")
+    assert not chain.match_file("pkg/sub/local.py")
+    assert chain.match_file("pkg/build/")
@@ -0,0 +1,234 @@
+import os
+import shutil
+import sqlite3
+import time
+
+import pytest
+
+from copychat import core
+from copychat import format as format_module
+from copychat.core import scan_directory
+from copychat.format import format_files
+from copychat.manifest import Manifest
+
+# An mtime well outside the racy window
+OLD_NS = time.time_ns() - 3600 * 10**9
+
+
+def _age(root):
+    """Give everything under root (and root) an old mtime."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), ns=(OLD_NS, OLD_NS))
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        os.utime(dirpath, ns=(OLD_NS, OLD_NS))
+
+
+TREE = {
+    **{f"src/mod{i}.py": f"value = {i}\n" for i in range(5)},
+    "docs/guide.md": "# Guide\n",
+}
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Record the files actually read from disk."""
+    read = []
+    original = core.read_text_checked
+
+    def tracking(path, *args, **kwargs):
+        read.append(path.name)
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr(core, "read_text_checked", tracking)
+    return read
+
+
+def _scan(root, db):
+    manifest = Manifest(db)
+    files = scan_directory(root, manifest=manifest)
+    format_files(list(files.items()), manifest=manifest)
+    manifest.close()
+    return files, manifest
+
+
+def test_warm_scan_reads_only_changed_files(tmp_path, reads, make_tree):
+    """Unchanged files come from the manifest; new and modified ones are read."""
+    root = tmp_path / "repo"
+    root.mkdir()
+    make_tree(root, TREE)
+    _age(root)
+    db = tmp_path / "manifest.sqlite3"
+
+    cold, _ = _scan(root, db)
+    assert len(reads) == 6
+
+    reads.clear()
+    warm, manifest = _scan(root, db)
+    assert reads == []
+    assert warm == cold
+    assert manifest.files_reused == 6
+    assert manifest.listings_reused == 3
+
+    reads.clear()
+    (root / "src" / "mod1.py").write_text("value = 'changed'\n")
+    (root / "src" / "new.py").write_text("new = True\n")
+    changed, manifest = _scan(root, db)
+    assert sorted(reads) == ["mod1.py", "new.py"]
+    assert changed == scan_directory(root)
+    # src/ was modified, so only the root and docs/ listings were reused
+    assert manifest.listings_reused == 2
+
+
+def test_recent_changes_are_not_trusted(tmp_path, reads, make_tree):
+    """Files modified within the racy window are read again next time."""
+    root = tmp_path / "repo"
+    root.mkdir()
+    make_tree(root, TREE)
+    _age(root)
+    (root / "src" / "mod0.py").write_text("value = 'fresh'\n")
+    db = tmp_path / "manifest.sqlite3"
+
+    _scan(root, db)
+    reads.clear()
+    _scan(root, db)
+
+    assert reads == ["mod0.py"]
+
+
+def test_deleted_files_are_dropped(tmp_path, make_tree):
+    root = tmp_path / "repo"
+    root.mkdir()
+    make_tree(root, TREE)
+    _age(root)
+    db = tmp_path / "manifest.sqlite3"
+    _scan(root, db)
+
+    (root / "src" / "mod3.py").unlink()
+    files, _ = _scan(root, db)
+
+    assert root / "src" / "mod3.py" not in files
+    with sqlite3.connect(db) as conn:
+        paths = [row[0] for row in conn.execute("SELECT path FROM files")]
+    assert len(paths) == 5
+    assert str(root / "src" / "mod3.py") not in paths
+
+
+def _stored_paths(db):
+    with sqlite3.connect(db) as conn:
+        return {row[0] for row in conn.execute("SELECT path FROM files")}
+
+
+def test_narrower_scans_keep_other_records(tmp_path, make_tree):
+    """Files a scan's filters leave out aren't dropped; removed directories are."""
+    root = tmp_path / "repo"
+    root.mkdir()
+    make_tree(root, TREE)
+    _age(root)
+    db = tmp_path / "manifest.sqlite3"
+    _scan(root, db)
+
+    manifest = Manifest(db)
+    scan_directory(root, include=["md"], manifest=manifest)
+    scan_directory(root, max_depth=0, manifest=manifest)
+    manifest.close()
+    assert len(_stored_paths(db)) == 6
+
+    shutil.rmtree(root / "src")
+    _scan(root, db)
+    assert _stored_paths(db) == {str(root / "docs" / "guide.md")}
+
+
+def test_parallel_scans_keep_consistent_records(tmp_path):
+    """Workers reading with jobs > 1 share the manifest safely."""
+    root = tmp_path / "repo"
+    (root / "src").mkdir(parents=True)
+    for i in range(200):
+        (root / "src" / f"mod{i}.py").write_text(f"value = {i}\n")
+    _age(root)
+    db = tmp_path / "manifest.sqlite3"
+
+    for expected_reused in (0, 200):
+        manifest = Manifest(db)
+        files = scan_directory(root, jobs=8, manifest=manifest)
+        format_files(list(files.items()), jobs=8, manifest=manifest)
+        manifest.close()
+        assert len(files) == 200
+        assert manifest.files_reused == expected_reused
+    assert len(_stored_paths(db)) == 200
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    """The manifest is kept under max_size, keeping the files used last."""
+    root = tmp_path / "repo"
+    (root / "old").mkdir(parents=True)
+    (root / "new").mkdir()
+    for i in range(50):
+        (root / "old" / f"f{i}.txt").write_text(f"{i}" * 4000)
+        (root / "new" / f"f{i}.txt").write_text(f"{i}" * 4000)
+    _age(root)
+    db = tmp_path / "manifest.sqlite3"
+
+    manifest = Manifest(db)
+    scan_directory(root / "old", manifest=manifest)
+    manifest.close()
+    time.sleep(0.01)
+    manifest = Manifest(db, max_size=600 * 1024)
+    scan_directory(root / "new", manifest=manifest)
+    manifest.close()
+
+    paths = _stored_paths(db)
+    assert all(str(root / "new" / f"f{i}.txt") in paths for i in range(50))
+    assert len(paths) < 100
+
+
+def test_token_counts_are_reused(tmp_path, monkeypatch, make_tree):
+    """format_files doesn't count tokens for unchanged files."""
+
+    class WordEncoding:
+        calls = 0
+
+        def encode(self, text, **kwargs):
+            WordEncoding.calls += 1
+            return text.split()
+
+    monkeypatch.setenv("COPYCHAT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(format_module, "_token_cache", None)
+    monkeypatch.setattr(format_module, "_encoding", WordEncoding())
+    root = tmp_path / "repo"
+    root.mkdir()
+    make_tree(root, TREE)
+    _age(root)
+    db = tmp_path / "manifest.sqlite3"
+
+    _scan(root, db)
+    assert WordEncoding.calls == 6
+
+    cache = format_module.get_token_cache()
+    hits, misses = cache.hits, cache.misses
+    manifest = Manifest(db)
+    files = scan_directory(root, manifest=manifest)
+    result = format_files(list(files.items()), manifest=manifest)
+    manifest.close()
+
+    assert WordEncoding.calls == 6
+    assert (cache.hits, cache.misses) == (hits, misses)
+    assert result.total_tokens == 5 * 3 + 2
+    assert '<file path="src/mod0.py" language="python">' in str(result)
+
+
+def test_diff_modes_do_not_reuse_content(tmp_path, reads, make_tree):
+    """Only full-content scans take file content from the manifest."""
+    root = tmp_path / "repo"
+    root.mkdir()
+    make_tree(root, TREE)
+    _age(root)
+    db = tmp_path / "manifest.sqlite3"
+    _scan(root, db)
+    reads.clear()
+
+    manifest = Manifest(db)
+    scan_directory(root, diff_mode=core.DiffMode.FULL_WITH_DIFF, manifest=manifest)
+    manifest.close()
+
+    assert len(reads) == 6
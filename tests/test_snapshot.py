@@ -0,0 +1,99 @@
+from typer.testing import CliRunner
+
+from copychat.cli import app
+from copychat.core import DiffMode
+from copychat.snapshot import Snapshot, render_delta
+
+runner = CliRunner(mix_stderr=False)
+
+
+def test_delta_added_modified_deleted(tmp_path):
+    snapshot = Snapshot("/repo", path=tmp_path / "snap.json")
+    snapshot.record({"a.py": "a = 1\n", "b.py": "b = 1\n"}, [])
+    snapshot.save()
+
+    snapshot = Snapshot("/repo", path=tmp_path / "snap.json")
+    delta = snapshot.delta({"a.py": "a = 1\n", "b.py": "b = 2\n", "c.py": "c\n"})
+
+    assert delta.added == ["c.py"]
+    assert delta.modified == ["b.py"]
+    assert delta.deleted == []
+    assert snapshot.delta({"a.py": "a = 1\n"}).deleted == ["b.py"]
+
+
+def test_snapshot_ignores_other_root(tmp_path):
+    path = tmp_path / "snap.json"
+    snapshot = Snapshot("/repo", path=path)
+    snapshot.record({"a.py": "a\n"}, [])
+    snapshot.save()
+
+    assert Snapshot("/other", path=path).files == {}
+    assert Snapshot("/repo", profile="review", path=path).files == {}
+
+
+def test_render_delta_modes():
+    old, new = "x = 1\n", "x = 2\n"
+
+    assert render_delta("a.py", new, old, DiffMode.FULL) == new
+    diff = render_delta("a.py", new, old, DiffMode.DIFF_ONLY)
+    assert "-x = 1" in diff and "+x = 2" in diff
+    assert "a/a.py" in diff
+    both = render_delta("a.py", new, old, DiffMode.FULL_WITH_DIFF)
+    assert both.startswith(new) and "-x = 1" in both
+    # Added files have nothing to diff against
+    assert render_delta("b.py", new, None, DiffMode.FULL_WITH_DIFF) == new
+    assert "/dev/null" in render_delta("b.py", new, None, DiffMode.DIFF_ONLY)
+
+
+def test_cli_since_last(tmp_path, monkeypatch):
+    """A second run emits only changed files and lists deleted ones."""
+    monkeypatch.setenv("COPYCHAT_CACHE_DIR", str(tmp_path / "cache"))
+    root = tmp_path / "repo"
+    root.mkdir()
+    (root / "keep.py").write_text("keep = 1\n")
+    (root / "edit.py").write_text("edit = 1\n")
+    (root / "gone.py").write_text("gone = 1\n")
+    out = tmp_path / "out.md"
+    args = [str(root), "--since-last", "--out", str(out)]
+
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert "keep = 1" in out.read_text()
+
+    (root / "edit.py").write_text("edit = 2\n")
+    (root / "gone.py").unlink()
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    text = out.read_text()
+    assert "edit = 2" in text
+    assert "keep = 1" not in text
+    assert "<deleted>\ngone.py\n</deleted>" in text
+    assert "1 modified" in result.stderr
+
+    out.unlink()
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert "0 added, 0 modified, 0 deleted" in result.stderr
+    assert not out.exists()
+
+    # A different profile has its own snapshot
+    result = runner.invoke(app, args + ["--profile", "review"])
+    assert result.exit_code == 0
+    assert "keep = 1" in out.read_text()
+
+
+def test_cli_since_last_diff_only(tmp_path, monkeypatch):
+    monkeypatch.setenv("COPYCHAT_CACHE_DIR", str(tmp_path / "cache"))
+    root = tmp_path / "repo"
+    root.mkdir()
+    (root / "a.py").write_text("x = 1\n")
+    out = tmp_path / "out.md"
+    args = [str(root), "--since-last", "--diff-mode", "diff-only", "--out", str(out)]
+
+    runner.invoke(app, args)
+    (root / "a.py").write_text("x = 2\n")
+    result = runner.invoke(app, args)
+
+    assert result.exit_code == 0
+    text = out.read_text()
+    assert "-x = 1" in text and "+x = 2" in text
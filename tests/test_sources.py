@@ -1,6 +1,10 @@
+import subprocess
+import threading
+import time
+
 import pytest
 import shutil
-from copychat.sources import GitHubSource
+from copychat.sources import GitHubSource, sparse_patterns
 
 
 @pytest.fixture
@@ -22,6 +26,13 @@ def test_github_source_init(temp_cache_dir):
     assert source.repo_dir == temp_cache_dir / "owner_repo"
 
 
+def test_github_source_default_cache_dir(tmp_path, monkeypatch):
+    """Clones follow COPYCHAT_CACHE_DIR like copychat's other caches."""
+    monkeypatch.setenv("COPYCHAT_CACHE_DIR", str(tmp_path))
+    source = GitHubSource("owner/repo")
+    assert source.repo_dir == tmp_path / "github" / "owner_repo"
+
+
 def test_github_source_fetch(temp_cache_dir):
     """Test fetching a real public repository."""
     source = GitHubSource("prefecthq/prefect", cache_dir=temp_cache_dir)
@@ -44,3 +55,278 @@ def test_github_source_cleanup(temp_cache_dir):
 
     source.cleanup()
     assert not source.repo_dir.exists()
+
+
+def _git(cwd, *args):
+    return subprocess.run(
+        ["git", "-c", "user.email=t@example.com", "-c", "user.name=t", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """A bare owner/repo.git served over file:// with partial clone enabled."""
+    work = tmp_path / "work"
+    (work / "src" / "api").mkdir(parents=True)
+    (work / "src" / "web").mkdir()
+    (work / "docs").mkdir()
+    (work / ".gitignore").write_text("*.log\n")
+    (work / "src" / "api" / "handlers.py").write_text("handlers = 1\n")
+    (work / "src" / "web" / "app.js").write_text("app = 1\n")
+    (work / "docs" / "guide.md").write_text("# Guide\n")
+    _git(work, "init", "-q", "-b", "main")
+    _git(work, "add", "-A")
+    _git(work, "commit", "-q", "-m", "initial")
+
+    base = tmp_path / "remote"
+    bare = base / "owner" / "repo.git"
+    _git(tmp_path, "clone", "-q", "--bare", str(work), str(bare))
+    _git(bare, "config", "uploadpack.allowFilter", "true")
+    _git(bare, "config", "uploadpack.allowAnySHA1InWant", "true")
+    _git(work, "remote", "add", "origin", str(bare))
+    return work, f"file://{base}"
+
+
+def _missing_blobs(repo_dir):
+    out = _git(repo_dir, "rev-list", "--objects", "--missing=print", "HEAD")
+    return {line[1:] for line in out.splitlines() if line.startswith("?")}
+
+
+def test_sparse_patterns():
+    assert sparse_patterns(["src/api/"]) == [
+        "/.ccignore",
+        "/.gitignore",
+        "/src/.ccignore",
+        "/src/.gitignore",
+        "/src/api",
+    ]
+    assert sparse_patterns(["src", "."]) is None
+
+
+def test_github_source_sparse_clone(temp_cache_dir, remote):
+    """Only the requested paths are checked out and have their blobs fetched."""
+    work, base_url = remote
+    source = GitHubSource(
+        "owner/repo",
+        cache_dir=temp_cache_dir,
+        paths=["src/api"],
+        base_url=base_url,
+        ttl=0,
+    )
+    repo_dir = source.fetch()
+
+    assert (repo_dir / "src" / "api" / "handlers.py").read_text() == "handlers = 1\n"
+    assert (repo_dir / ".gitignore").exists()
+    assert not (repo_dir / "src" / "web").exists()
+    assert not (repo_dir / "docs").exists()
+    web_blob = _git(work, "rev-parse", "HEAD:src/web/app.js").strip()
+    assert web_blob in _missing_blobs(repo_dir)
+
+    # Updates are shallow checkouts of the tracked branch
+    (work / "src" / "api" / "handlers.py").write_text("handlers = 2\n")
+    _git(work, "commit", "-q", "-am", "update")
+    _git(work, "push", "-q", "origin", "main")
+    source.fetch()
+
+    assert (repo_dir / "src" / "api" / "handlers.py").read_text() == "handlers = 2\n"
+    assert _git(repo_dir, "rev-list", "--count", "HEAD").strip() == "1"
+    assert web_blob in _missing_blobs(repo_dir)
+
+    # Other paths (or none) change the checkout of the same clone
+    source.release()
+    docs = GitHubSource(
+        "owner/repo", cache_dir=temp_cache_dir, paths=["docs"], base_url=base_url
+    )
+    docs.fetch()
+    assert (repo_dir / "docs" / "guide.md").exists()
+    assert not (repo_dir / "src" / "api").exists()
+    docs.release()
+    full = GitHubSource("owner/repo", cache_dir=temp_cache_dir, base_url=base_url)
+    full.fetch()
+    assert (repo_dir / "src" / "web" / "app.js").exists()
+    full.release()
+
+
+def _push(work, text):
+    (work / "docs" / "guide.md").write_text(text)
+    _git(work, "commit", "-q", "-am", "update")
+    _git(work, "push", "-q", "origin", "main")
+
+
+def test_github_source_cache_ttl(temp_cache_dir, remote, monkeypatch):
+    """Clones are reused within the ttl and fetched only when the branch moved."""
+    work, base_url = remote
+    source = GitHubSource("owner/repo", cache_dir=temp_cache_dir, base_url=base_url)
+    repo_dir = source.fetch()
+    guide = repo_dir / "docs" / "guide.md"
+
+    # Within the ttl, GitHub isn't asked about new commits
+    _push(work, "v2\n")
+    source.fetch()
+    assert guide.read_text() == "# Guide\n"
+
+    # Refreshing checkouts regardless
+    source.fetch(refresh=True)
+    assert guide.read_text() == "v2\n"
+
+    # Past the ttl, an unchanged branch is checked but not fetched
+    source.ttl = 0
+    checkouts = []
+    real_checkout = GitHubSource._checkout
+
+    def checkout(self, repo, patterns, commit):
+        checkouts.append(commit)
+        real_checkout(self, repo, patterns, commit)
+
+    monkeypatch.setattr(GitHubSource, "_checkout", checkout)
+    checked_at = source._load_state()["checked_at"]
+    source.fetch()
+    assert checkouts == []
+    assert source._load_state()["checked_at"] > checked_at
+
+    # ...and a moved branch is
+    _push(work, "v3\n")
+    source.fetch()
+    assert checkouts == ["FETCH_HEAD"]
+    assert guide.read_text() == "v3\n"
+    assert source._load_state()["commit"] == _git(repo_dir, "rev-parse", "HEAD").strip()
+
+    source.cleanup()
+    assert not source.state_path.exists()
+
+
+def test_github_source_locking(temp_cache_dir, remote, monkeypatch):
+    """Runs wait for an in-flight fetch and don't change files being read."""
+    work, base_url = remote
+    reader = GitHubSource("owner/repo", cache_dir=temp_cache_dir, base_url=base_url)
+    reader.fetch()
+
+    # A checkout waits until the reader is done
+    other = GitHubSource(
+        "owner/repo", cache_dir=temp_cache_dir, paths=["docs"], base_url=base_url
+    )
+    thread = threading.Thread(target=other.fetch)
+    thread.start()
+    thread.join(0.5)
+    assert thread.is_alive()
+    assert (reader.repo_dir / "src" / "web" / "app.js").exists()
+    reader.release()
+    thread.join(10)
+    assert not (reader.repo_dir / "src" / "web" / "app.js").exists()
+    other.release()
+
+    # Runs queued behind a fetch reuse it, even with refresh
+    _push(work, "v2\n")
+    checkouts = []
+    real_checkout = GitHubSource._checkout
+
+    def checkout(self, repo, patterns, commit):
+        checkouts.append(commit)
+        real_checkout(self, repo, patterns, commit)
+
+    monkeypatch.setattr(GitHubSource, "_checkout", checkout)
+    update_lock, _ = reader._locks("owner_repo")
+    update_lock.acquire(exclusive=True)
+    runs = [
+        GitHubSource(
+            "owner/repo", cache_dir=temp_cache_dir, paths=["docs"], base_url=base_url
+        )
+        for _ in range(2)
+    ]
+    threads = [
+        threading.Thread(target=run.fetch, kwargs={"refresh": True}) for run in runs
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    update_lock.release()
+    for thread in threads:
+        thread.join(10)
+    assert checkouts == ["FETCH_HEAD"]
+    assert (reader.repo_dir / "docs" / "guide.md").read_text() == "v2\n"
+    for run in runs:
+        run.release()
+
+
+def test_github_source_long_reader(temp_cache_dir, remote):
+    """A long-lived reader never leaves other runs stuck behind the update lock."""
+    work, base_url = remote
+    reader = GitHubSource("owner/repo", cache_dir=temp_cache_dir, base_url=base_url)
+    reader.fetch()
+    guide = reader.repo_dir / "docs" / "guide.md"
+
+    # Past the ttl, a moved branch can't be checked out under the reader, so
+    # the current checkout is used as is
+    _push(work, "v2\n")
+    stale = GitHubSource(
+        "owner/repo", cache_dir=temp_cache_dir, base_url=base_url, ttl=0
+    )
+    thread = threading.Thread(target=stale.fetch)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert guide.read_text() == "# Guide\n"
+    stale.release()
+
+    # A checkout of other paths waits without holding the update lock, so
+    # runs that can use the clone as is still get through
+    other = GitHubSource(
+        "owner/repo", cache_dir=temp_cache_dir, paths=["docs"], base_url=base_url
+    )
+    waiting = threading.Thread(target=other.fetch)
+    waiting.start()
+    waiting.join(0.5)
+    assert waiting.is_alive()
+    fresh = GitHubSource("owner/repo", cache_dir=temp_cache_dir, base_url=base_url)
+    thread = threading.Thread(target=fresh.fetch)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    fresh.release()
+
+    reader.release()
+    waiting.join(10)
+    assert not waiting.is_alive()
+    assert not (reader.repo_dir / "src").exists()
+    other.release()
+
+
+def test_github_source_eviction(temp_cache_dir, remote):
+    """Least recently used clones are removed once the cache is too big."""
+    work, base_url = remote
+    base = base_url[len("file://") :]
+    for name in ("other", "third"):
+        _git(work, "clone", "-q", "--bare", ".", f"{base}/owner/{name}.git")
+
+    def fetch(name, **kwargs):
+        source = GitHubSource(
+            f"owner/{name}", cache_dir=temp_cache_dir, base_url=base_url
+        )
+        source.max_size = kwargs.pop("max_size", source.max_size)
+        source.fetch(**kwargs)
+        return source
+
+    for name in ("repo", "third", "other", "repo"):  # Least recent: third
+        source = fetch(name)
+        source.release()
+    sizes = [source._load_state(name)["size"] for name in ("owner_repo", "owner_other")]
+    total = sum(sizes) + source._load_state("owner_third")["size"]
+
+    # Updates evict the least recently used clones
+    fetch("repo", refresh=True, max_size=total - 1).release()
+    assert not (temp_cache_dir / "owner_third").exists()
+    assert not (temp_cache_dir / "owner_third.json").exists()
+    assert not (temp_cache_dir / "owner_third.lock").exists()
+    assert not (temp_cache_dir / "owner_third.read.lock").exists()
+    assert (temp_cache_dir / "owner_other").exists()
+
+    # ...but never the current one, or one being read
+    reader = fetch("other")
+    fetch("repo", refresh=True, max_size=0).release()
+    assert (temp_cache_dir / "owner_other").exists()
+    assert (temp_cache_dir / "owner_repo").exists()
+    reader.release()
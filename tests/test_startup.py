@@ -0,0 +1,51 @@
+"""Import-time regression tests for CLI startup."""
+
+import subprocess
+import sys
+
+import pytest
+
+# Modules that are slow to import and only needed on some code paths
+HEAVY_MODULES = {"tiktoken", "git", "pathspec", "pyperclip", "requests", "sqlite3"}
+
+# Budget for copychat's own modules (microseconds of self import time)
+COPYCHAT_IMPORT_BUDGET_US = 100_000
+
+
+def import_times(code: str) -> dict[str, int]:
+    """Run code under `python -X importtime` and return self time per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import copychat.cli",
+        "from copychat.cli import app\n"
+        "try:\n    app(['--version'])\nexcept SystemExit:\n    pass",
+    ],
+    ids=["import", "version"],
+)
+def test_cli_startup_skips_heavy_modules(code):
+    """Importing the CLI and running --version don't load heavy dependencies."""
+    loaded = {name.split(".")[0] for name in import_times(code)}
+    assert not loaded & HEAVY_MODULES
+
+
+def test_cli_import_time_budget():
+    """copychat's own modules stay within the import-time budget."""
+    times = import_times("import copychat.cli")
+    own = sum(us for name, us in times.items() if name.split(".")[0] == "copychat")
+    assert own < COPYCHAT_IMPORT_BUDGET_US
@@ -0,0 +1,140 @@
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from copychat import timings
+from copychat.cli import app
+from copychat.core import scan_directory
+from copychat.format import format_files
+
+runner = CliRunner(mix_stderr=False)
+
+
+TREE = {
+    "src/app.py": "print('app')\n",
+    "src/util.py": "def util():\n    return 1\n",
+    "README.md": "# Readme\n",
+}
+
+
+def test_spans_are_noops_when_disabled():
+    """Without an active recorder nothing is collected."""
+    assert timings.get_recorder() is None
+    with timings.span("read", "a.py"):
+        pass
+    assert timings.get_recorder() is None
+
+
+def test_phase_totals_and_slowest_files():
+    """Counted spans add to phases; per-file spans rank the slowest files."""
+    recorder = timings.Timings()
+    recorder.spans = [
+        timings.Span("read", 0.0, 0.5, 1, path="a.py"),
+        timings.Span("read", 0.0, 0.1, 2, path="b.py"),
+        timings.Span("tokenize", 0.5, 1.0, 1),
+        timings.Span("tokenize", 0.5, 0.7, 1, path="b.py", counted=False),
+    ]
+    recorder.add("ignore", 0.25)
+
+    totals = recorder.phase_totals()
+    assert list(totals) == ["ignore", "read", "tokenize"]
+    assert totals["read"] == pytest.approx(0.6)
+    assert totals["tokenize"] == pytest.approx(0.5)
+    assert totals["ignore"] == 0.25
+    slowest = recorder.slowest_files(2)
+    assert [path for path, _ in slowest] == ["a.py", "b.py"]
+    assert slowest[1][1] == pytest.approx(0.3)
+    assert recorder.slowest_files(1) == [("a.py", 0.5)]
+
+
+def test_nested_spans_are_counted_once():
+    """Time in nested spans is charged to the inner phase only."""
+    recorder = timings.Timings()
+    recorder.spans = [
+        timings.Span("walk", 0.0, 1.0, 1),
+        timings.Span("ignore", 0.1, 0.4, 1),
+        timings.Span("ignore", 0.2, 0.3, 1),
+        timings.Span("git", 0.5, 0.7, 1),
+        timings.Span("tokenize", 0.6, 0.65, 1, path="a.py", counted=False),
+        # Overlaps the walk on another thread, so it isn't nested in it
+        timings.Span("read", 0.2, 0.6, 2, path="a.py"),
+    ]
+
+    totals = recorder.phase_totals()
+    assert totals["walk"] == pytest.approx(0.5)
+    assert totals["ignore"] == pytest.approx(0.3)
+    assert totals["git"] == pytest.approx(0.2)
+    assert totals["read"] == pytest.approx(0.4)
+    assert "tokenize" not in totals
+
+
+def test_scan_and_format_record_phases(tmp_path, make_tree):
+    """Scanning and formatting record walk, ignore, read and tokenize phases."""
+    make_tree(tmp_path, TREE)
+    recorder = timings.start_timings()
+    try:
+        files = scan_directory(tmp_path, include=["py", "md"])
+        format_files(list(files.items()), jobs=2)
+    finally:
+        timings.stop_timings()
+
+    totals = recorder.phase_totals()
+    for phase in ("walk", "ignore", "read", "tokenize", "header"):
+        assert phase in totals
+
+    read_paths = {s.path for s in recorder.spans if s.phase == "read"}
+    assert read_paths == {str(p) for p in files}
+    tokenized = {s.path for s in recorder.spans if s.phase == "tokenize" and s.path}
+    assert tokenized == {str(p) for p in files}
+
+
+def test_chrome_trace_format(tmp_path):
+    """The trace is valid Chrome trace-event JSON with complete events."""
+    recorder = timings.Timings()
+    with recorder.span("walk"):
+        pass
+    with recorder.span("read", "a.py"):
+        pass
+    trace_file = tmp_path / "trace.json"
+    recorder.write_chrome_trace(trace_file)
+
+    trace = json.loads(trace_file.read_text())
+    events = trace["traceEvents"]
+    assert [e["cat"] for e in events] == ["walk", "read"]
+    assert events[1]["name"] == "a.py"
+    assert events[1]["args"] == {"path": "a.py"}
+    for event in events:
+        assert event["ph"] == "X"
+        assert event["ts"] >= 0
+        assert event["dur"] >= 0
+        assert {"pid", "tid"} <= set(event)
+
+
+def test_cli_timings_and_trace(tmp_path, make_tree):
+    """--timings prints the breakdown and --trace writes a trace file."""
+    make_tree(tmp_path, TREE)
+    out = tmp_path / "out.md"
+    trace_file = tmp_path / "trace.json"
+
+    result = runner.invoke(
+        app,
+        [str(tmp_path), "--out", str(out), "--timings", "--trace", str(trace_file)],
+    )
+
+    assert result.exit_code == 0
+    assert "Timings:" in result.stderr
+    assert "tokenize" in result.stderr
+    assert "Slowest" in result.stderr
+    assert "app.py" in result.stderr
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    assert {"walk", "read", "tokenize", "write"} <= {e["cat"] for e in events}
+    assert timings.get_recorder() is None
+
+
+def test_cli_without_timings(tmp_path, make_tree):
+    """Timings are off by default."""
+    make_tree(tmp_path, TREE)
+    result = runner.invoke(app, [str(tmp_path), "--out", str(tmp_path / "out.md")])
+    assert result.exit_code == 0
+    assert "Timings:" not in result.stderr
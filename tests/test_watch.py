@@ -0,0 +1,243 @@
+import threading
+import time
+
+import pytest
+
+from copychat.core import scan_directory
+from copychat.format import format_files
+from copychat.watch import (
+    Bundle,
+    FileTarget,
+    InotifyWatcher,
+    PathFilter,
+    PollingWatcher,
+    collect_changes,
+    run_watch,
+)
+
+
+TREE = {
+    "src/app.py": "app = 1\n",
+    "src/util.py": "util = 1\n",
+    "build/out.py": "built = 1\n",
+    "node_modules/dep.js": "dep\n",
+    ".gitignore": "build/\n",
+    "README.md": "# Readme\n",
+}
+
+
+def _wait_for(watcher, expected, timeout=5.0):
+    """Collect changes until expected paths were all reported."""
+    seen = set()
+    deadline = time.monotonic() + timeout
+    while not expected <= seen and time.monotonic() < deadline:
+        seen |= watcher.wait(0.1).paths
+    return seen
+
+
+def test_path_filter_matches_scan(tmp_path, make_tree):
+    """PathFilter accepts exactly the files scan_directory returns."""
+    make_tree(tmp_path, TREE)
+    (tmp_path / "src" / ".ccignore").write_text("util.py\n")
+    scanned = {str(path) for path in scan_directory(tmp_path)}
+
+    path_filter = PathFilter(tmp_path)
+    candidates = {str(path) for path in tmp_path.resolve().rglob("*") if path.is_file()}
+
+    assert {path for path in candidates if path_filter.wants_file(path)} == scanned
+    assert not path_filter.watches_dir(str(tmp_path.resolve() / "build"))
+    assert not path_filter.watches_dir(str(tmp_path.resolve() / "node_modules"))
+
+
+def test_bundle_rerenders_only_changed_files(tmp_path, monkeypatch, make_tree):
+    make_tree(tmp_path, TREE)
+    files = scan_directory(tmp_path)
+    bundle = Bundle.from_result(format_files(list(files.items())))
+    untouched = bundle.blocks[tmp_path.resolve() / "README.md"]
+
+    app = tmp_path.resolve() / "src" / "app.py"
+    rendered = bundle.update({app: "app = 2\n"})
+
+    assert rendered == 1
+    assert bundle.blocks[tmp_path.resolve() / "README.md"] is untouched
+    result = bundle.result()
+    assert "app = 2" in str(result)
+    assert str(result).count("<file ") == len(files)
+
+    bundle.update({app: None})
+    assert app not in bundle.contents
+    assert "app = 2" not in str(bundle.result())
+
+
+def test_collect_changes_applies_ignore_rules(tmp_path, make_tree):
+    make_tree(tmp_path, TREE)
+    root = tmp_path.resolve()
+    files = scan_directory(root)
+    bundle = Bundle.from_result(format_files(list(files.items())))
+    targets = [PathFilter(root)]
+
+    (root / "build" / "out.py").write_text("built = 2\n")
+    (root / "src" / "app.py").write_text("app = 2\n")
+    (root / "src" / "util.py").unlink()
+    paths = {
+        str(root / "build" / "out.py"),
+        str(root / "src" / "app.py"),
+        str(root / "src" / "util.py"),
+        str(root / "README.md"),  # Reported but unchanged
+    }
+    changed, rules_changed = collect_changes(
+        targets, bundle, paths, lambda path: path.read_text()
+    )
+
+    assert changed == {
+        root / "src" / "app.py": "app = 2\n",
+        root / "src" / "util.py": None,
+    }
+    assert not rules_changed
+
+    _, rules_changed = collect_changes(
+        targets, bundle, {str(root / ".gitignore")}, lambda path: path.read_text()
+    )
+    assert rules_changed
+
+
+def test_polling_watcher_reports_changes(tmp_path, make_tree):
+    make_tree(tmp_path, TREE)
+    root = tmp_path.resolve()
+    watcher = PollingWatcher([PathFilter(root)], interval=0.05)
+
+    time.sleep(0.01)
+    (root / "src" / "app.py").write_text("app = 22\n")
+    (root / "src" / "new.py").write_text("new = 1\n")
+    (root / "build" / "out.py").write_text("built = 22\n")
+
+    seen = _wait_for(watcher, {str(root / "src" / "new.py")})
+    assert str(root / "src" / "app.py") in seen
+    assert str(root / "src" / "new.py") in seen
+    assert str(root / "build" / "out.py") not in seen
+
+
+def test_inotify_watcher_follows_new_directories(tmp_path, make_tree):
+    make_tree(tmp_path, TREE)
+    root = tmp_path.resolve()
+    try:
+        watcher = InotifyWatcher([PathFilter(root)])
+    except OSError:
+        pytest.skip("inotify not available")
+    try:
+        (root / "pkg").mkdir()
+        (root / "pkg" / "mod.py").write_text("mod = 1\n")
+        (root / "node_modules" / "other.js").write_text("x\n")
+        seen = _wait_for(watcher, {str(root / "pkg" / "mod.py")})
+    finally:
+        watcher.close()
+
+    assert str(root / "pkg" / "mod.py") in seen
+    # Ignored directories aren't watched at all
+    assert str(root / "node_modules" / "other.js") not in seen
+
+
+def test_run_watch_updates_bundle(tmp_path, make_tree):
+    """A change is picked up, debounced and emitted; explicit files work too."""
+    make_tree(tmp_path, TREE)
+    root = tmp_path.resolve()
+    notes = tmp_path / "notes.txt"
+    notes.write_text("notes\n")
+    files = scan_directory(root / "src")
+    files[notes] = notes.read_text()
+    bundle = Bundle.from_result(format_files(list(files.items())))
+    targets = [PathFilter(root / "src"), FileTarget(notes)]
+    emitted = []
+    stop = threading.Event()
+
+    def emit(bundle, changed):
+        emitted.append((changed, str(bundle.result())))
+        stop.set()
+
+    thread = threading.Thread(
+        target=run_watch,
+        args=(targets, bundle, lambda path: path.read_text(), dict, emit),
+        kwargs=dict(
+            debounce=0.05,
+            watcher=PollingWatcher(targets, interval=0.05),
+            requested=lambda: False,
+            stop=stop,
+        ),
+    )
+    thread.start()
+    time.sleep(0.01)
+    (root / "src" / "app.py").write_text("app = 'watched'\n")
+    notes.write_text("more notes\n")
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert emitted[0][0] == 2
+    assert "app = 'watched'" in emitted[0][1]
+    assert "more notes" in emitted[0][1]
+
+
+def test_write_bundle_keeps_appended_to_content(tmp_path):
+    """Refreshes under --append rewrite only this run's output."""
+    from copychat.cli import _write_bundle
+
+    (tmp_path / "app.py").write_text("app = 1\n")
+    result = format_files(list(scan_directory(tmp_path).items()))
+    out = tmp_path / "bundle.md"
+    out.write_text("earlier output\n\n")
+    start = out.stat().st_size
+    _write_bundle(result, out, False, False, start=start)
+    _write_bundle(result, out, False, False, start=start)
+
+    text = out.read_text()
+    assert text.startswith("earlier output\n\n<file")
+    assert text.count("app = 1") == 1
+
+
+def test_run_watch_prepares_git_status(tmp_path, monkeypatch):
+    """Edits to untracked files stay in diff-mode bundles."""
+    import subprocess
+
+    from copychat.core import DiffMode, get_changed_files, get_file_content
+
+    monkeypatch.chdir(tmp_path)
+    subprocess.run(["git", "init", "-q"], check=True)
+    (tmp_path / "new.py").write_text("new = 1\n")
+    root = tmp_path.resolve()
+    mode = DiffMode.CHANGED_WITH_DIFF
+    files = scan_directory(root, diff_mode=mode)
+    assert root / "new.py" in files
+    bundle = Bundle.from_result(format_files(list(files.items())))
+    targets = [PathFilter(root)]
+    changed_files = set()
+    emitted = []
+    stop = threading.Event()
+
+    def prepare():
+        changed_files.clear()
+        changed_files.update(get_changed_files(path=root))
+
+    def read(path):
+        return get_file_content(path, mode, changed_files=changed_files)
+
+    def emit(bundle, changed):
+        emitted.append(dict(bundle.contents))
+        stop.set()
+
+    thread = threading.Thread(
+        target=run_watch,
+        args=(targets, bundle, read, dict, emit),
+        kwargs=dict(
+            debounce=0.05,
+            watcher=PollingWatcher(targets, interval=0.05),
+            requested=lambda: False,
+            stop=stop,
+            prepare=prepare,
+        ),
+    )
+    thread.start()
+    time.sleep(0.01)
+    (root / "new.py").write_text("new = 2\n")
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert "new = 2" in emitted[0][root / "new.py"]